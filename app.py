@@ -5,20 +5,55 @@ This module provides the application factory pattern for creating Flask app inst
 Routes are organized in separate blueprint modules in the routes package.
 """
 
-from flask import Flask
-from database import init_database, add_sample_data
+import atexit
+import logging
+
+from flask import Flask, g
+from database import (
+    init_database, add_sample_data, configure_pool, close_pool, log_pragma_report,
+    begin_unit_of_work, end_unit_of_work, load_catalog_snapshot, drop_catalog_snapshot, sync_changes
+)
 from routes import register_blueprints
+from services.autocomplete import enable_autocomplete
+from services.fragment_cache import configure_fragment_cache
+from services.fuzzy_index import enable_fuzzy_search
+from services.search_cache import configure_search_cache
+from services.search_index import enable_trigram_search, disable_trigram_search
+from services.shared_catalog import enable_shared_catalog, enable_shared_search, disable_shared_search
+
+# Close the shared connection pool on interpreter exit, once however many
+# apps are created
+atexit.register(close_pool)
 
 
-def create_app():
+def create_app(config=None):
     """
     Application factory function to create and configure Flask app.
     
+    Args:
+        config: Optional mapping of settings that override the defaults
+    
     Returns:
         Flask: Configured Flask application instance
     """
     app = Flask(__name__)
     app.secret_key = "super secret key"
+    app.config.setdefault('DB_POOL_SIZE', 8)
+    app.config.setdefault('DB_POOL_TIMEOUT', 30.0)
+    app.config.setdefault('DB_PROFILE', 'performance')  # see database.DB_PROFILES
+    app.config.setdefault('SEARCH_BACKEND', 'fts')      # 'fts' (SQLite), 'trigram' (in memory) or 'shared'
+    app.config.setdefault('SEARCH_CACHE_SIZE', 1024)    # cached queries; 0 turns the cache off
+    app.config.setdefault('SEARCH_CACHE_TTL', 300.0)    # seconds
+    app.config.setdefault('FRAGMENT_CACHE_BYTES', 64 * 2**20)  # rendered catalog rows; 0 turns it off
+    app.config.setdefault('CATALOG_SNAPSHOT', True)     # serve book lookups from memory; 'shared'
+                                                        # maps one index file for all workers
+    app.config.setdefault('CATALOG_INDEX_PATH', None)   # shared index file; default next to the database
+    if config:
+        app.config.update(config)
+    
+    # Set up the shared connection pool
+    configure_pool(size=app.config['DB_POOL_SIZE'], timeout=app.config['DB_POOL_TIMEOUT'],
+                   profile=app.config['DB_PROFILE'])
     
     # Initialize the database
     init_database()
@@ -26,12 +61,63 @@ def create_app():
     # Add sample data for testing and demonstration
     add_sample_data()
     
+    # Report the SQLite settings actually in effect
+    log_pragma_report()
+    
+    # Catch up on changes committed so far, then follow them from here
+    sync_changes()
+    
+    # Keep every book in memory for lookups by ID, per process or in one
+    # mapped file shared by every worker (which shared search also needs)
+    if app.config['CATALOG_SNAPSHOT'] == 'shared' or app.config['SEARCH_BACKEND'] == 'shared':
+        enable_shared_catalog(app.config['CATALOG_INDEX_PATH'])
+    elif app.config['CATALOG_SNAPSHOT']:
+        load_catalog_snapshot()
+    else:
+        drop_catalog_snapshot()
+    
+    # Choose how title/author searches are answered
+    if app.config['SEARCH_BACKEND'] == 'trigram':
+        enable_trigram_search()
+    else:
+        disable_trigram_search()
+    if app.config['SEARCH_BACKEND'] == 'shared':
+        enable_shared_search()
+    else:
+        disable_shared_search()
+    configure_search_cache(app.config['SEARCH_CACHE_SIZE'], app.config['SEARCH_CACHE_TTL'])
+    configure_fragment_cache(app.config['FRAGMENT_CACHE_BYTES'])
+    
+    # Prefix index for type-ahead and word index for fuzzy search,
+    # both kept current by insert_book()
+    enable_autocomplete()
+    enable_fuzzy_search()
+    
     # Register all route blueprints
     register_blueprints(app)
     
+    # Pick up writes committed by other worker processes; costs one PRAGMA
+    # when there are none
+    @app.before_request
+    def sync_external_changes():
+        sync_changes()
+    
+    # One connection and one transaction per request; the connection is
+    # only checked out once a database helper actually needs it
+    @app.before_request
+    def open_unit_of_work():
+        g.unit_of_work = begin_unit_of_work()
+    
+    @app.teardown_request
+    def close_unit_of_work(error):
+        uow = g.pop('unit_of_work', None)
+        if uow is not None:
+            end_unit_of_work(uow, error)
+    
     return app
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
     app = create_app()
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -0,0 +1,61 @@
+"""
+Benchmark: autocomplete latency vs. catalog size.
+
+Builds the sorted prefix index over synthetic catalogs in memory and
+reports p50/p99 completion latency for typical keystroke prefixes, plus
+the cost of one incremental insert. Run from the repository root:
+
+    python benchmarks/bench_autocomplete.py               # 10k, 100k and 1M titles
+    python benchmarks/bench_autocomplete.py 50000
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.bench_trigram_search import make_books
+from services.autocomplete import PrefixIndex
+
+PREFIXES = ['w', 'wi', 'win', 'wint', 'winte', 'winter', 'mo', 'mock', 'the s', 'zz']
+ROUNDS = 2000
+LIMIT = 10
+
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def main(sizes):
+    rng = random.Random(14)
+    for size in sizes:
+        books = make_books(size, rng)
+        index = PrefixIndex()
+        start = time.perf_counter()
+        index.build(books)
+        build = time.perf_counter() - start
+
+        samples = []
+        for i in range(ROUNDS):
+            prefix = PREFIXES[i % len(PREFIXES)]
+            field = 'author' if i % 4 == 0 else 'title'
+            start = time.perf_counter()
+            index.complete(prefix, field, LIMIT)
+            samples.append(time.perf_counter() - start)
+
+        inserts = []
+        for i in range(200):
+            book = {'id': size + i + 1, 'title': f'Brand New Title {i}', 'author': 'New Author'}
+            start = time.perf_counter()
+            index.add(book)
+            inserts.append(time.perf_counter() - start)
+
+        print(f"{size:>9,} books: build {build:.2f}s | complete p50 {percentile(samples, 0.5) * 1e6:7.1f}us "
+              f"p99 {percentile(samples, 0.99) * 1e6:7.1f}us | insert p99 {percentile(inserts, 0.99) * 1e6:7.1f}us")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000, 1000000])
@@ -0,0 +1,91 @@
+"""
+Benchmark: concurrent borrow throughput and oversell.
+
+Compares the previous four-step borrow (read book, count loans, insert
+record, decrement availability; each its own commit) with the single
+BEGIN IMMEDIATE transaction used by borrow_book_by_patron. Run from the
+repository root:
+
+    python benchmarks/bench_borrow.py
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from services.library_service import borrow_book_by_patron
+
+THREADS = 8
+BORROWS_PER_THREAD = 200
+COPIES = THREADS * BORROWS_PER_THREAD // 2  # half the attempts can succeed
+
+
+def legacy_borrow(patron_id, book_id):
+    """The old borrow sequence, kept here only for comparison."""
+    book = database.get_book_by_id(book_id)
+    if not book or book['available_copies'] <= 0:
+        return False
+    if database.get_patron_borrow_count(patron_id) >= 5:
+        return False
+    borrow_date = datetime.now()
+    if not database.insert_borrow_record(patron_id, book_id, borrow_date, borrow_date + timedelta(days=14)):
+        return False
+    return database.update_book_availability(book_id, -1)
+
+
+def atomic_borrow(patron_id, book_id):
+    return borrow_book_by_patron(patron_id, book_id)[0]
+
+
+def run(borrow, label, isbn):
+    database.insert_book(label, 'Bench', isbn, COPIES, COPIES)
+    book_id = database.get_book_by_isbn(isbn)['id']
+    start = threading.Barrier(THREADS + 1)
+    successes = []
+
+    def worker(t):
+        start.wait()
+        ok = 0
+        for i in range(BORROWS_PER_THREAD):
+            # a fresh patron per attempt keeps the 5-book limit out of the way
+            if borrow(f'{(t * BORROWS_PER_THREAD + i) % 1000000:06d}', book_id):
+                ok += 1
+        successes.append(ok)
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(THREADS)]
+    for t in threads:
+        t.start()
+    start.wait()
+    began = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - began
+
+    attempts = THREADS * BORROWS_PER_THREAD
+    available = database.get_book_by_id(book_id)['available_copies']
+    print(f"{label:>8}: {attempts / elapsed:8.0f} attempts/s, {sum(successes):5d} succeeded "
+          f"of {COPIES} copies, final availability {available}")
+    with database.db_transaction() as conn:
+        conn.execute('DELETE FROM borrow_records')
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'bench.db')
+        database.configure_pool(size=THREADS)
+        database.init_database()
+
+        run(legacy_borrow, 'legacy', '9782000000001')
+        run(atomic_borrow, 'atomic', '9782000000002')
+
+        database.close_pool()
+
+
+if __name__ == '__main__':
+    main()
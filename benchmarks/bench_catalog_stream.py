@@ -0,0 +1,77 @@
+"""
+Benchmark: full-catalog rendering, materialized vs. streamed.
+
+Fills a temporary database, then requests the whole catalog both ways:
+rendering get_all_books() into one string (the previous behaviour) and
+streaming /catalog?all=1. Reports time to first byte, total time and
+peak Python memory. Run from the repository root:
+
+    python benchmarks/bench_catalog_stream.py              # 10k and 100k books
+    python benchmarks/bench_catalog_stream.py 500000
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from app import create_app
+from flask import render_template
+
+
+def fill(count):
+    with database.db_transaction() as conn:
+        conn.executemany('''
+            INSERT INTO books (title, author, isbn, total_copies, available_copies, title_norm, author_norm)
+            VALUES (?, ?, ?, 2, 2, ?, ?)
+        ''', ((f'Title {i:07d}', f'Author {i % 977}', f'{9700000000000 + i}',
+               f'title {i:07d}', f'author {i % 977}') for i in range(count)))
+
+
+def measure(produce):
+    """Run produce() -> iterable of chunks; return (ttfb, total, peak bytes)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    chunks = iter(produce())
+    next(chunks)
+    first = time.perf_counter() - start
+    for _ in chunks:
+        pass
+    total = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return first, total, peak
+
+
+def main(sizes):
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            database.DATABASE = os.path.join(tmp, 'library.db')
+            database.close_pool()
+            app = create_app({'TESTING': True})
+            fill(size)
+            database.sync_changes()  # catch up on the bulk insert before timing
+            client = app.test_client()
+
+            def materialized():
+                with app.test_request_context('/catalog'):
+                    return [render_template('catalog.html', books=database.get_all_books(),
+                                            next_cursor=None, cursor=None, limit=50)]
+
+            def streamed():
+                return client.get('/catalog?all=1', buffered=False).response
+
+            print(f"\n{size:,} books")
+            for name, produce in (('materialized', materialized), ('streamed', streamed)):
+                first, total, peak = measure(produce)
+                print(f"  {name:<13} first byte {first * 1000:8.1f} ms   total {total:6.2f} s   "
+                      f"peak {peak / 2**20:7.1f} MiB")
+            database.close_pool()
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000])
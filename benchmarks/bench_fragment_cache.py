@@ -0,0 +1,85 @@
+"""
+Benchmark: full catalog render with and without the row fragment cache.
+
+Fills a temporary database and renders catalog.html over every book:
+with the row markup inlined in the loop (the previous template), with
+a cold fragment cache, with a warm one, and warm again after 1% of the
+books changed availability. Run from the repository root:
+
+    python benchmarks/bench_fragment_cache.py               # 50k books
+    python benchmarks/bench_fragment_cache.py 10000 200000
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from app import create_app
+from benchmarks.bench_catalog_stream import fill
+from services import fragment_cache
+
+ROUNDS = 3
+
+
+def inline_template(app):
+    """catalog.html with the row partial pasted back into its loop."""
+    loader = app.jinja_env.loader
+    page = loader.get_source(app.jinja_env, 'catalog.html')[0]
+    row = loader.get_source(app.jinja_env, '_catalog_row.html')[0]
+    return app.jinja_env.from_string(page.replace('{{ catalog_row(book) }}', row))
+
+
+def best_of(render):
+    best = None
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        render()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main(sizes):
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            database.DATABASE = os.path.join(tmp, 'library.db')
+            database.close_pool()
+            app = create_app({'TESTING': True})
+            fill(size)
+            books = database.get_all_books()
+            context = {'books': books, 'next_cursor': None, 'cursor': None, 'limit': 50, 'streaming': True}
+
+            with app.test_request_context('/catalog'):
+                app.update_template_context(context)
+                inline = inline_template(app)
+                cached = app.jinja_env.get_template('catalog.html')
+
+                def cold():
+                    fragment_cache.get_fragment_cache().clear()
+                    cached.render(context)
+
+                results = [('inline rows', best_of(lambda: inline.render(context))),
+                           ('cache cold', best_of(cold))]
+                cached.render(context)
+                results.append(('cache warm', best_of(lambda: cached.render(context))))
+
+                changed = books[::100]
+                for book in changed:
+                    book['available_copies'] -= 1
+                start = time.perf_counter()
+                cached.render(context)
+                results.append(('1% changed', time.perf_counter() - start))
+
+            stats = fragment_cache.get_fragment_cache_stats()
+            print(f"\n{size:,} books (cache holds {stats['entries']:,} rows, {stats['bytes'] / 2**20:.1f} MiB)")
+            for name, seconds in results:
+                print(f"  {name:<12} {seconds * 1000:8.1f} ms")
+            database.close_pool()
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [50000])
@@ -0,0 +1,99 @@
+"""
+Benchmark: fuzzy search latency vs. catalog size.
+
+Builds the bigram-filtered fuzzy index over synthetic catalogs whose vocabulary
+grows with the catalog, then times typo queries against the index and
+against a linear scan that computes edit distance to every word. The
+synthetic vocabulary is dense and grows linearly with the catalog, which
+is harsher than real titles, whose vocabulary grows much more slowly. Run
+from the repository root:
+
+    python benchmarks/bench_fuzzy_search.py              # 10k and 100k titles
+    python benchmarks/bench_fuzzy_search.py 1000 10000 100000
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.fuzzy_index import FuzzyIndex, edit_distance, max_typos, words
+
+SYLLABLES = 'ka lo mi ne ru sa ti vo ze ba de fi go hu ja ko lu ma no pe ri so ta vu'.split()
+REPEAT = 5
+
+
+def make_vocabulary(size, rng):
+    vocabulary = set()
+    while len(vocabulary) < size:
+        vocabulary.add(''.join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))))
+    return sorted(vocabulary)
+
+
+def make_books(count, rng):
+    vocabulary = make_vocabulary(max(200, count // 4), rng)
+    books = [
+        {'id': i, 'title': ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(1, 4))).title(),
+         'author': f'{rng.choice(vocabulary)} {rng.choice(vocabulary)}'.title()}
+        for i in range(1, count + 1)
+    ]
+    return books, vocabulary
+
+
+def typo(word, rng):
+    position = rng.randrange(len(word))
+    return word[:position] + rng.choice('aeiouxz') + word[position + 1:]
+
+
+def linear_scan(vocabulary_by_book, term):
+    query = words(term)
+    matches = []
+    for book_id, book_words in vocabulary_by_book.items():
+        total = 0
+        for word in query:
+            best = min(edit_distance(word, candidate) for candidate in book_words)
+            if best > max_typos(word):
+                break
+            total += best
+        else:
+            matches.append(book_id)
+    return matches
+
+
+def best_of(func):
+    best = float('inf')
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(sizes):
+    rng = random.Random(15)
+    for size in sizes:
+        books, vocabulary = make_books(size, rng)
+        index = FuzzyIndex()
+        start = time.perf_counter()
+        index.build(books)
+        build = time.perf_counter() - start
+        queries = [typo(rng.choice(vocabulary), rng) for _ in range(20)]
+
+        latencies = sorted(best_of(lambda: index.search(query)) for query in queries)
+        print(f"\n{size:,} books, {index.vocabulary_size():,} words: build {build:.2f}s")
+        print(f"  index  median {latencies[len(latencies) // 2] * 1000:7.2f} ms  "
+              f"max {latencies[-1] * 1000:7.2f} ms")
+
+        if size <= 20000:
+            by_book = {book['id']: set(words(book['title']) + words(book['author'])) for book in books}
+            query = queries[0]
+            assert sorted(key[-1] for key in index.search(query)) == sorted(linear_scan(by_book, query))
+            start = time.perf_counter()
+            linear_scan(by_book, query)
+            print(f"  linear scan (one query) {(time.perf_counter() - start) * 1000:7.2f} ms")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000])
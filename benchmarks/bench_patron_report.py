@@ -0,0 +1,75 @@
+"""
+Benchmark: patron status report latency vs. borrowing history size.
+
+Compares the joined single-query report with the old pattern of one
+get_book_by_id() call per history row. Run from the repository root:
+
+    python benchmarks/bench_patron_report.py
+"""
+
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from services.library_service import get_patron_status_report
+
+PATRON_ID = '555555'
+HISTORY_SIZES = [10, 100, 1000, 2000, 5000]
+REPEAT = 5
+
+
+def seed_history(count):
+    """Give PATRON_ID `count` returned loans spread over the sample books."""
+    now = datetime.now()
+    with database.db_transaction() as conn:
+        conn.execute('DELETE FROM borrow_records WHERE patron_id = ?', (PATRON_ID,))
+        conn.executemany('''
+            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date, return_date)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [
+            (PATRON_ID, i % 3 + 1,
+             database.to_epoch(now - timedelta(days=i + 20)),
+             database.to_epoch(now - timedelta(days=i + 6)),
+             database.to_epoch(now - timedelta(days=i + 7)))
+            for i in range(count)
+        ])
+
+
+def n_plus_one_report():
+    """The previous report's data access: one query per history row."""
+    records = database.get_all_patron_borrow_records(PATRON_ID)
+    return [database.get_book_by_id(record['book_id']) for record in records]
+
+
+def best_of(func):
+    best = float('inf')
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    with tempfile.TemporaryDirectory() as tmp:
+        database.DATABASE = os.path.join(tmp, 'bench.db')
+        database.init_database()
+        database.add_sample_data()
+
+        print(f"{'history':>8} {'joined ms':>10} {'per-row us':>11} {'N+1 ms':>9}")
+        for size in HISTORY_SIZES:
+            seed_history(size)
+            joined = best_of(lambda: get_patron_status_report(PATRON_ID))
+            n_plus_one = best_of(n_plus_one_report)
+            print(f"{size:>8} {joined * 1000:>10.2f} {joined / size * 1e6:>11.2f} {n_plus_one * 1000:>9.2f}")
+
+        database.close_pool()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Benchmark: shared memory-mapped catalog index vs. per-process snapshot.
+
+Fills a temporary database, then compares the memory one worker spends on
+an in-process CatalogSnapshot with the size of the shared index file
+(mapped once for all workers), and times lookups by ID, title searches
+against FTS, an in-place copy update, inserts kept pending and the
+insert that triggers a rebuild. Run from the repository root:
+
+    python benchmarks/bench_shared_catalog.py               # 50k books
+    python benchmarks/bench_shared_catalog.py 10000 200000
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+from benchmarks.bench_catalog_stream import fill
+from services.shared_catalog import PENDING_REBUILD_THRESHOLD, SharedCatalogIndex
+
+LOOKUPS = 20000
+TERMS = ['title 0001', 'title 00499', '7 ', 'zz']
+
+
+def per_call(function, rounds):
+    start = time.perf_counter()
+    for i in range(rounds):
+        function(i)
+    return (time.perf_counter() - start) / rounds
+
+
+def main(sizes):
+    rng = random.Random(25)
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            database.DATABASE = os.path.join(tmp, 'library.db')
+            database.close_pool()
+            database.init_database()
+            fill(size)
+            database.sync_changes()
+            ids = [rng.randint(1, size) for _ in range(LOOKUPS)]
+
+            tracemalloc.start()
+            snapshot = database.load_catalog_snapshot()
+            snapshot_bytes = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            snapshot_lookup = per_call(lambda i: database.get_book_by_id(ids[i]), LOOKUPS)
+            database.drop_catalog_snapshot()
+
+            path = os.path.join(tmp, 'library.db.catalog')
+            shared = SharedCatalogIndex(path)
+            start = time.perf_counter()
+            database.load_catalog_snapshot(shared)
+            build = time.perf_counter() - start
+            # What each further worker keeps after mapping the existing file
+            tracemalloc.start()
+            other_worker = SharedCatalogIndex(path)
+            other_worker.load()
+            shared_heap = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            shared_lookup = per_call(lambda i: database.get_book_by_id(ids[i]), LOOKUPS)
+
+            fts = per_call(lambda i: database.search_books(TERMS[i % len(TERMS)], 'title', limit=20), 200)
+            mapped = per_call(lambda i: shared.search(TERMS[i % len(TERMS)], 'title', limit=20), 200)
+            update = per_call(lambda i: database.update_book_availability(ids[i], -1 if i % 2 else 1), 500)
+            inserts = []
+            for i in range(PENDING_REBUILD_THRESHOLD + 1):
+                if i == PENDING_REBUILD_THRESHOLD:
+                    # Searches merge every pending book before the next insert rebuilds
+                    pending_search = per_call(lambda i: shared.search(TERMS[i % len(TERMS)], 'title', limit=20),
+                                              200)
+                start = time.perf_counter()
+                database.insert_book(f'Brand New Title {i}', 'New Author', f'{9990000000000 + i}', 1, 1)
+                inserts.append(time.perf_counter() - start)
+            rebuild = inserts.pop()
+            pending = sorted(inserts)[len(inserts) // 2]
+
+            stats = shared.stats()
+            print(f"\n{size:,} books")
+            print(f"  memory     snapshot {snapshot_bytes / 2**20:7.1f} MiB per worker | shared file "
+                  f"{stats['bytes'] / 2**20:6.1f} MiB once (+{shared_heap / 2**10:.0f} KiB per worker)")
+            print(f"  lookup     snapshot {snapshot_lookup * 1e6:6.2f} us | shared {shared_lookup * 1e6:6.2f} us")
+            print(f"  search     fts {fts * 1e3:6.2f} ms | shared {mapped * 1e3:6.2f} ms | shared with "
+                  f"{PENDING_REBUILD_THRESHOLD} pending {pending_search * 1e3:6.2f} ms  (limit 20)")
+            print(f"  writes     copy update + sync {update * 1e6:7.1f} us | pending insert "
+                  f"{pending * 1e3:5.2f} ms | insert with rebuild {rebuild * 1e3:7.1f} ms | "
+                  f"initial build {build * 1e3:7.1f} ms")
+            database.close_pool()
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [50000])
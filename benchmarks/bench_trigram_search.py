@@ -0,0 +1,77 @@
+"""
+Benchmark: in-memory trigram index vs. the original linear scan.
+
+Builds synthetic catalogs in memory (no database) and times title and
+author substring queries both ways, plus index build time and size.
+Run from the repository root:
+
+    python benchmarks/bench_trigram_search.py              # 10k and 100k titles
+    python benchmarks/bench_trigram_search.py 10000 1000000
+"""
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.search_index import TrigramIndex
+
+WORDS = ('the of and a to in river night garden winter stone city house light shadow '
+         'silver crown fire glass empire ocean mountain secret letter kingdom song '
+         'memory forest storm iron last first lost hidden golden broken wild').split()
+FIRST = 'Harper George Jane Mary John Toni Italo Haruki Chinua Ursula Octavia Gabriel'.split()
+LAST = 'Lee Orwell Austen Shelley Steinbeck Morrison Calvino Murakami Achebe Le_Guin Butler Marquez'.split()
+QUERIES = [('title', 'winter'), ('title', 'ockin'), ('title', 'den ci'), ('author', 'murak'), ('title', 'zzq')]
+REPEAT = 5
+
+
+def make_books(count, rng):
+    books = []
+    for i in range(1, count + 1):
+        title = ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 6))).title()
+        if i % 5000 == 0:
+            title += ' Mockingbird'
+        author = f'{rng.choice(FIRST)} {rng.choice(LAST)}'
+        books.append({'id': i, 'title': title, 'author': author})
+    return books
+
+
+def linear_scan(books, term, field):
+    term = term.lower()
+    return [book for book in books if term in book[field].lower()]
+
+
+def best_of(func):
+    best = float('inf')
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main(sizes):
+    rng = random.Random(327)
+    for size in sizes:
+        books = make_books(size, rng)
+        index = TrigramIndex()
+        start = time.perf_counter()
+        index.build(books)
+        build = time.perf_counter() - start
+        usage = index.memory_usage()
+        print(f"\n{size:,} books: build {build:.2f}s, index ~{usage['total_bytes'] / 2**20:.1f} MiB "
+              f"({usage['trigrams']:,} trigrams, {usage['posting_entries']:,} postings)")
+        print(f"  {'query':<16} {'hits':>7} {'scan ms':>9} {'index ms':>9} {'speedup':>8}")
+        for field, term in QUERIES:
+            hits = len(index.search(term, field))
+            assert hits == len(linear_scan(books, term, field))
+            scan = best_of(lambda: linear_scan(books, term, field))
+            indexed = best_of(lambda: index.search(term, field))
+            print(f"  {field + ':' + term:<16} {hits:>7} {scan * 1000:>9.2f} {indexed * 1000:>9.2f} "
+                  f"{scan / indexed:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main([int(arg) for arg in sys.argv[1:]] or [10000, 100000])
@@ -3,119 +3,1462 @@ Database module for Library Management System
 Handles all database operations and connections
 """
 
+import logging
 import sqlite3
+import threading
+import time
+import unicodedata
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
 
 # Database configuration
 DATABASE = 'library.db'
 
+# Connection pool configuration
+DB_POOL_SIZE = 8                    # maximum number of open connections
+DB_POOL_TIMEOUT = 30.0              # seconds to wait for a free connection
+DB_HEALTH_CHECK_INTERVAL = 60.0     # seconds a connection may idle before it is re-checked
+
+# Named PRAGMA profiles, applied to every new connection
+DB_PROFILES = {
+    # SQLite defaults: rollback journal, full fsync on every commit
+    'default': {},
+    # WAL lets readers run alongside a writer; NORMAL sync only fsyncs at checkpoints
+    'performance': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -16000,       # negative means KiB, so ~16 MB of page cache
+        'mmap_size': 134217728,     # 128 MB memory-mapped I/O
+        'temp_store': 'MEMORY',
+        'busy_timeout': 5000,       # ms to wait on a lock before "database is locked"
+    },
+}
+DB_PROFILE = 'performance'
+
+logger = logging.getLogger(__name__)
+
+def apply_profile(conn: sqlite3.Connection, profile: str = DB_PROFILE):
+    """Apply the PRAGMAs of a named profile to a connection."""
+    if profile not in DB_PROFILES:
+        raise ValueError(f"Unknown database profile: {profile}")
+    for pragma, value in DB_PROFILES[profile].items():
+        conn.execute(f'PRAGMA {pragma} = {value}')
+
+
+class ConnectionPool:
+    """
+    Pool of long-lived SQLite connections.
+
+    A thread that checks out a connection keeps it until its outermost
+    release, so nested helper calls on the same thread share one connection.
+    Released connections are kept open and preferably handed back to the
+    thread that last used them. At most ``size`` connections are open at once;
+    further checkouts wait for a release.
+    """
+
+    def __init__(self, database: str, size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT,
+                 health_check_interval: float = DB_HEALTH_CHECK_INTERVAL, profile: str = DB_PROFILE):
+        if size < 1:
+            raise ValueError("Pool size must be at least 1.")
+        if profile not in DB_PROFILES:
+            raise ValueError(f"Unknown database profile: {profile}")
+        self.database = database
+        self.profile = profile
+        self.size = size
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._idle = []  # list of (connection, released_at)
+        self._open = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._local = threading.local()
+        self._stats = {
+            'checkouts': 0,
+            'waits': 0,
+            'connections_created': 0,
+            'connections_closed': 0,
+            'health_check_failures': 0,
+        }
+
+    def _create_connection(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.database, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # This enables column access by name
+        try:
+            apply_profile(conn, self.profile)
+        except Exception:
+            conn.close()
+            raise
+        return conn
+
+    def _discard(self, conn: sqlite3.Connection):
+        """Close a connection and free its slot. Caller must hold the lock."""
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+        self._open -= 1
+        self._stats['connections_closed'] += 1
+        self._cond.notify()
+
+    def _take_idle(self):
+        """Pop an idle connection, preferring the one this thread used last."""
+        preferred = getattr(self._local, 'last', None)
+        for i, (conn, released_at) in enumerate(self._idle):
+            if conn is preferred:
+                return self._idle.pop(i)
+        return self._idle.pop()
+
+    def _is_healthy(self, conn: sqlite3.Connection, released_at: float) -> bool:
+        if time.monotonic() - released_at < self.health_check_interval:
+            return True
+        try:
+            conn.execute('SELECT 1').fetchone()
+            return True
+        except sqlite3.Error:
+            return False
+
+    def acquire(self) -> sqlite3.Connection:
+        """Check out a connection for the current thread."""
+        local = self._local
+        held = getattr(local, 'conn', None)
+        if held is not None:
+            local.depth += 1
+            with self._cond:
+                self._stats['checkouts'] += 1
+            return held
+
+        deadline = time.monotonic() + self.timeout
+        with self._cond:
+            self._stats['checkouts'] += 1
+            waited = False
+            while True:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("Connection pool is closed.")
+                if self._idle:
+                    conn, released_at = self._take_idle()
+                    if self._is_healthy(conn, released_at):
+                        break
+                    self._stats['health_check_failures'] += 1
+                    self._discard(conn)
+                    continue
+                if self._open < self.size:
+                    # Reserve the slot before connecting outside the lock
+                    self._open += 1
+                    conn = None
+                    break
+                if not waited:
+                    self._stats['waits'] += 1
+                    waited = True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise sqlite3.OperationalError("Timed out waiting for a database connection.")
+                self._cond.wait(remaining)
+
+        if conn is None:
+            try:
+                conn = self._create_connection()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+            with self._cond:
+                self._stats['connections_created'] += 1
+
+        local.conn = conn
+        local.depth = 1
+        local.last = conn
+        return conn
+
+    def release(self, conn: sqlite3.Connection):
+        """Give back a connection obtained from acquire()."""
+        local = self._local
+        if getattr(local, 'conn', None) is not conn:
+            raise sqlite3.ProgrammingError("Connection was not checked out by this thread.")
+        local.depth -= 1
+        if local.depth > 0:
+            return
+        local.conn = None
+
+        healthy = True
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.Error:
+            healthy = False
+
+        with self._cond:
+            if self._closed or not healthy:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def close(self):
+        """Close all idle connections; busy ones are closed when released."""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._discard(conn)
+            self._cond.notify_all()
+
+    def stats(self) -> Dict:
+        """Return a snapshot of the pool counters."""
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self.size
+            stats['open'] = self._open
+            stats['idle'] = len(self._idle)
+        return stats
+
+
+_pool = None
+_pool_settings = {}  # settings from the last configure_pool() call
+_pool_lock = threading.Lock()
+_watcher = None      # ChangeWatcher for the pool's database, see sync_changes()
+
+def _watch(database: str):
+    """
+    Start following change_log for `database` unless already doing so.
+    Caller must hold _pool_lock. Called whenever a pool is created, before
+    its first write, so none of this process's own changes are skipped.
+    """
+    global _watcher
+    if _watcher is not None and _watcher.database == database:
+        return
+    if _watcher is not None:
+        _watcher.close()
+    _watcher = ChangeWatcher(database)
+
+def _get_pool() -> ConnectionPool:
+    """Return the shared pool, (re)creating it if needed or if DATABASE changed."""
+    global _pool
+    pool = _pool
+    if pool is not None and pool.database == DATABASE and not pool._closed:
+        return pool
+    with _pool_lock:
+        if _pool is None or _pool.database != DATABASE or _pool._closed:
+            if _pool is not None:
+                _pool.close()
+            _pool = ConnectionPool(DATABASE, **_pool_settings)
+            _watch(DATABASE)
+        return _pool
+
+def configure_pool(size: int = DB_POOL_SIZE, timeout: float = DB_POOL_TIMEOUT,
+                   health_check_interval: float = DB_HEALTH_CHECK_INTERVAL, profile: str = DB_PROFILE):
+    """Replace the shared pool with one using the given settings."""
+    global _pool
+    settings = {
+        'size': size,
+        'timeout': timeout,
+        'health_check_interval': health_check_interval,
+        'profile': profile,
+    }
+    with _pool_lock:
+        new_pool = ConnectionPool(DATABASE, **settings)
+        if _pool is not None:
+            _pool.close()
+        _pool = new_pool
+        _watch(DATABASE)
+        _pool_settings.clear()
+        _pool_settings.update(settings)
+
+def close_pool():
+    """
+    Close every pooled connection. The pool is recreated on next use.
+    The catalog snapshot and change watcher are dropped too, since
+    DATABASE may change next.
+    """
+    global _pool, _watcher
+    drop_catalog_snapshot()
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+            _pool = None
+        if _watcher is not None:
+            _watcher.close()
+            _watcher = None
+
+def get_pool_stats() -> Dict:
+    """Get counters (checkouts, waits, connections created, ...) for the shared pool."""
+    return _get_pool().stats()
+
+REPORTED_PRAGMAS = ('journal_mode', 'synchronous', 'cache_size', 'mmap_size', 'temp_store', 'busy_timeout')
+
+def get_pragma_report() -> Dict:
+    """Get the PRAGMA values actually in effect on a pooled connection."""
+    with db_connection() as conn:
+        report = {pragma: conn.execute(f'PRAGMA {pragma}').fetchone()[0] for pragma in REPORTED_PRAGMAS}
+    report['profile'] = _get_pool().profile
+    return report
+
+def log_pragma_report() -> Dict:
+    """Log the PRAGMA values in effect, e.g. at startup, and return them."""
+    report = get_pragma_report()
+    logger.info("SQLite profile %r in effect: %s", report['profile'],
+                ", ".join(f"{pragma}={report[pragma]}" for pragma in REPORTED_PRAGMAS))
+    return report
+
 def get_db_connection():
-    """Get a database connection."""
-    conn = sqlite3.connect(DATABASE)
-    conn.row_factory = sqlite3.Row  # This enables column access by name
-    return conn
+    """Get a pooled database connection. Give it back with release_db_connection()."""
+    return _get_pool().acquire()
 
-def init_database():
-    """Initialize the database with required tables."""
-    conn = get_db_connection()
-    
-    # Create books table
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS books (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            title TEXT NOT NULL,
-            author TEXT NOT NULL,
-            isbn TEXT UNIQUE NOT NULL,
-            total_copies INTEGER NOT NULL,
-            available_copies INTEGER NOT NULL
-        )
-    ''')
-    
-    # Create borrow_records table
+def release_db_connection(conn):
+    """Return a connection obtained from get_db_connection() to the pool."""
+    _get_pool().release(conn)
+
+_txn_stats = {'units_of_work': 0, 'commits': 0, 'rollbacks': 0}
+_txn_stats_lock = threading.Lock()
+
+def _count(stat: str):
+    with _txn_stats_lock:
+        _txn_stats[stat] += 1
+
+def get_transaction_stats() -> Dict:
+    """Get counters for units of work started, commits and rollbacks."""
+    with _txn_stats_lock:
+        return dict(_txn_stats)
+
+
+class UnitOfWork:
+    """
+    One connection and one transaction shared by every helper call.
+
+    The connection is checked out lazily, on the first helper call that needs
+    it, and the transaction ends with a single commit (or rollback) in
+    finish(). A failing write helper marks the unit rollback-only so partial
+    work such as a borrow record without its availability update is undone.
+    """
+
+    def __init__(self):
+        self._pool = None
+        self._conn = None
+        self._on_commit = []
+        self.rollback_only = False
+        self.depth = 1
+
+    @property
+    def conn(self) -> Optional[sqlite3.Connection]:
+        """The connection in use, or None if no helper has needed one yet."""
+        return self._conn
+
+    def connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self._pool = _get_pool()
+            self._conn = self._pool.acquire()
+        return self._conn
+
+    def mark_rollback(self):
+        """Make finish() roll back instead of committing."""
+        self.rollback_only = True
+
+    def on_commit(self, callback):
+        """Run `callback` once the unit's transaction has been committed."""
+        self._on_commit.append(callback)
+
+    def finish(self, commit: bool = True):
+        """Commit or roll back the transaction and release the connection."""
+        conn, self._conn = self._conn, None
+        callbacks, self._on_commit = self._on_commit, []
+        if conn is None:
+            return
+        committed = False
+        try:
+            if commit and not self.rollback_only:
+                if conn.in_transaction:
+                    conn.commit()
+                    _count('commits')
+                committed = True
+            elif conn.in_transaction:
+                conn.rollback()
+                _count('rollbacks')
+        finally:
+            self._pool.release(conn)
+        if committed:
+            for callback in callbacks:
+                callback()
+
+
+_uow_local = threading.local()
+
+def current_unit_of_work() -> Optional[UnitOfWork]:
+    """Get the unit of work bound to the current thread, if any."""
+    return getattr(_uow_local, 'uow', None)
+
+def begin_unit_of_work() -> UnitOfWork:
+    """
+    Bind a unit of work to the current thread.
+
+    If one is already active it is joined rather than replaced, and only the
+    outermost end_unit_of_work() call finishes it.
+    """
+    uow = current_unit_of_work()
+    if uow is not None:
+        uow.depth += 1
+        return uow
+    uow = UnitOfWork()
+    _uow_local.uow = uow
+    _count('units_of_work')
+    return uow
+
+def end_unit_of_work(uow: UnitOfWork, error: Optional[BaseException] = None):
+    """Finish a unit of work: commit unless an error occurred or it was marked for rollback."""
+    uow.depth -= 1
+    if uow.depth > 0:
+        if error is not None:
+            uow.mark_rollback()
+        return
+    if current_unit_of_work() is uow:
+        _uow_local.uow = None
+    uow.finish(commit=error is None)
+
+@contextmanager
+def unit_of_work():
+    """
+    Run a block of helper calls as one transaction outside of a Flask request.
+
+    Example:
+        with unit_of_work():
+            borrow_book_by_patron("123456", 1)
+    """
+    uow = begin_unit_of_work()
+    try:
+        yield uow
+    except BaseException as e:
+        end_unit_of_work(uow, e)
+        raise
+    end_unit_of_work(uow)
+
+@contextmanager
+def db_connection():
+    """
+    Context manager yielding a connection for reads.
+
+    Uses the active unit of work's connection if there is one, otherwise
+    checks a pooled connection out and back in.
+    """
+    uow = current_unit_of_work()
+    if uow is not None:
+        yield uow.connection()
+        return
+    pool = _get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+    finally:
+        pool.release(conn)
+
+@contextmanager
+def db_transaction():
+    """
+    Context manager yielding a connection for writes.
+
+    Inside a unit of work the commit is deferred to the end of the unit and
+    an error marks it for rollback. Otherwise the block is committed on its
+    own, or rolled back if it raises.
+    """
+    uow = current_unit_of_work()
+    if uow is not None:
+        try:
+            yield uow.connection()
+        except BaseException:
+            uow.mark_rollback()
+            raise
+        return
+    pool = _get_pool()
+    conn = pool.acquire()
+    try:
+        yield conn
+        if conn.in_transaction:
+            conn.commit()
+            _count('commits')
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+            _count('rollbacks')
+        raise
+    finally:
+        pool.release(conn)
+
+@contextmanager
+def immediate_transaction():
+    """
+    Context manager yielding a connection inside a BEGIN IMMEDIATE transaction.
+
+    The write lock is taken up front, so read-check-write sequences cannot
+    interleave with another writer. Inside a unit of work that already has a
+    transaction open, the block runs in a savepoint and is committed with the
+    unit; otherwise it is committed on exit. Errors roll the block back.
+    """
+    uow = current_unit_of_work()
+    if uow is not None:
+        conn = uow.connection()
+        pool = None
+    else:
+        pool = _get_pool()
+        conn = pool.acquire()
+    savepoint = conn.in_transaction
+    try:
+        conn.execute('SAVEPOINT immediate_block' if savepoint else 'BEGIN IMMEDIATE')
+        try:
+            yield conn
+        except BaseException:
+            if savepoint:
+                conn.execute('ROLLBACK TO immediate_block')
+                conn.execute('RELEASE immediate_block')
+            else:
+                conn.rollback()
+                _count('rollbacks')
+            if uow is not None:
+                uow.mark_rollback()
+            raise
+        if savepoint:
+            conn.execute('RELEASE immediate_block')
+        elif uow is None:
+            conn.commit()
+            _count('commits')
+    finally:
+        if pool is not None:
+            pool.release(conn)
+
+
+# Change listeners are called as listener(event, book_id) after a change has
+# been committed, so in-process indexes and caches can follow the database.
+# Events: 'book_inserted', 'availability_changed', 'book_updated',
+# 'book_deleted' (books) and 'loan_changed' (borrow_records). RESYNC_EVENT
+# (with book_id 0) replaces them when this process missed changes that were
+# pruned from the log: listeners must then rebuild from the tables.
+#
+# Triggers record every change in the change_log table, and sync_changes()
+# turns log rows this process has not seen yet into events. Changes
+# committed by other processes, or by raw SQL, are therefore seen the same
+# way as our own, in commit order and exactly once.
+_change_listeners = []
+
+# Per domain, the change_log seq of the latest change applied in this
+# process. Caches and HTTP validators compare them to tell whether what they
+# hold is still current without querying the database; since they come from
+# the shared log, every process that has synced agrees on them.
+_versions = {'catalog': 0, 'loans': 0}
+_versions_lock = threading.Lock()
+
+# Which version each change event moves
+EVENT_DOMAINS = {
+    'book_inserted': 'catalog',
+    'availability_changed': 'catalog',
+    'book_updated': 'catalog',
+    'book_deleted': 'catalog',
+    'loan_changed': 'loans',
+}
+
+RESYNC_EVENT = 'resync'
+
+CHANGE_LOG_RETENTION = 10000        # log rows kept for processes that have fallen behind
+SNAPSHOT_RELOAD_THRESHOLD = 1000    # changed books in one sync above which the snapshot is reloaded
+
+def get_catalog_version() -> int:
+    """Get the catalog version, the log seq of the latest committed book change."""
+    return _versions['catalog']
+
+def get_loan_version() -> int:
+    """Get the loan version, the log seq of the latest committed borrow record change."""
+    return _versions['loans']
+
+def in_write_transaction() -> bool:
+    """True if the current unit of work has uncommitted writes."""
+    uow = current_unit_of_work()
+    return uow is not None and uow.conn is not None and uow.conn.in_transaction
+
+def add_change_listener(listener):
+    """Register a callable to be told about committed book and loan changes."""
+    if listener not in _change_listeners:
+        _change_listeners.append(listener)
+
+def remove_change_listener(listener):
+    """Unregister a listener added with add_change_listener()."""
+    if listener in _change_listeners:
+        _change_listeners.remove(listener)
+
+
+class ChangeWatcher:
+    """
+    Reads new change_log rows for one database file.
+
+    A dedicated connection asks SQLite for PRAGMA data_version, which
+    changes whenever any other connection, in this process or another,
+    commits. Only then is the log itself queried, so a check with nothing
+    new costs one PRAGMA.
+    """
+
+    def __init__(self, database: str):
+        self.database = database
+        self._conn = sqlite3.connect(database, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        # Reentrant: a listener that writes syncs again from inside a sync
+        self._lock = threading.RLock()
+        self._data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+        self._last_seq = self._log_end()
+        with _versions_lock:
+            _versions.update(self._domain_ends())
+        self._pruned_through = 0
+        self._stats = {'checks': 0, 'changes': 0, 'resyncs': 0}
+
+    def _log_end(self) -> int:
+        if not _has_table(self._conn, 'change_log'):
+            return 0
+        return self._conn.execute('SELECT COALESCE(MAX(seq), 0) FROM change_log').fetchone()[0]
+
+    def _domain_ends(self) -> Dict[str, int]:
+        """The seq of the latest logged change in each version domain."""
+        ends = dict.fromkeys(_versions, 0)
+        if _has_table(self._conn, 'change_log'):
+            for event, seq in self._conn.execute('SELECT event, MAX(seq) FROM change_log GROUP BY event'):
+                domain = EVENT_DOMAINS.get(event)
+                if domain is not None:
+                    ends[domain] = max(ends[domain], seq)
+        return ends
+
+    def sync(self) -> int:
+        """Apply every change committed since the last sync; return how many there were."""
+        with self._lock:
+            self._stats['checks'] += 1
+            data_version = self._conn.execute('PRAGMA data_version').fetchone()[0]
+            if data_version == self._data_version:
+                return 0
+            self._data_version = data_version
+            if not _has_table(self._conn, 'change_log'):
+                return 0
+            rows = self._conn.execute(
+                'SELECT seq, event, book_id FROM change_log WHERE seq > ? ORDER BY seq',
+                (self._last_seq,)
+            ).fetchall()
+            if not rows:
+                return 0
+            # Sequence numbers have no holes, so fewer rows than the seq
+            # advanced by means rows this process never saw were pruned
+            missed = rows[-1]['seq'] - self._last_seq != len(rows)
+            self._last_seq = rows[-1]['seq']
+            self._stats['changes'] += len(rows)
+            if missed:
+                self._stats['resyncs'] += 1
+            versions = {}
+            for row in rows:
+                domain = EVENT_DOMAINS.get(row['event'])
+                if domain is not None:
+                    versions[domain] = row['seq']
+            _apply_changes([(row['event'], row['book_id']) for row in rows], missed, versions)
+            self._prune()
+            return len(rows)
+
+    def _prune(self):
+        """
+        Trim the log now and then, keeping CHANGE_LOG_RETENTION rows for
+        slower processes and the latest row of every event, so a process
+        that starts later still reads the same versions from it.
+        """
+        if self._last_seq - self._pruned_through < 2 * CHANGE_LOG_RETENTION:
+            return
+        cutoff = self._last_seq - CHANGE_LOG_RETENTION
+        try:
+            self._conn.execute(
+                'DELETE FROM change_log WHERE seq <= ? '
+                'AND seq NOT IN (SELECT MAX(seq) FROM change_log GROUP BY event)',
+                (cutoff,)
+            )
+        except sqlite3.OperationalError as e:
+            logger.debug("Skipped change_log pruning: %s", e)
+            return
+        self._pruned_through = cutoff
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['last_seq'] = self._last_seq
+        return stats
+
+
+def _apply_changes(changes: List[Tuple[str, int]], missed: bool = False,
+                   versions: Optional[Dict[str, int]] = None):
+    """
+    Bring in-process state up to date with committed changes: the catalog
+    snapshot first, then listeners, which may look books up, then versions.
+
+    Args:
+        changes: (event, book_id) pairs in commit order
+        missed: Earlier changes were pruned before this process read them,
+                so the snapshot is reloaded and listeners get RESYNC_EVENT
+                instead of `changes`
+        versions: New version of each domain the changes touched
+    """
+    changes = [(event, book_id) for event, book_id in changes if event in EVENT_DOMAINS]
+    snapshot = _snapshot
+    if snapshot is not None:
+        books = list(dict.fromkeys(book_id for event, book_id in changes
+                                   if EVENT_DOMAINS[event] == 'catalog'))
+        try:
+            if missed or len(books) > SNAPSHOT_RELOAD_THRESHOLD:
+                snapshot.load()
+            else:
+                snapshot.refresh_many(books)
+        except Exception:
+            logger.exception("Could not refresh the catalog snapshot; dropping it")
+            drop_catalog_snapshot()
+    if missed:
+        logger.warning("Changes were pruned from change_log before this process read them; resyncing")
+        # Replaying the rest cannot undo edits and deletes that were never seen
+        changes = [(RESYNC_EVENT, 0)]
+    for event, book_id in changes:
+        _notify(event, book_id)
+    # Only now, so nothing a cache computes while the listeners are still
+    # updating the indexes can be stored under the new versions
+    if versions:
+        with _versions_lock:
+            _versions.update(versions)
+
+def _notify(event: str, book_id: int):
+    for listener in list(_change_listeners):
+        try:
+            listener(event, book_id)
+        except Exception:
+            logger.exception("Change listener %r failed on %s for book %s", listener, event, book_id)
+
+def sync_changes() -> int:
+    """
+    Apply changes committed since the last call, by this process or any
+    other. Cheap when nothing changed, so it can run before every request.
+
+    Returns:
+        int: Number of changes applied
+    """
+    _get_pool()
+    return _watcher.sync()
+
+def get_change_stats() -> Dict:
+    """Get counters for sync checks, changes applied and resyncs after missed changes."""
+    _get_pool()
+    return _watcher.stats()
+
+def _sync_after_commit():
+    """Apply this write's changes now, or when the active unit of work commits."""
+    uow = current_unit_of_work()
+    if uow is not None:
+        if _sync_quietly not in uow._on_commit:
+            uow.on_commit(_sync_quietly)
+    else:
+        _sync_quietly()
+
+def _sync_quietly():
+    # The write itself has committed; whatever a failed sync missed is
+    # picked up by the next one
+    try:
+        sync_changes()
+    except Exception:
+        logger.exception("Could not apply committed changes")
+
+# Timestamps are stored as integer seconds since the epoch. to_epoch() and
+# to_datetime() also accept ISO-8601 text so rows written before the epoch
+# migration (or by a process that has not run it yet) still read correctly.
+
+def to_epoch(value) -> Optional[int]:
+    """Convert a datetime, ISO-8601 string or epoch number to epoch seconds."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return int(value.timestamp())
+    if isinstance(value, (int, float)):
+        return int(value)
+    if value.isdigit():
+        return int(value)
+    return int(datetime.fromisoformat(value).timestamp())
+
+def to_datetime(value) -> Optional[datetime]:
+    """Convert a stored timestamp (epoch seconds or ISO-8601 text) to a local datetime."""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value)
+    if value.isdigit():
+        return datetime.fromtimestamp(int(value))
+    return datetime.fromisoformat(value)
+
+# Indexes on borrow_records, shared by the migrations that create them and by
+# the table rebuild in _migrate_borrow_dates_to_epoch()
+IDX_ACTIVE_LOANS_BY_PATRON = '''CREATE INDEX IF NOT EXISTS idx_borrow_records_active_patron
+    ON borrow_records (patron_id) WHERE return_date IS NULL'''
+IDX_LOANS_BY_PATRON_BOOK = '''CREATE INDEX IF NOT EXISTS idx_borrow_records_patron_book
+    ON borrow_records (patron_id, book_id, return_date)'''
+IDX_LOANS_BY_PATRON_BORROW_DATE = '''CREATE INDEX IF NOT EXISTS idx_borrow_records_patron_borrow_date
+    ON borrow_records (patron_id, borrow_date)'''
+IDX_ACTIVE_LOANS_BY_DUE_DATE = '''CREATE INDEX IF NOT EXISTS idx_borrow_records_active_due_date
+    ON borrow_records (due_date) WHERE return_date IS NULL'''
+
+def _migrate_borrow_dates_to_epoch(conn: sqlite3.Connection):
+    """
+    Rebuild borrow_records with INTEGER epoch-second dates.
+
+    SQLite cannot change a column's type in place (a TEXT column would turn
+    stored integers back into text), so the table is copied. Already-converted
+    databases are left alone.
+    """
+    columns = {row['name']: row['type'] for row in conn.execute('PRAGMA table_info(borrow_records)')}
+    if columns.get('due_date') == 'INTEGER':
+        return
     conn.execute('''
-        CREATE TABLE IF NOT EXISTS borrow_records (
+        CREATE TABLE borrow_records_epoch (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             patron_id TEXT NOT NULL,
             book_id INTEGER NOT NULL,
-            borrow_date TEXT NOT NULL,
-            due_date TEXT NOT NULL,
-            return_date TEXT,
+            borrow_date INTEGER NOT NULL,
+            due_date INTEGER NOT NULL,
+            return_date INTEGER,
             FOREIGN KEY (book_id) REFERENCES books (id)
         )
     ''')
+    rows = conn.execute('SELECT * FROM borrow_records').fetchall()
+    conn.executemany('''
+        INSERT INTO borrow_records_epoch (id, patron_id, book_id, borrow_date, due_date, return_date)
+        VALUES (?, ?, ?, ?, ?, ?)
+    ''', [
+        (row['id'], row['patron_id'], row['book_id'], to_epoch(row['borrow_date']),
+         to_epoch(row['due_date']), to_epoch(row['return_date']))
+        for row in rows
+    ])
+    conn.execute('DROP TABLE borrow_records')
+    conn.execute('ALTER TABLE borrow_records_epoch RENAME TO borrow_records')
+    for index in (IDX_ACTIVE_LOANS_BY_PATRON, IDX_LOANS_BY_PATRON_BOOK, IDX_LOANS_BY_PATRON_BORROW_DATE):
+        conn.execute(index)
+
+def _create_books_fts(conn: sqlite3.Connection):
+    """
+    Create the books_fts full-text index over title and author.
+
+    It is an external-content FTS5 table using the trigram tokenizer, which
+    matches any substring of 3+ characters case-insensitively, and is kept in
+    sync by triggers on books. Availability updates do not touch it. If this
+    SQLite build lacks FTS5 or the trigram tokenizer the step does nothing and
+    search falls back to LIKE.
+    """
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE IF NOT EXISTS books_fts USING fts5(
+                title, author, content='books', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        logger.warning("FTS5 trigram index unavailable, search will use LIKE: %s", e)
+        return
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_insert AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts (rowid, title, author) VALUES (new.id, new.title, new.author);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_delete AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author)
+            VALUES ('delete', old.id, old.title, old.author);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER IF NOT EXISTS books_fts_update AFTER UPDATE OF title, author ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title, author)
+            VALUES ('delete', old.id, old.title, old.author);
+            INSERT INTO books_fts (rowid, title, author) VALUES (new.id, new.title, new.author);
+        END
+    ''')
+    conn.execute("INSERT INTO books_fts (books_fts) VALUES ('rebuild')")
+
+def _create_change_log(conn: sqlite3.Connection):
+    """
+    Create change_log and the triggers that fill it.
+
+    Every committed change to books or borrow_records leaves one row per
+    affected row, naming the change event and book. seq never repeats
+    (AUTOINCREMENT), so readers can resume from the last seq they saw.
+    """
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            event TEXT NOT NULL,
+            book_id INTEGER NOT NULL
+        )
+    ''')
+    triggers = [
+        ('change_log_book_insert', 'AFTER INSERT ON books', "'book_inserted', new.id"),
+        ('change_log_book_copies', 'AFTER UPDATE OF total_copies, available_copies ON books',
+         "'availability_changed', new.id"),
+        ('change_log_book_details', 'AFTER UPDATE OF title, author, isbn ON books', "'book_updated', new.id"),
+        ('change_log_book_delete', 'AFTER DELETE ON books', "'book_deleted', old.id"),
+        ('change_log_loan_insert', 'AFTER INSERT ON borrow_records', "'loan_changed', new.book_id"),
+        ('change_log_loan_update', 'AFTER UPDATE ON borrow_records', "'loan_changed', new.book_id"),
+        ('change_log_loan_delete', 'AFTER DELETE ON borrow_records', "'loan_changed', old.book_id"),
+    ]
+    for name, timing, values in triggers:
+        conn.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {name} {timing} BEGIN
+                INSERT INTO change_log (event, book_id) VALUES ({values});
+            END
+        ''')
+
+# Control characters never belong in search text, and FTS5 reads a NUL as
+# the end of its query; whitespace ones become spaces, the rest are dropped
+_CONTROL_CHARACTERS = {code: ' ' if chr(code).isspace() else None
+                       for code in [*range(0x20), *range(0x7f, 0xa0)]}
+
+def normalize_text(text: str) -> str:
+    """
+    Search form of a title, author or query: casefolded, accents and
+    control characters removed and runs of whitespace collapsed to single
+    spaces.
+    """
+    decomposed = unicodedata.normalize('NFKD', text.casefold().translate(_CONTROL_CHARACTERS))
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.split())
+
+def _add_normalized_columns(conn: sqlite3.Connection):
+    """
+    Add title_norm and author_norm (see normalize_text()) to books, index
+    them, and point books_fts at them instead of the raw columns.
+
+    SQLite cannot casefold or strip accents itself, so insert_book() fills
+    the columns; this step backfills existing rows.
+    """
+    columns = {row[1] for row in conn.execute('PRAGMA table_info(books)')}
+    for column in ('title_norm', 'author_norm'):
+        if column not in columns:
+            conn.execute(f"ALTER TABLE books ADD COLUMN {column} TEXT NOT NULL DEFAULT ''")
+    rows = conn.execute('SELECT id, title, author FROM books').fetchall()
+    conn.executemany(
+        'UPDATE books SET title_norm = ?, author_norm = ? WHERE id = ?',
+        [(normalize_text(title), normalize_text(author), book_id) for book_id, title, author in rows]
+    )
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_books_title_norm ON books (title_norm)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_books_author_norm ON books (author_norm)')
+
+    # Rebuild the full-text index over the normalized columns
+    for trigger in ('books_fts_insert', 'books_fts_delete', 'books_fts_update'):
+        conn.execute(f'DROP TRIGGER IF EXISTS {trigger}')
+    conn.execute('DROP TABLE IF EXISTS books_fts')
+    try:
+        conn.execute('''
+            CREATE VIRTUAL TABLE books_fts USING fts5(
+                title_norm, author_norm, content='books', content_rowid='id', tokenize='trigram'
+            )
+        ''')
+    except sqlite3.OperationalError as e:
+        logger.warning("FTS5 trigram index unavailable, search will use LIKE: %s", e)
+        return
+    conn.execute('''
+        CREATE TRIGGER books_fts_insert AFTER INSERT ON books BEGIN
+            INSERT INTO books_fts (rowid, title_norm, author_norm)
+            VALUES (new.id, new.title_norm, new.author_norm);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER books_fts_delete AFTER DELETE ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title_norm, author_norm)
+            VALUES ('delete', old.id, old.title_norm, old.author_norm);
+        END
+    ''')
+    conn.execute('''
+        CREATE TRIGGER books_fts_update AFTER UPDATE OF title_norm, author_norm ON books BEGIN
+            INSERT INTO books_fts (books_fts, rowid, title_norm, author_norm)
+            VALUES ('delete', old.id, old.title_norm, old.author_norm);
+            INSERT INTO books_fts (rowid, title_norm, author_norm)
+            VALUES (new.id, new.title_norm, new.author_norm);
+        END
+    ''')
+    conn.execute("INSERT INTO books_fts (books_fts) VALUES ('rebuild')")
+
+# Schema migrations, applied in order by init_database(). Each step is a
+# (version, description, statements) tuple; a statement is either SQL text or
+# a callable taking the connection. Steps must be safe to run more than once.
+MIGRATIONS = [
+    (1, 'Index active loans by patron', [IDX_ACTIVE_LOANS_BY_PATRON]),
+    (2, 'Index loans by patron, book and return date', [IDX_LOANS_BY_PATRON_BOOK]),
+    (3, 'Index loan history by patron and borrow date', [IDX_LOANS_BY_PATRON_BORROW_DATE]),
+    (4, 'Index books by title', [
+        'CREATE INDEX IF NOT EXISTS idx_books_title ON books (title)',
+    ]),
+    (5, 'Store borrow_records dates as integer epoch seconds', [_migrate_borrow_dates_to_epoch]),
+    (6, 'Index active loans by due date', [IDX_ACTIVE_LOANS_BY_DUE_DATE]),
+    (7, 'Full-text index on book title and author', [_create_books_fts]),
+    (8, 'Normalized, indexed title and author search columns', [_add_normalized_columns]),
+    (9, 'Change log filled by triggers, for cross-process cache coherence', [_create_change_log]),
+]
+
+def get_schema_version(conn: Optional[sqlite3.Connection] = None) -> int:
+    """Get the highest migration version applied to the database (0 if none)."""
+    if conn is None:
+        with db_connection() as conn:
+            return get_schema_version(conn)
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_version'"
+    ).fetchone()
+    if not exists:
+        return 0
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+def run_migrations() -> List[int]:
+    """
+    Apply every pending migration, each in its own transaction.
+
+    Returns:
+        list: Versions applied by this call
+    """
+    applied = []
+    with db_connection() as conn:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TEXT NOT NULL
+            )
+        ''')
+        for version, description, statements in MIGRATIONS:
+            if version <= get_schema_version(conn):
+                continue
+            # BEGIN IMMEDIATE takes the write lock up front, so a second
+            # process starting at the same time waits and then sees the step
+            # as already applied
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                if version <= get_schema_version(conn):
+                    conn.rollback()
+                    continue
+                for statement in statements:
+                    if callable(statement):
+                        statement(conn)
+                    else:
+                        conn.execute(statement)
+                conn.execute(
+                    'INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)',
+                    (version, description, datetime.now().isoformat())
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            logger.info("Applied schema migration %d: %s", version, description)
+            applied.append(version)
+    return applied
+
+def init_database():
+    """Initialize the database with required tables and apply pending migrations."""
+    with db_transaction() as conn:
+        # Create books table
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS books (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                title TEXT NOT NULL,
+                author TEXT NOT NULL,
+                isbn TEXT UNIQUE NOT NULL,
+                total_copies INTEGER NOT NULL,
+                available_copies INTEGER NOT NULL
+            )
+        ''')
+        
+        # Create borrow_records table
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS borrow_records (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                patron_id TEXT NOT NULL,
+                book_id INTEGER NOT NULL,
+                borrow_date TEXT NOT NULL,
+                due_date TEXT NOT NULL,
+                return_date TEXT,
+                FOREIGN KEY (book_id) REFERENCES books (id)
+            )
+        ''')
     
-    conn.commit()
-    conn.close()
+    # Bring indexes and later schema changes up to date
+    run_migrations()
 
 def add_sample_data():
     """Add sample data to the database if it's empty."""
-    conn = get_db_connection()
-    book_count = conn.execute('SELECT COUNT(*) as count FROM books').fetchone()['count']
-    
-    if book_count == 0:
-        # Add sample books
-        sample_books = [
-            ('The Great Gatsby', 'F. Scott Fitzgerald', '9780743273565', 3),
-            ('To Kill a Mockingbird', 'Harper Lee', '9780061120084', 2),
-            ('1984', 'George Orwell', '9780451524935', 1)
-        ]
+    with db_transaction() as conn:
+        book_count = conn.execute('SELECT COUNT(*) as count FROM books').fetchone()['count']
         
-        for title, author, isbn, copies in sample_books:
+        if book_count == 0:
+            # Add sample books
+            sample_books = [
+                ('The Great Gatsby', 'F. Scott Fitzgerald', '9780743273565', 3),
+                ('To Kill a Mockingbird', 'Harper Lee', '9780061120084', 2),
+                ('1984', 'George Orwell', '9780451524935', 1)
+            ]
+            
+            for title, author, isbn, copies in sample_books:
+                conn.execute('''
+                    INSERT INTO books (title, author, isbn, total_copies, available_copies,
+                                       title_norm, author_norm)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (title, author, isbn, copies, copies, normalize_text(title), normalize_text(author)))
+            
+            # Make 1984 unavailable by adding a borrow record
             conn.execute('''
-                INSERT INTO books (title, author, isbn, total_copies, available_copies)
-                VALUES (?, ?, ?, ?, ?)
-            ''', (title, author, isbn, copies, copies))
-        
-        # Make 1984 unavailable by adding a borrow record
-        conn.execute('''
-            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
-            VALUES (?, ?, ?, ?)
-        ''', ('123456', 3, 
-              (datetime.now() - timedelta(days=5)).isoformat(),
-              (datetime.now() + timedelta(days=9)).isoformat()))
-        
-        # Update available copies for 1984
-        conn.execute('UPDATE books SET available_copies = 0 WHERE id = 3')
-        
-        conn.commit()
-    
-    conn.close()
+                INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
+                VALUES (?, ?, ?, ?)
+            ''', ('123456', 3, 
+                  to_epoch(datetime.now() - timedelta(days=5)),
+                  to_epoch(datetime.now() + timedelta(days=9))))
+            
+            # Update available copies for 1984
+            conn.execute('UPDATE books SET available_copies = 0 WHERE id = 3')
 
 # Helper Functions for Database Operations
 
+# Book columns returned to callers; the *_norm search columns stay internal
+BOOK_COLUMNS = 'id, title, author, isbn, total_copies, available_copies'
+
 def get_all_books() -> List[Dict]:
     """Get all books from the database."""
-    conn = get_db_connection()
-    books = conn.execute('SELECT * FROM books ORDER BY title').fetchall()
-    conn.close()
+    return list(iter_all_books())
+
+# Rows fetched per round trip by the iter_* readers
+ITER_BATCH_SIZE = 500
+
+def _iter_rows(sql: str, params=(), batch_size: int = ITER_BATCH_SIZE) -> Iterator[Dict]:
+    """
+    Yield the rows of a query as dicts, reading `batch_size` rows at a time
+    so only one batch is in memory.
+
+    The connection stays checked out until the iterator is exhausted or
+    closed, so consume it promptly.
+    """
+    with db_connection() as conn:
+        cursor = conn.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            for row in rows:
+                yield dict(row)
+
+def iter_all_books(batch_size: int = ITER_BATCH_SIZE) -> Iterator[Dict]:
+    """Yield every book in catalog order (title, then ID), `batch_size` rows per fetch."""
+    return _iter_rows(f'SELECT {BOOK_COLUMNS} FROM books ORDER BY title, id', batch_size=batch_size)
+
+def get_books_page(after: Optional[Tuple[str, int]] = None, limit: int = 50) -> List[Dict]:
+    """
+    Get up to `limit` books in catalog order (title, then ID), starting
+    just after the (title, id) keyset position `after`.
+
+    The row-value comparison lets idx_books_title seek straight to the
+    position, so a deep page costs the same as the first.
+    """
+    with db_connection() as conn:
+        if after is None:
+            books = conn.execute(f'''
+                SELECT {BOOK_COLUMNS} FROM books ORDER BY title, id LIMIT ?
+            ''', (limit,)).fetchall()
+        else:
+            books = conn.execute(f'''
+                SELECT {BOOK_COLUMNS} FROM books WHERE (title, id) > (?, ?)
+                ORDER BY title, id LIMIT ?
+            ''', (after[0], after[1], limit)).fetchall()
     return [dict(book) for book in books]
 
+class BookRecord(NamedTuple):
+    """One immutable row of the catalog snapshot, in BOOK_COLUMNS order."""
+    id: int
+    title: str
+    author: str
+    isbn: str
+    total_copies: int
+    available_copies: int
+
+
+class CatalogSnapshot:
+    """
+    Every book as an immutable BookRecord, indexed by ID.
+
+    Readers take no lock: a change swaps in a new record with one dict
+    assignment. Refreshes re-read the committed row and are serialized,
+    so the last record installed is always the newest one read.
+    """
+
+    def __init__(self):
+        self._records = {}  # id -> BookRecord
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._records)
+
+    def get(self, book_id: int) -> Optional[BookRecord]:
+        return self._records.get(book_id)
+
+    def load(self):
+        """Read every book from the database."""
+        with self._lock:
+            self._records = {row['id']: BookRecord(**row)
+                             for row in _iter_rows(f'SELECT {BOOK_COLUMNS} FROM books')}
+
+    def refresh(self, book_id: int):
+        """Replace one book's record with its committed row, or drop it if the row is gone."""
+        with self._lock:
+            with db_connection() as conn:
+                row = conn.execute(f'SELECT {BOOK_COLUMNS} FROM books WHERE id = ?', (book_id,)).fetchone()
+            if row is None:
+                self._records.pop(book_id, None)
+            else:
+                self._records[book_id] = BookRecord(**row)
+
+    def refresh_many(self, book_ids):
+        """refresh() each of `book_ids`."""
+        for book_id in book_ids:
+            self.refresh(book_id)
+
+    def verify(self, repair: bool = True) -> List[int]:
+        """
+        Compare every record with the books table.
+
+        A write that commits during the check can show up as a mismatch;
+        its own refresh puts the right record back either way.
+
+        Args:
+            repair: Replace mismatched records with the rows just read
+
+        Returns:
+            list: IDs whose record was missing, extra or different
+        """
+        with self._lock:
+            records = dict(self._records)
+            mismatched = []
+            for row in _iter_rows(f'SELECT {BOOK_COLUMNS} FROM books'):
+                record = BookRecord(**row)
+                if records.pop(record.id, None) != record:
+                    mismatched.append(record.id)
+                    if repair:
+                        self._records[record.id] = record
+            mismatched.extend(records)
+            if repair:
+                for book_id in records:
+                    self._records.pop(book_id, None)
+        return sorted(mismatched)
+
+
+_snapshot = None
+
+def load_catalog_snapshot(snapshot: Optional[CatalogSnapshot] = None) -> CatalogSnapshot:
+    """
+    Load every book into memory and serve get_book_by_id() and
+    get_books_by_ids() from it. sync_changes() applies committed changes,
+    from this process or any other, before change listeners run.
+
+    Args:
+        snapshot: Snapshot to load and use instead of a new CatalogSnapshot,
+                  e.g. a services.shared_catalog.SharedCatalogIndex
+    """
+    global _snapshot
+    if snapshot is None:
+        snapshot = CatalogSnapshot()
+    # Publish before loading: a change committed mid-load then refreshes
+    # its record after the load, since both hold the snapshot lock
+    _snapshot = snapshot
+    snapshot.load()
+    return snapshot
+
+def drop_catalog_snapshot():
+    """Go back to reading books from the database."""
+    global _snapshot
+    _snapshot = None
+
+def get_catalog_snapshot() -> Optional[CatalogSnapshot]:
+    """Get the loaded catalog snapshot, or None if books are read from the database."""
+    return _snapshot
+
+def _snapshot_for_read() -> Optional[CatalogSnapshot]:
+    """The snapshot, unless this unit of work has uncommitted writes it must see."""
+    snapshot = _snapshot
+    if snapshot is None or in_write_transaction():
+        return None
+    return snapshot
+
 def get_book_by_id(book_id: int) -> Optional[Dict]:
     """Get a specific book by ID."""
-    conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE id = ?', (book_id,)).fetchone()
-    conn.close()
+    snapshot = _snapshot_for_read()
+    if snapshot is not None:
+        record = snapshot.get(book_id)
+        return record._asdict() if record else None
+    with db_connection() as conn:
+        book = conn.execute(f'SELECT {BOOK_COLUMNS} FROM books WHERE id = ?', (book_id,)).fetchone()
     return dict(book) if book else None
 
+# Ids per IN (...) query; stays well under SQLite's bound-variable limit
+# (999 before SQLite 3.32, 32766 after)
+BULK_LOOKUP_CHUNK_SIZE = 500
+
+def get_books_by_ids(book_ids) -> Dict[int, Dict]:
+    """
+    Get many books at once, using chunked IN (...) queries.
+
+    Args:
+        book_ids: Iterable of book IDs; duplicates are fetched once
+
+    Returns:
+        dict: Book dicts keyed by ID. IDs with no matching book are absent.
+    """
+    ids = list(dict.fromkeys(book_ids))
+    books = {}
+    if not ids:
+        return books
+    snapshot = _snapshot_for_read()
+    if snapshot is not None:
+        for book_id in ids:
+            record = snapshot.get(book_id)
+            if record:
+                books[book_id] = record._asdict()
+        return books
+    with db_connection() as conn:
+        for start in range(0, len(ids), BULK_LOOKUP_CHUNK_SIZE):
+            chunk = ids[start:start + BULK_LOOKUP_CHUNK_SIZE]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = conn.execute(f'SELECT {BOOK_COLUMNS} FROM books WHERE id IN ({placeholders})', chunk).fetchall()
+            for row in rows:
+                books[row['id']] = dict(row)
+    return books
+
 def get_book_by_isbn(isbn: str) -> Optional[Dict]:
     """Get a specific book by ISBN."""
-    conn = get_db_connection()
-    book = conn.execute('SELECT * FROM books WHERE isbn = ?', (isbn,)).fetchone()
-    conn.close()
+    with db_connection() as conn:
+        book = conn.execute(f'SELECT {BOOK_COLUMNS} FROM books WHERE isbn = ?', (isbn,)).fetchone()
     return dict(book) if book else None
 
+# Fields search_books() can match on
+SEARCH_FIELDS = ('title', 'author')
+
+# The trigram tokenizer needs at least this many characters to match
+FTS_MIN_TERM_LENGTH = 3
+
+def _has_table(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute('SELECT 1 FROM sqlite_master WHERE name = ?', (name,)).fetchone() is not None
+
+def _like_pattern(term: str) -> str:
+    """LIKE pattern matching `term` anywhere, with wildcards escaped by backslash."""
+    return '%' + term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+def _fts_phrase(column_filter: str, text: str) -> str:
+    """FTS5 query matching `text` as a substring of the filtered columns (a quoted trigram phrase)."""
+    return f'{{{column_filter}}} : "' + text.replace('"', '""') + '"'
+
+def search_books(term: str, field: str, after: Optional[Tuple[str, int]] = None,
+                 limit: Optional[int] = None) -> List[Dict]:
+    """
+    Find books whose title or author contains `term`, ignoring case, accents
+    and repeated whitespace.
+
+    Matches against the normalized title_norm/author_norm columns, through
+    the books_fts trigram index when it exists and the term is long enough,
+    otherwise with a LIKE scan with the same semantics.
+    
+    Args:
+        term: Text to look for anywhere in the field
+        field: 'title' or 'author'
+        after: Optional (title, id) keyset position; only books after it are returned
+        limit: Optional maximum number of books to return
+        
+    Returns:
+        list: Matching books ordered by title, then ID
+    """
+    if field not in SEARCH_FIELDS:
+        raise ValueError(f"Cannot search books by {field!r}")
+    column = f'{field}_norm'
+    term = normalize_text(term)
+    # Keyset pagination: resume strictly after the last (title, id) seen,
+    # which idx_books_title serves directly instead of skipping OFFSET rows
+    keyset = 'AND (b.title, b.id) > (:after_title, :after_id)' if after else ''
+    params = {
+        'after_title': after[0] if after else None,
+        'after_id': after[1] if after else None,
+        'limit': -1 if limit is None else limit,
+    }
+    columns = ', '.join('b.' + name for name in BOOK_COLUMNS.split(', '))
+    with db_connection() as conn:
+        if len(term) >= FTS_MIN_TERM_LENGTH and _has_table(conn, 'books_fts'):
+            params['match'] = _fts_phrase(column, term)
+            books = conn.execute(f'''
+                SELECT {columns} FROM books_fts
+                JOIN books b ON b.id = books_fts.rowid
+                WHERE books_fts MATCH :match {keyset}
+                ORDER BY b.title, b.id
+                LIMIT :limit
+            ''', params).fetchall()
+        else:
+            params['pattern'] = _like_pattern(term)
+            books = conn.execute(f'''
+                SELECT {columns} FROM books b WHERE {column} LIKE :pattern ESCAPE '\\' {keyset}
+                ORDER BY title, id
+                LIMIT :limit
+            ''', params).fetchall()
+    return [dict(book) for book in books]
+
+def search_books_all_fields(term: str, weights: Dict[str, int]) -> List[Dict]:
+    """
+    Find books whose title or author contains `term` (ignoring case, accents
+    and repeated whitespace) or whose ISBN is exactly `term`, in one query
+    that also scores them.
+
+    Title and author are matched through books_fts in one MATCH over both
+    normalized columns when the term is long enough; otherwise by LIKE.
+    
+    Args:
+        term: Text to look for
+        weights: Points for an 'isbn' match, and per 'title'/'author' match
+                 multiplied by 3 (exact), 2 (prefix) or 1 (substring)
+    
+    Returns:
+        list: Matching books with their relevance 'score', unordered
+    """
+    params = {
+        'term': term,
+        'norm': normalize_text(term),
+        'isbn_weight': weights['isbn'],
+        'title_weight': weights['title'],
+        'author_weight': weights['author'],
+    }
+    tiers = {
+        column: f'''CASE WHEN {column} = :norm THEN 3
+                     WHEN substr({column}, 1, length(:norm)) = :norm THEN 2
+                     WHEN instr({column}, :norm) > 0 THEN 1 ELSE 0 END'''
+        for column in ('title_norm', 'author_norm')
+    }
+    score = f'''(CASE WHEN isbn = :term THEN :isbn_weight ELSE 0 END
+                 + :title_weight * {tiers['title_norm']}
+                 + :author_weight * {tiers['author_norm']}) AS score'''
+    with db_connection() as conn:
+        if len(params['norm']) >= FTS_MIN_TERM_LENGTH and _has_table(conn, 'books_fts'):
+            params['match'] = _fts_phrase('title_norm author_norm', params['norm'])
+            books = conn.execute(f'''
+                SELECT {BOOK_COLUMNS}, {score} FROM books
+                WHERE id IN (SELECT rowid FROM books_fts WHERE books_fts MATCH :match)
+                   OR isbn = :term
+            ''', params).fetchall()
+        else:
+            params['pattern'] = _like_pattern(params['norm'])
+            books = conn.execute(f'''
+                SELECT {BOOK_COLUMNS}, {score} FROM books
+                WHERE title_norm LIKE :pattern ESCAPE '\\' OR author_norm LIKE :pattern ESCAPE '\\'
+                   OR isbn = :term
+            ''', params).fetchall()
+    return [dict(book) for book in books]
+
 def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
     """Get currently borrowed books for a patron."""
-    conn = get_db_connection()
-    records = conn.execute('''
-        SELECT br.*, b.title, b.author 
-        FROM borrow_records br 
-        JOIN books b ON br.book_id = b.id 
-        WHERE br.patron_id = ? AND br.return_date IS NULL
-        ORDER BY br.borrow_date
-    ''', (patron_id,)).fetchall()
-    conn.close()
+    with db_connection() as conn:
+        records = conn.execute('''
+            SELECT br.*, b.title, b.author, br.due_date < :now AS is_overdue
+            FROM borrow_records br 
+            JOIN books b ON br.book_id = b.id 
+            WHERE br.patron_id = :patron_id AND br.return_date IS NULL
+            ORDER BY br.borrow_date
+        ''', {'patron_id': patron_id, 'now': to_epoch(datetime.now())}).fetchall()
     
     borrowed_books = []
     for record in records:
@@ -123,102 +1466,236 @@ def get_patron_borrowed_books(patron_id: str) -> List[Dict]:
             'book_id': record['book_id'],
             'title': record['title'],
             'author': record['author'],
-            'borrow_date': datetime.fromisoformat(record['borrow_date']),
-            'due_date': datetime.fromisoformat(record['due_date']),
-            'is_overdue': datetime.now() > datetime.fromisoformat(record['due_date'])
+            'borrow_date': to_datetime(record['borrow_date']),
+            'due_date': to_datetime(record['due_date']),
+            'is_overdue': bool(record['is_overdue'])
         })
     
     return borrowed_books
 
+def get_overdue_loans(as_of: Optional[datetime] = None) -> List[Dict]:
+    """Get all open loans whose due date is before `as_of` (default: now), oldest due first."""
+    if as_of is None:
+        as_of = datetime.now()
+    with db_connection() as conn:
+        records = conn.execute('''
+            SELECT * FROM borrow_records
+            WHERE return_date IS NULL AND due_date < :now
+            ORDER BY due_date
+        ''', {'now': to_epoch(as_of)}).fetchall()
+    return [dict(record) for record in records]
+
 def get_patron_borrow_count(patron_id: str) -> int:
     """Get the number of books currently borrowed by a patron."""
-    conn = get_db_connection()
-    count = conn.execute('''
-        SELECT COUNT(*) as count FROM borrow_records 
-        WHERE patron_id = ? AND return_date IS NULL
-    ''', (patron_id,)).fetchone()['count']
-    conn.close()
+    with db_connection() as conn:
+        count = conn.execute('''
+            SELECT COUNT(*) as count FROM borrow_records 
+            WHERE patron_id = ? AND return_date IS NULL
+        ''', (patron_id,)).fetchone()['count']
     return count
 
 def insert_book(title: str, author: str, isbn: str, total_copies: int, available_copies: int) -> bool:
     """Insert a new book into the database."""
-    conn = get_db_connection()
     try:
-        conn.execute('''
-            INSERT INTO books (title, author, isbn, total_copies, available_copies)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (title, author, isbn, total_copies, available_copies))
-        conn.commit()
-        conn.close()
-        return True
+        with db_transaction() as conn:
+            cursor = conn.execute('''
+                INSERT INTO books (title, author, isbn, total_copies, available_copies,
+                                   title_norm, author_norm)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (title, author, isbn, total_copies, available_copies,
+                  normalize_text(title), normalize_text(author)))
     except Exception as e:
-        conn.close()
         return False
+    _sync_after_commit()
+    return True
 
 def insert_borrow_record(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime) -> bool:
     """Insert a new borrow record into the database."""
-    conn = get_db_connection()
     try:
-        conn.execute('''
-            INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
-            VALUES (?, ?, ?, ?)
-        ''', (patron_id, book_id, borrow_date.isoformat(), due_date.isoformat()))
-        conn.commit()
-        conn.close()
-        return True
+        with db_transaction() as conn:
+            conn.execute('''
+                INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
+                VALUES (?, ?, ?, ?)
+            ''', (patron_id, book_id, to_epoch(borrow_date), to_epoch(due_date)))
     except Exception as e:
-        conn.close()
         return False
+    _sync_after_commit()
+    return True
 
 def update_book_availability(book_id: int, change: int) -> bool:
     """Update the available copies of a book by a given amount (+1 for return, -1 for borrow)."""
-    conn = get_db_connection()
     try:
-        conn.execute('''
-            UPDATE books SET available_copies = available_copies + ? WHERE id = ?
-        ''', (change, book_id))
-        conn.commit()
-        conn.close()
-        return True
+        with db_transaction() as conn:
+            conn.execute('''
+                UPDATE books SET available_copies = available_copies + ? WHERE id = ?
+            ''', (change, book_id))
     except Exception as e:
-        conn.close()
         return False
+    _sync_after_commit()
+    return True
 
 def update_borrow_record_return_date(patron_id: str, book_id: int, return_date: datetime) -> bool:
     """Update the return date for a borrow record."""
-    conn = get_db_connection()
     try:
-        conn.execute('''
-            UPDATE borrow_records 
-            SET return_date = ? 
-            WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
-        ''', (return_date.isoformat(), patron_id, book_id))
-        conn.commit()
-        conn.close()
-        return True
+        with db_transaction() as conn:
+            conn.execute('''
+                UPDATE borrow_records 
+                SET return_date = ? 
+                WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
+            ''', (to_epoch(return_date), patron_id, book_id))
     except Exception as e:
-        conn.close()
         return False
+    _sync_after_commit()
+    return True
     
 def get_borrow_record_by_patron_and_book(patron_id: str, book_id: int) -> Optional[Dict]:
     """Get an active borrow record for a specific patron and book."""
-    conn = get_db_connection()
-    record = conn.execute('''
-        SELECT * FROM borrow_records 
-        WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
-        ORDER BY borrow_date DESC
-        LIMIT 1
-    ''', (patron_id, book_id)).fetchone()
-    conn.close()
+    with db_connection() as conn:
+        record = conn.execute('''
+            SELECT * FROM borrow_records 
+            WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
+            ORDER BY borrow_date DESC
+            LIMIT 1
+        ''', (patron_id, book_id)).fetchone()
     return dict(record) if record else None
 
 def get_all_patron_borrow_records(patron_id: str) -> List[Dict]:
     """Get all borrow records (past and present) for a patron."""
-    conn = get_db_connection()
-    records = conn.execute('''
+    return list(iter_patron_borrow_records(patron_id))
+
+def iter_patron_borrow_records(patron_id: str, batch_size: int = ITER_BATCH_SIZE) -> Iterator[Dict]:
+    """Yield a patron's borrow records, newest first, `batch_size` rows per fetch."""
+    return _iter_rows('''
         SELECT * FROM borrow_records 
         WHERE patron_id = ?
         ORDER BY borrow_date DESC
-    ''', (patron_id,)).fetchall()
-    conn.close()
-    return [dict(record) for record in records]
+    ''', (patron_id,), batch_size)
+
+def get_patron_borrow_history(patron_id: str) -> List[Dict]:
+    """Get all borrow records (past and present) for a patron, joined with book title and author."""
+    return list(iter_patron_borrow_history(patron_id))
+
+def iter_patron_borrow_history(patron_id: str, batch_size: int = ITER_BATCH_SIZE) -> Iterator[Dict]:
+    """Yield a patron's borrow records joined with book title and author, newest first."""
+    return _iter_rows('''
+        SELECT br.*, b.title, b.author
+        FROM borrow_records br
+        JOIN books b ON br.book_id = b.id
+        WHERE br.patron_id = ?
+        ORDER BY br.borrow_date DESC
+    ''', (patron_id,), batch_size)
+
+# Transactional circulation operations
+
+# Outcomes of borrow_book_transaction()
+BORROW_OK = 'ok'
+BORROW_BOOK_NOT_FOUND = 'book_not_found'
+BORROW_UNAVAILABLE = 'unavailable'
+BORROW_LIMIT_REACHED = 'limit_reached'
+BORROW_ERROR = 'error'
+
+def borrow_book_transaction(patron_id: str, book_id: int, borrow_date: datetime, due_date: datetime,
+                            max_borrowed: int) -> Tuple[str, Optional[Dict]]:
+    """
+    Borrow a book in one BEGIN IMMEDIATE transaction.
+
+    The availability decrement is a guarded UPDATE (available_copies > 0), so
+    concurrent borrows can never drive availability below zero; the borrow
+    record is only inserted if that update changed a row.
+    
+    Args:
+        patron_id: 6-digit library card ID
+        book_id: ID of the book to borrow
+        borrow_date: When the book is borrowed
+        due_date: When the book is due back
+        max_borrowed: Most books a patron may have out at once
+        
+    Returns:
+        tuple: (outcome: one of the BORROW_* constants, book: dict or None)
+    """
+    try:
+        with immediate_transaction() as conn:
+            book = conn.execute(f'SELECT {BOOK_COLUMNS} FROM books WHERE id = ?', (book_id,)).fetchone()
+            if not book:
+                return BORROW_BOOK_NOT_FOUND, None
+            book = dict(book)
+            if book['available_copies'] <= 0:
+                return BORROW_UNAVAILABLE, book
+            
+            count = conn.execute('''
+                SELECT COUNT(*) FROM borrow_records
+                WHERE patron_id = ? AND return_date IS NULL
+            ''', (patron_id,)).fetchone()[0]
+            if count >= max_borrowed:
+                return BORROW_LIMIT_REACHED, book
+            
+            cursor = conn.execute('''
+                UPDATE books SET available_copies = available_copies - 1
+                WHERE id = ? AND available_copies > 0
+            ''', (book_id,))
+            if cursor.rowcount != 1:
+                return BORROW_UNAVAILABLE, book
+            
+            conn.execute('''
+                INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date)
+                VALUES (?, ?, ?, ?)
+            ''', (patron_id, book_id, to_epoch(borrow_date), to_epoch(due_date)))
+            book['available_copies'] -= 1
+    except Exception as e:
+        return BORROW_ERROR, None
+    _sync_after_commit()
+    return BORROW_OK, book
+
+# Outcomes of return_book_transaction()
+RETURN_OK = 'ok'
+RETURN_BOOK_NOT_FOUND = 'book_not_found'
+RETURN_NO_ACTIVE_LOAN = 'no_active_loan'
+RETURN_ERROR = 'error'
+
+def return_book_transaction(patron_id: str, book_id: int,
+                            return_date: datetime) -> Tuple[str, Optional[Dict], Optional[Dict]]:
+    """
+    Return a book in one BEGIN IMMEDIATE transaction.
+
+    Closes the patron's most recent open loan of the book by its primary key
+    and increments the book's availability, so the two always change together.
+    
+    Args:
+        patron_id: 6-digit library card ID
+        book_id: ID of the book being returned
+        return_date: When the book was returned
+        
+    Returns:
+        tuple: (outcome: one of the RETURN_* constants, book: dict or None,
+                loan: the closed borrow record as a dict, or None)
+    """
+    try:
+        with immediate_transaction() as conn:
+            book = conn.execute(f'SELECT {BOOK_COLUMNS} FROM books WHERE id = ?', (book_id,)).fetchone()
+            if not book:
+                return RETURN_BOOK_NOT_FOUND, None, None
+            book = dict(book)
+            
+            loan = conn.execute('''
+                SELECT * FROM borrow_records
+                WHERE patron_id = ? AND book_id = ? AND return_date IS NULL
+                ORDER BY borrow_date DESC
+                LIMIT 1
+            ''', (patron_id, book_id)).fetchone()
+            if not loan:
+                return RETURN_NO_ACTIVE_LOAN, book, None
+            loan = dict(loan)
+            
+            conn.execute('''
+                UPDATE borrow_records SET return_date = ?
+                WHERE id = ? AND return_date IS NULL
+            ''', (to_epoch(return_date), loan['id']))
+            conn.execute('''
+                UPDATE books SET available_copies = available_copies + 1 WHERE id = ?
+            ''', (book_id,))
+            loan['return_date'] = to_epoch(return_date)
+            book['available_copies'] += 1
+    except Exception as e:
+        return RETURN_ERROR, None, None
+    _sync_after_commit()
+    return RETURN_OK, book, loan
@@ -3,11 +3,24 @@ API Routes - JSON API endpoints
 """
 
 from flask import Blueprint, jsonify, request
-from services.library_service import calculate_late_fee_for_book, search_books_in_catalog
+from database import get_change_stats, get_pool_stats, get_transaction_stats
+from services.library_service import (
+    calculate_late_fee_for_book, search_books_page, get_autocomplete_suggestions, get_catalog_page,
+    DEFAULT_PAGE_SIZE, DEFAULT_AUTOCOMPLETE_LIMIT, CATALOG_PAGE_SIZE
+)
+from services.fragment_cache import get_fragment_cache_stats
+from services.search_cache import get_search_cache_stats
+from services.search_index import get_trigram_index_stats
+from routes.http_cache import conditional
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
 
+# Late fees grow with the clock as well as with loan changes, so their ETag
+# also rolls over this often (seconds); it bounds how stale a 304 can be
+LATE_FEE_ETAG_PERIOD = 60
+
 @api_bp.route('/late_fee/<patron_id>/<int:book_id>')
+@conditional('loans', period=LATE_FEE_ETAG_PERIOD)
 def get_late_fee(patron_id, book_id):
     """
     Calculate late fee for a specific book borrowed by a patron.
@@ -17,6 +30,7 @@ def get_late_fee(patron_id, book_id):
     return jsonify(result), 501 if 'not implemented' in result.get('status', '') else 200
 
 @api_bp.route('/search')
+@conditional('catalog')
 def search_books_api():
     """
     Search for books via API endpoint.
@@ -24,16 +38,84 @@ def search_books_api():
     """
     search_term = request.args.get('q', '').strip()
     search_type = request.args.get('type', 'title')
+    limit = request.args.get('limit', str(DEFAULT_PAGE_SIZE))
+    cursor = request.args.get('cursor')
     
     if not search_term:
         return jsonify({'error': 'Search term is required'}), 400
+    # isdigit() alone accepts digits like '²' that int() rejects
+    if not (limit.isascii() and limit.isdigit()):
+        return jsonify({'error': 'Limit must be a whole number'}), 400
+    limit = int(limit)
     
-    # Use business logic function
-    books = search_books_in_catalog(search_term, search_type)
+    # Use business logic function; results come one keyset page at a time
+    page = search_books_page(search_term, search_type, limit=limit, cursor=cursor)
+    if 'error' in page:
+        return jsonify({'error': page['error']}), 400
     
     return jsonify({
         'search_term': search_term,
         'search_type': search_type,
-        'results': books,
-        'count': len(books)
+        'results': page['books'],
+        'count': len(page['books']),
+        'next_cursor': page['next_cursor']
+    })
+
+@api_bp.route('/catalog')
+def catalog_api():
+    """
+    List the catalog one keyset page at a time.
+    API endpoint for R2: Book Catalog Display
+    """
+    limit = request.args.get('limit', str(CATALOG_PAGE_SIZE))
+    cursor = request.args.get('cursor')
+    
+    if not (limit.isascii() and limit.isdigit()):
+        return jsonify({'error': 'Limit must be a whole number'}), 400
+    
+    page = get_catalog_page(int(limit), cursor)
+    if 'error' in page:
+        return jsonify({'error': page['error']}), 400
+    
+    return jsonify({
+        'books': page['books'],
+        'count': len(page['books']),
+        'next_cursor': page['next_cursor']
+    })
+
+@api_bp.route('/autocomplete')
+def autocomplete_api():
+    """
+    Suggest titles or authors for type-ahead as the user types.
+    """
+    prefix = request.args.get('q', '')
+    search_type = request.args.get('type', 'title')
+    limit = request.args.get('limit', str(DEFAULT_AUTOCOMPLETE_LIMIT))
+    
+    if search_type not in ['title', 'author']:
+        return jsonify({'error': 'Type must be title or author'}), 400
+    if not (limit.isascii() and limit.isdigit()):
+        return jsonify({'error': 'Limit must be a whole number'}), 400
+    
+    suggestions = get_autocomplete_suggestions(prefix, search_type, int(limit))
+    
+    return jsonify({
+        'query': prefix,
+        'type': search_type,
+        'suggestions': suggestions
+    })
+
+@api_bp.route('/stats')
+def get_stats():
+    """
+    Report connection pool, transaction, change sync, search cache and fragment cache
+    counters, plus the trigram index's memory usage (null unless SEARCH_BACKEND='trigram').
+    """
+    return jsonify({
+        'db_pool': get_pool_stats(),
+        'transactions': get_transaction_stats(),
+        'changes': get_change_stats(),
+        'search_cache': get_search_cache_stats(),
+        'fragment_cache': get_fragment_cache_stats(),
+        'trigram_index': get_trigram_index_stats()
     })
@@ -2,25 +2,87 @@
 Catalog Routes - Book catalog related endpoints
 """
 
-from flask import Blueprint, render_template, request, redirect, url_for, flash
-from database import get_all_books
-from services.library_service import add_book_to_catalog
+import itertools
+
+from flask import (
+    Blueprint, Response, current_app, render_template, request, redirect, url_for, flash,
+    stream_with_context
+)
+from markupsafe import Markup
+from database import get_book_by_isbn, iter_all_books
+from routes.http_cache import conditional
+from services.fragment_cache import cached_fragment
+from services.library_service import (
+    add_book_to_catalog, get_catalog_cursor_for_book, get_catalog_page, CATALOG_PAGE_SIZE
+)
 
 catalog_bp = Blueprint('catalog', __name__)
 
+# Template output pieces per chunk when streaming the full catalog; each
+# cached row is one piece plus the whitespace around it
+STREAM_BUFFER_SIZE = 60
+
+@catalog_bp.app_template_global()
+def catalog_row(book):
+    """
+    One catalog table row, reused from the fragment cache when the book is
+    unchanged since it was last rendered.
+    """
+    key = (book['id'], book['available_copies'], book['total_copies'],
+           hash((book['title'], book['author'], book['isbn'])))
+
+    def render():
+        return current_app.jinja_env.get_template('_catalog_row.html').render(book=book)
+    return Markup(cached_fragment(key, render))
+
 @catalog_bp.route('/')
 def index():
     """Home page redirects to catalog."""
     return redirect(url_for('catalog.catalog'))
 
 @catalog_bp.route('/catalog')
+@conditional('catalog')
 def catalog():
     """
-    Display all books in the catalog.
+    Display the catalog one page at a time, or all of it streamed with ?all=1.
     Implements R2: Book Catalog Display
     """
-    books = get_all_books()
-    return render_template('catalog.html', books=books)
+    if request.args.get('all') == '1':
+        return _stream_full_catalog()
+    
+    limit = request.args.get('limit', str(CATALOG_PAGE_SIZE))
+    cursor = request.args.get('cursor')
+    
+    valid_limit = limit.isascii() and limit.isdigit()
+    page = get_catalog_page(int(limit) if valid_limit else 0, cursor)
+    if 'error' in page:
+        flash(page['error'], 'error')
+        limit, cursor = CATALOG_PAGE_SIZE, None
+        page = get_catalog_page()
+    
+    return render_template('catalog.html', books=page['books'], next_cursor=page['next_cursor'],
+                           cursor=cursor, limit=limit)
+
+def _stream_full_catalog():
+    """
+    Render the whole catalog as a chunked response, reading books in
+    batches while the HTML is generated, so neither the rows nor the page
+    are ever held in memory at once.
+    """
+    books = iter_all_books()
+    first = next(books, None)
+    context = {
+        'books': itertools.chain([first], books) if first is not None else [],
+        'next_cursor': None,
+        'cursor': None,
+        'limit': CATALOG_PAGE_SIZE,
+        'streaming': True,
+    }
+    current_app.update_template_context(context)
+    stream = current_app.jinja_env.get_template('catalog.html').stream(context)
+    # Send a chunk every few rows rather than one per template fragment
+    stream.enable_buffering(STREAM_BUFFER_SIZE)
+    return Response(stream_with_context(stream), mimetype='text/html')
 
 @catalog_bp.route('/add_book', methods=['GET', 'POST'])
 def add_book():
@@ -47,7 +109,10 @@ def add_book():
     
     if success:
         flash(message, 'success')
-        return redirect(url_for('catalog.catalog'))
+        # Open the catalog at the new book, which may sort past the first page
+        book = get_book_by_isbn(isbn)
+        cursor = get_catalog_cursor_for_book(book) if book else None
+        return redirect(url_for('catalog.catalog', cursor=cursor))
     else:
         flash(message, 'error')
         return render_template('add_book.html')
@@ -3,11 +3,13 @@ Search Routes - Book search functionality
 """
 
 from flask import Blueprint, render_template, request, flash
-from services.library_service import search_books_in_catalog
+from services.library_service import search_books_page
+from routes.http_cache import conditional
 
 search_bp = Blueprint('search', __name__)
 
 @search_bp.route('/search')
+@conditional('catalog')
 def search_books():
     """
     Search for books in the catalog.
@@ -15,14 +17,21 @@ def search_books():
     """
     search_term = request.args.get('q', '').strip()
     search_type = request.args.get('type', 'title')
+    cursor = request.args.get('cursor')
     
     if not search_term:
-        return render_template('search.html', books=[], search_term='', search_type=search_type)
+        return render_template('search.html', books=[], search_term='', search_type=search_type,
+                               next_cursor=None)
     
-    # Use business logic function
-    books = search_books_in_catalog(search_term, search_type)
+    # Use business logic function; one keyset page per request
+    page = search_books_page(search_term, search_type, cursor=cursor)
+    if 'error' in page:
+        flash(page['error'], 'error')
+        page = {'books': [], 'next_cursor': None}
+    books = page['books']
     
-    if not books:
+    if not books and not cursor:
         flash('Search functionality is not yet implemented.', 'error')
     
-    return render_template('search.html', books=books, search_term=search_term, search_type=search_type)
+    return render_template('search.html', books=books, search_term=search_term, search_type=search_type,
+                           next_cursor=page['next_cursor'])
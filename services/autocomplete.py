@@ -0,0 +1,172 @@
+"""
+Autocomplete Module - Sorted prefix index for title/author type-ahead
+
+Every word position of every title and author is stored as a normalized
+key in a sorted list. A prefix query bisects to the first key that could
+match and reads forward until it has enough completions, so its cost
+depends on the number of completions asked for, not on catalog size.
+"""
+
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, Iterable, List, Optional
+
+import database
+
+COMPLETION_FIELDS = ('title', 'author')
+
+
+# Keys and prefixes are compared in the same normalized form as database search
+normalize = database.normalize_text
+
+
+def _word_suffixes(text: str) -> List[str]:
+    """The normalized text starting at each of its words, so 'mock' completes 'To Kill a Mockingbird'."""
+    words = normalize(text).split(' ')
+    return [' '.join(words[i:]) for i in range(len(words)) if words[i]]
+
+
+class PrefixIndex:
+    """
+    Sorted (key, value) pairs per field, where value is the original title
+    or author and key is the normalized text from one of its words onward.
+    Pairs are reference-counted so several books can share one value.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._keys = {field: [] for field in COMPLETION_FIELDS}     # field -> sorted [(key, value)]
+        self._counts = {field: {} for field in COMPLETION_FIELDS}   # field -> value -> number of books
+        self._books = {}                                            # book ID -> {field: value} indexed
+
+    def __len__(self):
+        return len(self._books)
+
+    def _new_values(self, book: Dict):
+        """Yield (field, value) for values this book is the first to use. Caller holds the lock."""
+        if book['id'] in self._books:
+            return
+        self._books[book['id']] = {field: book[field] for field in COMPLETION_FIELDS}
+        for field in COMPLETION_FIELDS:
+            value = book[field]
+            counts = self._counts[field]
+            counts[value] = counts.get(value, 0) + 1
+            if counts[value] == 1:
+                yield field, value
+
+    def add(self, book: Dict):
+        """Index one book; adding the same book twice is a no-op."""
+        with self._lock:
+            for field, value in self._new_values(book):
+                for key in _word_suffixes(value):
+                    insort(self._keys[field], (key, value))
+
+    def remove(self, book_id: int):
+        """Drop one book; values no other book uses stop being suggested."""
+        with self._lock:
+            values = self._books.pop(book_id, None)
+            if values is None:
+                return
+            for field, value in values.items():
+                counts = self._counts[field]
+                counts[value] -= 1
+                if counts[value]:
+                    continue
+                del counts[value]
+                keys = self._keys[field]
+                for key in _word_suffixes(value):
+                    position = bisect_left(keys, (key, value))
+                    if position < len(keys) and keys[position] == (key, value):
+                        del keys[position]
+
+    def build(self, books: Iterable[Dict]):
+        """Index every book in `books`, sorting once at the end."""
+        with self._lock:
+            for book in books:
+                for field, value in self._new_values(book):
+                    self._keys[field].extend((key, value) for key in _word_suffixes(value))
+            for keys in self._keys.values():
+                keys.sort()
+
+    def complete(self, prefix: str, field: str, limit: int = 10) -> List[str]:
+        """
+        Find titles or authors with a word starting with `prefix`.
+
+        Args:
+            prefix: Text typed so far, compared case-insensitively
+            field: 'title' or 'author'
+            limit: Most completions to return
+
+        Returns:
+            list: Distinct titles or authors, those starting with the prefix first
+        """
+        if field not in COMPLETION_FIELDS:
+            raise ValueError(f"Cannot complete books by {field!r}")
+        prefix = normalize(prefix)
+        if not prefix or limit <= 0:
+            return []
+        with self._lock:
+            keys = self._keys[field]
+            leading, inner = [], []
+            seen = set()
+            position = bisect_left(keys, (prefix,))
+            while position < len(keys) and len(seen) < limit:
+                key, value = keys[position]
+                if not key.startswith(prefix):
+                    break
+                if value not in seen:
+                    seen.add(value)
+                    (leading if normalize(value) == key else inner).append(value)
+                position += 1
+        return leading + inner
+
+
+_active_index = None
+_maintained_index = None
+
+
+def _on_book_change(event: str, book_id: int):
+    global _active_index, _maintained_index
+    index = _maintained_index
+    if index is not None and event == database.RESYNC_EVENT:
+        # Changes were missed, so rebuild rather than patch
+        index = PrefixIndex()
+        index.build(database.iter_all_books())
+        _active_index = _maintained_index = index
+        return
+    if index is None or event not in ('book_inserted', 'book_updated', 'book_deleted'):
+        return
+    if event != 'book_inserted':
+        index.remove(book_id)
+    if event != 'book_deleted':
+        book = database.get_book_by_id(book_id)
+        if book:
+            index.add(book)
+
+
+def enable_autocomplete() -> PrefixIndex:
+    """
+    Build the prefix index from the books table and keep it current
+    with books added, edited or deleted later (see database.sync_changes()).
+    """
+    global _active_index, _maintained_index
+    index = PrefixIndex()
+    # Listen before loading so a book inserted mid-build is not missed
+    _maintained_index = index
+    database.add_change_listener(_on_book_change)
+    index.build(database.iter_all_books())
+    _active_index = index
+    return index
+
+
+def disable_autocomplete():
+    """Drop the prefix index and stop following changes."""
+    global _active_index, _maintained_index
+    _active_index = None
+    _maintained_index = None
+    database.remove_change_listener(_on_book_change)
+
+
+def get_prefix_index() -> Optional[PrefixIndex]:
+    """Get the active prefix index, or None if autocomplete has not been enabled."""
+    return _active_index
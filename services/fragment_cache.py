@@ -0,0 +1,128 @@
+"""
+Fragment Cache Module - Pre-rendered HTML for catalog rows
+
+A catalog row's markup depends only on the book's fields. Each fragment
+is keyed by (book_id, available_copies, total_copies, hash of title,
+author and ISBN), so any change to the book changes the key, and the old
+fragment is simply never asked for again and ages out of the LRU order.
+Even a render that started from a read taken before an edit stores its
+row under the old key. Edits and deletes, which only come from other
+tools or raw SQL, also drop the book's fragments right away when
+database.sync_changes() reports them, to free the memory.
+"""
+
+import sys
+import threading
+from collections import OrderedDict
+from typing import Dict, Hashable, Optional
+
+import database
+
+DEFAULT_MAX_BYTES = 64 * 2**20
+
+# Bytes each entry costs besides its fragment and key tuple: the
+# (fragment, size) tuple, the size int, and the OrderedDict's hash table
+# slot and link node (measured with tracemalloc on CPython 3.11)
+ENTRY_OVERHEAD = 165
+
+
+def entry_size(key: Hashable, fragment: str) -> int:
+    """Memory one cache entry holds, as counted against the budget."""
+    return sys.getsizeof(fragment) + sys.getsizeof(key) + ENTRY_OVERHEAD
+
+
+class FragmentCache:
+    """LRU cache of rendered fragments bounded by the memory its entries use."""
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (fragment, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    def get(self, key: Hashable) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return entry[0]
+
+    def put(self, key: Hashable, fragment: str):
+        """Store a fragment, evicting the least recently used ones past the budget."""
+        size = entry_size(key, fragment)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            self._entries[key] = (fragment, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+                self._stats['evictions'] += 1
+
+    def discard_book(self, book_id: int):
+        """Drop every fragment of one book, i.e. every key starting with its ID."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == book_id]:
+                _, size = self._entries.pop(key)
+                self._bytes -= size
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        """Hit, miss and eviction counters plus current size."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+            stats['max_bytes'] = self.max_bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+_cache = FragmentCache()
+
+
+def _on_book_change(event: str, book_id: int):
+    if event in ('book_updated', 'book_deleted'):
+        _cache.discard_book(book_id)
+    elif event == database.RESYNC_EVENT:
+        _cache.clear()
+
+
+def configure_fragment_cache(max_bytes: int = DEFAULT_MAX_BYTES):
+    """Replace the shared cache; max_bytes=0 turns caching off."""
+    global _cache
+    _cache = FragmentCache(max_bytes)
+    database.add_change_listener(_on_book_change)
+
+
+def get_fragment_cache() -> FragmentCache:
+    return _cache
+
+
+def cached_fragment(key: Hashable, render) -> str:
+    """Return the cached fragment for `key`, or call `render()` and cache its result."""
+    cache = _cache
+    if cache.max_bytes <= 0:
+        return render()
+    fragment = cache.get(key)
+    if fragment is None:
+        fragment = render()
+        cache.put(key, fragment)
+    return fragment
+
+
+def get_fragment_cache_stats() -> Dict:
+    return _cache.stats()
@@ -0,0 +1,245 @@
+"""
+Fuzzy Index Module - Typo-tolerant title/author search
+
+Words from every title and author form a vocabulary with a bigram index.
+A word within k edits of a query word must share most of its bigrams
+(each edit breaks at most two), so counting shared bigrams over a few
+posting lists yields a small candidate set. Only those candidates are
+checked with a real edit distance, so a typo like "Orwel" or "Gatsbby"
+is never compared against the whole vocabulary.
+"""
+
+import re
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import database
+
+_WORD = re.compile(r'\w+')
+
+
+def words(text: str) -> List[str]:
+    """Words of `text` after database.normalize_text()."""
+    return _WORD.findall(database.normalize_text(text))
+
+
+def bigrams(word: str) -> set:
+    """Bigrams of `word` padded with ^ and $, so a word of n letters has up to n + 1."""
+    padded = '^' + word + '$'
+    return {padded[i:i + 2] for i in range(len(padded) - 1)}
+
+
+def edit_distance(a: str, b: str, limit: Optional[int] = None) -> int:
+    """
+    Levenshtein distance: insertions, deletions and substitutions needed to turn a into b.
+
+    With `limit`, stops early and returns limit + 1 once the distance must exceed it.
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    if limit is not None and len(a) - len(b) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if limit is not None and min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def max_typos(word: str) -> int:
+    """Edits tolerated in a query word: none for very short words, two for long ones."""
+    if len(word) <= 2:
+        return 0
+    if len(word) <= 5:
+        return 1
+    return 2
+
+
+class Vocabulary:
+    """Distinct words with a bigram index for finding near matches."""
+
+    def __init__(self):
+        self._words = []        # word number -> word
+        self._numbers = {}      # word -> word number
+        self._postings = {}     # bigram -> array of word numbers
+
+    def __len__(self):
+        return len(self._words)
+
+    def __contains__(self, word: str):
+        return word in self._numbers
+
+    def add(self, word: str):
+        if word in self._numbers:
+            return
+        number = self._numbers[word] = len(self._words)
+        self._words.append(word)
+        for gram in bigrams(word):
+            ids = self._postings.get(gram)
+            if ids is None:
+                ids = self._postings[gram] = array('i')
+            ids.append(number)
+
+    def search(self, word: str, max_distance: int) -> List[Tuple[int, str]]:
+        """All (distance, word) pairs within `max_distance` of `word`."""
+        if max_distance == 0:
+            return [(0, word)] if word in self._numbers else []
+        grams = bigrams(word)
+        # Count filter: each edit breaks at most two of the query's bigrams
+        needed = len(grams) - 2 * max_distance
+        if needed <= 0:
+            candidates = range(len(self._words))
+        else:
+            shared = {}
+            for gram in grams:
+                for number in self._postings.get(gram, ()):
+                    shared[number] = shared.get(number, 0) + 1
+            candidates = [number for number, count in shared.items() if count >= needed]
+        found = []
+        for number in candidates:
+            candidate = self._words[number]
+            distance = edit_distance(word, candidate, max_distance)
+            if distance <= max_distance:
+                found.append((distance, candidate))
+        return found
+
+
+class FuzzyIndex:
+    """
+    Title and author words of every book, with a bigram-indexed vocabulary.
+
+    A book matches when every query word is within its typo tolerance of
+    some word in the book's title or author; its distance is the sum of
+    those closest distances.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._vocabulary = Vocabulary()
+        self._postings = {}     # word -> set of book IDs
+        self._sort_keys = {}    # id -> (title, id)
+        self._book_words = {}   # id -> words indexed for the book
+
+    def __len__(self):
+        return len(self._sort_keys)
+
+    def add(self, book: Dict):
+        """Index one book; adding the same book twice is a no-op."""
+        with self._lock:
+            if book['id'] in self._sort_keys:
+                return
+            self._sort_keys[book['id']] = (book['title'], book['id'])
+            book_words = self._book_words[book['id']] = tuple(set(words(book['title']) + words(book['author'])))
+            for word in book_words:
+                ids = self._postings.get(word)
+                if ids is None:
+                    ids = self._postings[word] = set()
+                    # A no-op for a word whose books were all removed earlier
+                    self._vocabulary.add(word)
+                ids.add(book['id'])
+
+    def remove(self, book_id: int):
+        """
+        Drop one book. Words left without books stay in the vocabulary,
+        where they only cost a lookup that finds no postings.
+        """
+        with self._lock:
+            if self._sort_keys.pop(book_id, None) is None:
+                return
+            for word in self._book_words.pop(book_id):
+                ids = self._postings[word]
+                ids.discard(book_id)
+                if not ids:
+                    del self._postings[word]
+
+    def build(self, books: Iterable[Dict]):
+        """Index every book in `books`."""
+        for book in books:
+            self.add(book)
+
+    def search(self, term: str) -> List[Tuple[int, str, int]]:
+        """
+        Find books matching `term` allowing typos.
+
+        Returns:
+            list: Unordered (distance, title, id) ranking keys, one per matching book
+        """
+        query = words(term)
+        if not query:
+            return []
+        with self._lock:
+            best = None   # book ID -> summed distance over the query words seen so far
+            for word in query:
+                closest = {}
+                for distance, match in self._vocabulary.search(word, max_typos(word)):
+                    for book_id in self._postings.get(match, ()):
+                        if distance < closest.get(book_id, distance + 1):
+                            closest[book_id] = distance
+                if best is None:
+                    best = closest
+                else:
+                    best = {book_id: best[book_id] + distance
+                            for book_id, distance in closest.items() if book_id in best}
+                if not best:
+                    return []
+            sort_keys = self._sort_keys
+            return [(distance,) + sort_keys[book_id] for book_id, distance in best.items()]
+
+    def vocabulary_size(self) -> int:
+        return len(self._vocabulary)
+
+
+_active_index = None
+_maintained_index = None
+
+
+def _on_book_change(event: str, book_id: int):
+    global _active_index, _maintained_index
+    index = _maintained_index
+    if index is not None and event == database.RESYNC_EVENT:
+        # Changes were missed, so rebuild rather than patch
+        index = FuzzyIndex()
+        index.build(database.iter_all_books())
+        _active_index = _maintained_index = index
+        return
+    if index is None or event not in ('book_inserted', 'book_updated', 'book_deleted'):
+        return
+    if event != 'book_inserted':
+        index.remove(book_id)
+    if event != 'book_deleted':
+        book = database.get_book_by_id(book_id)
+        if book:
+            index.add(book)
+
+
+def enable_fuzzy_search() -> FuzzyIndex:
+    """
+    Build the fuzzy index from the books table and keep it current
+    with books added, edited or deleted later (see database.sync_changes()).
+    """
+    global _active_index, _maintained_index
+    index = FuzzyIndex()
+    # Listen before loading so a book inserted mid-build is not missed
+    _maintained_index = index
+    database.add_change_listener(_on_book_change)
+    index.build(database.iter_all_books())
+    _active_index = index
+    return index
+
+
+def disable_fuzzy_search():
+    """Drop the fuzzy index and stop following changes."""
+    global _active_index, _maintained_index
+    _active_index = None
+    _maintained_index = None
+    database.remove_change_listener(_on_book_change)
+
+
+def get_fuzzy_index() -> Optional[FuzzyIndex]:
+    """Get the active fuzzy index, or None if fuzzy search has not been enabled."""
+    return _active_index
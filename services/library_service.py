@@ -3,18 +3,68 @@ Library Service Module - Business Logic Functions
 Contains all the core business logic for the Library Management System
 """
 
+import base64
+import heapq
+import json
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 
+from services.autocomplete import enable_autocomplete, get_prefix_index
+from services.fuzzy_index import enable_fuzzy_search, get_fuzzy_index
 from services.payment_service import PaymentGateway
+from services.search_cache import cached_search
+from services.search_index import get_trigram_index
+from services.shared_catalog import get_shared_search_index
 
 from database import (
-    get_book_by_id, get_book_by_isbn, get_patron_borrow_count,
-    insert_book, insert_borrow_record, update_book_availability,
-    update_borrow_record_return_date, get_all_books,
-    get_borrow_record_by_patron_and_book, get_all_patron_borrow_records
+    get_book_by_id, get_book_by_isbn, get_books_page,
+    insert_book, search_books, search_books_all_fields, get_books_by_ids,
+    get_borrow_record_by_patron_and_book, iter_patron_borrow_history,
+    borrow_book_transaction, BORROW_OK, BORROW_BOOK_NOT_FOUND,
+    BORROW_UNAVAILABLE, BORROW_LIMIT_REACHED,
+    return_book_transaction, RETURN_OK, RETURN_BOOK_NOT_FOUND, RETURN_NO_ACTIVE_LOAN,
+    in_write_transaction, to_datetime
 )
 
+# Most books a patron may have borrowed at once
+MAX_BORROWED_BOOKS = 5
+
+# Search types accepted by search_books_in_catalog
+SEARCH_TYPES = ['title', 'author', 'isbn', 'fuzzy', 'all']
+
+# Relevance weights for 'all' searches. A title or author match scores its
+# weight times 3 for an exact match, 2 for a prefix and 1 for a substring.
+FIELD_WEIGHTS = {'isbn': 100, 'title': 10, 'author': 5}
+
+# Search results per page, by default and at most
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Books per catalog page, by default
+CATALOG_PAGE_SIZE = 50
+
+# Type-ahead suggestions returned, by default and at most
+DEFAULT_AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 25
+
+def _late_fee_for_days(days_overdue: int) -> float:
+    """
+    Late fee for a number of days overdue: $0.50/day for the first 7 days,
+    $1.00/day after that, capped at $15.00.
+    """
+    if days_overdue <= 0:
+        return 0.0
+    if days_overdue <= 7:
+        fee = days_overdue * 0.50
+    else:
+        # First 7 days at $0.50/day
+        fee = 7 * 0.50
+        # Additional days at $1.00/day
+        fee += (days_overdue - 7) * 1.00
+    
+    # Cap at $15.00
+    return min(fee, 15.00)
+
 def add_book_to_catalog(title: str, author: str, isbn: str, total_copies: int) -> Tuple[bool, str]:
     """
     Add a new book to the catalog.
@@ -76,33 +126,25 @@ def borrow_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return False, "Invalid patron ID. Must be exactly 6 digits."
     
-    # Check if book exists and is available
-    book = get_book_by_id(book_id)
-    if not book:
-        return False, "Book not found."
+    borrow_date = datetime.now()
+    due_date = borrow_date + timedelta(days=14)
     
-    if book['available_copies'] <= 0:
-        return False, "This book is currently not available."
+    # Availability check, limit check, decrement and borrow record all
+    # happen in one transaction so concurrent borrows cannot oversell
+    outcome, book = borrow_book_transaction(patron_id, book_id, borrow_date, due_date, MAX_BORROWED_BOOKS)
     
-    # Check patron's current borrowed books count
-    current_borrowed = get_patron_borrow_count(patron_id)
+    if outcome == BORROW_BOOK_NOT_FOUND:
+        return False, "Book not found."
     
-    if current_borrowed >= 5:
-        return False, "You have reached the maximum borrowing limit of 5 books."
+    if outcome == BORROW_UNAVAILABLE:
+        return False, "This book is currently not available."
     
-    # Create borrow record
-    borrow_date = datetime.now()
-    due_date = borrow_date + timedelta(days=14)
+    if outcome == BORROW_LIMIT_REACHED:
+        return False, f"You have reached the maximum borrowing limit of {MAX_BORROWED_BOOKS} books."
     
-    # Insert borrow record and update availability
-    borrow_success = insert_borrow_record(patron_id, book_id, borrow_date, due_date)
-    if not borrow_success:
+    if outcome != BORROW_OK:
         return False, "Database error occurred while creating borrow record."
     
-    availability_success = update_book_availability(book_id, -1)
-    if not availability_success:
-        return False, "Database error occurred while updating book availability."
-    
     return True, f'Successfully borrowed "{book["title"]}". Due date: {due_date.strftime("%Y-%m-%d")}.'
 
 def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
@@ -121,47 +163,25 @@ def return_book_by_patron(patron_id: str, book_id: int) -> Tuple[bool, str]:
     if not patron_id or not patron_id.isdigit() or len(patron_id) != 6:
         return False, "Invalid patron ID. Must be exactly 6 digits."
     
-    # Check if book exists
-    book = get_book_by_id(book_id)
-    if not book:
+    # Close the loan and put the copy back on the shelf in one transaction
+    return_date = datetime.now()
+    outcome, book, loan = return_book_transaction(patron_id, book_id, return_date)
+    
+    if outcome == RETURN_BOOK_NOT_FOUND:
         return False, "Book not found."
     
-    # Verify the book was borrowed by this patron
-    borrow_record = get_borrow_record_by_patron_and_book(patron_id, book_id)
-    if not borrow_record:
+    if outcome == RETURN_NO_ACTIVE_LOAN:
         return False, "No active borrow record found for this book and patron."
     
-    # Update return date
-    return_date = datetime.now()
-    return_success = update_borrow_record_return_date(borrow_record['id'], return_date)
-    if not return_success:
+    if outcome != RETURN_OK:
         return False, "Database error occurred while recording return."
     
-    # Update available copies
-    availability_success = update_book_availability(book_id, 1)
-    if not availability_success:
-        return False, "Database error occurred while updating book availability."
-    
     # Calculate late fees if applicable
-    due_date = borrow_record['due_date']
-    if isinstance(due_date, str):
-        due_date = datetime.fromisoformat(due_date)
+    due_date = to_datetime(loan['due_date'])
     
-    late_fee = 0.0
     if return_date > due_date:
         days_overdue = (return_date - due_date).days
-        
-        # Calculate fee based on requirements
-        if days_overdue <= 7:
-            late_fee = days_overdue * 0.50
-        else:
-            # First 7 days at $0.50/day
-            late_fee = 7 * 0.50
-            # Additional days at $1.00/day
-            late_fee += (days_overdue - 7) * 1.00
-        
-        # Cap at $15.00
-        late_fee = min(late_fee, 15.00)
+        late_fee = _late_fee_for_days(days_overdue)
         
         return True, f'Book "{book["title"]}" returned successfully. Late fee: ${late_fee:.2f} ({days_overdue} days overdue).'
     else:
@@ -198,9 +218,7 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
         }
     
     # Calculate days overdue
-    due_date = borrow_record['due_date']
-    if isinstance(due_date, str):
-        due_date = datetime.fromisoformat(due_date)
+    due_date = to_datetime(borrow_record['due_date'])
     
     current_date = datetime.now()
     
@@ -212,18 +230,7 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
         }
     
     days_overdue = (current_date - due_date).days
-    
-    # Calculate fee
-    if days_overdue <= 7:
-        fee = days_overdue * 0.50
-    else:
-        # First 7 days at $0.50/day
-        fee = 7 * 0.50
-        # Additional days at $1.00/day
-        fee += (days_overdue - 7) * 1.00
-    
-    # Cap at $15.00
-    fee = min(fee, 15.00)
+    fee = _late_fee_for_days(days_overdue)
     
     return {
         'fee_amount': round(fee, 2),
@@ -231,6 +238,50 @@ def calculate_late_fee_for_book(patron_id: str, book_id: int) -> Dict:
         'status': 'Overdue'
     }
 
+def get_catalog_page(limit: int = CATALOG_PAGE_SIZE, cursor: Optional[str] = None) -> Dict:
+    """
+    Get one page of the catalog, ordered by title then ID.
+    Implements R2: Book Catalog Display
+    
+    Args:
+        limit: Books per page, between 1 and MAX_PAGE_SIZE
+        cursor: `next_cursor` from the previous page, or None for the first page
+        
+    Returns:
+        dict: 'books' and 'next_cursor' (None on the last page), or 'error'
+    """
+    if not isinstance(limit, int) or not 1 <= limit <= MAX_PAGE_SIZE:
+        return {'error': f'Limit must be between 1 and {MAX_PAGE_SIZE}.'}
+    
+    after = None
+    if cursor:
+        after = decode_search_cursor(cursor, 'title')
+        if after is None:
+            return {'error': 'Invalid cursor.'}
+    
+    # Fetch one extra book to learn whether another page follows
+    books = get_books_page(after, limit + 1)
+    next_cursor = None
+    if len(books) > limit:
+        next_cursor = encode_search_cursor(_sort_position(books[limit - 1], 'title'))
+    return {'books': books[:limit], 'next_cursor': next_cursor}
+
+def get_catalog_cursor_for_book(book: Dict, limit: int = CATALOG_PAGE_SIZE) -> Optional[str]:
+    """
+    Get a catalog page cursor whose page shows `book`.
+    
+    Args:
+        book: The book to show
+        limit: Books per page
+        
+    Returns:
+        str: Cursor of a page starting with the book, or None if the first page shows it
+    """
+    if any(row['id'] == book['id'] for row in get_books_page(None, limit)):
+        return None
+    # No book sorts between (title, id - 1) and the book itself
+    return encode_search_cursor((book['title'], book['id'] - 1))
+
 def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
     """
     Search for books in the catalog.
@@ -238,41 +289,199 @@ def search_books_in_catalog(search_term: str, search_type: str) -> List[Dict]:
     
     Args:
         search_term: The term to search for
-        search_type: Type of search ('title', 'author', or 'isbn')
+        search_type: Type of search ('title', 'author', 'isbn', 'fuzzy', or 'all')
         
     Returns:
-        list: List of matching books in the same format as catalog
+        list: List of matching books in the same format as catalog; fuzzy
+              results are closest first and carry their edit 'distance',
+              'all' results are most relevant first and carry their 'score'
     """
     if not search_term or not search_term.strip():
         return []
     
-    if search_type not in ['title', 'author', 'isbn']:
+    if search_type not in SEARCH_TYPES:
         return []
     
-    # Get all books from catalog
-    all_books = get_all_books()
+    search_term = search_term.strip()
+    return cached_search(search_term, search_type,
+                         lambda: _search_books_uncached(search_term, search_type))
+
+def search_books_page(search_term: str, search_type: str, limit: int = DEFAULT_PAGE_SIZE,
+                      cursor: Optional[str] = None) -> Dict:
+    """
+    Get one page of catalog search results, in search_books_in_catalog() order.
+    
+    Pages are keyset-based: `cursor` records the sort position (title and
+    ID, plus distance or score for fuzzy and 'all' searches) of the last
+    book on the previous page, so every page costs the same to fetch.
     
-    if not all_books:
-        return []
+    Args:
+        search_term: The term to search for
+        search_type: Type of search ('title', 'author', 'isbn', 'fuzzy', or 'all')
+        limit: Books per page, between 1 and MAX_PAGE_SIZE
+        cursor: `next_cursor` from the previous page, or None for the first page
+        
+    Returns:
+        dict: 'books' and 'next_cursor' (None on the last page), or 'error'
+    """
+    if not isinstance(limit, int) or not 1 <= limit <= MAX_PAGE_SIZE:
+        return {'error': f'Limit must be between 1 and {MAX_PAGE_SIZE}.'}
+    
+    if not search_term or not search_term.strip() or search_type not in SEARCH_TYPES:
+        return {'books': [], 'next_cursor': None}
+    
+    after = None
+    if cursor:
+        after = decode_search_cursor(cursor, search_type)
+        if after is None:
+            return {'error': 'Invalid cursor.'}
     
     search_term = search_term.strip()
-    results = []
-    
-    for book in all_books:
-        if search_type == 'isbn':
-            # ISBN: Exact matching
-            if book['isbn'] == search_term:
-                results.append(book)
-        elif search_type == 'title':
-            # Title: Partial matching, case-insensitive
-            if search_term.lower() in book['title'].lower():
-                results.append(book)
-        elif search_type == 'author':
-            # Author: Partial matching, case-insensitive
-            if search_term.lower() in book['author'].lower():
-                results.append(book)
-    
-    return results
+    # Fetch one extra book to learn whether another page follows
+    books = cached_search(search_term, search_type,
+                          lambda: _search_books_uncached(search_term, search_type, after, limit + 1),
+                          page=(after, limit))
+    next_cursor = None
+    if len(books) > limit:
+        next_cursor = encode_search_cursor(_sort_position(books[limit - 1], search_type))
+    return {'books': books[:limit], 'next_cursor': next_cursor}
+
+# Types of the values in each search type's sort position
+SQLITE_MIN_INT, SQLITE_MAX_INT = -2**63, 2**63 - 1
+
+_CURSOR_SHAPES = {
+    'title': (str, int),
+    'author': (str, int),
+    'isbn': (str, int),
+    'fuzzy': (int, str, int),
+    'all': (int, str, int),
+}
+
+def _sort_position(book: Dict, search_type: str) -> tuple:
+    """Where `book` sorts in results of `search_type`."""
+    if search_type == 'fuzzy':
+        return book['distance'], book['title'], book['id']
+    if search_type == 'all':
+        return -book['score'], book['title'], book['id']
+    return book['title'], book['id']
+
+def encode_search_cursor(position: tuple) -> str:
+    """Opaque cursor pointing just after the sort `position` of a book."""
+    position = json.dumps(list(position), separators=(',', ':'))
+    return base64.urlsafe_b64encode(position.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_search_cursor(cursor: str, search_type: str) -> Optional[tuple]:
+    """Get the sort position from a cursor, or None if it is malformed for `search_type`."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, TypeError, UnicodeError):
+        return None
+    shape = _CURSOR_SHAPES[search_type]
+    if not isinstance(position, list) or len(position) != len(shape):
+        return None
+    for value, kind in zip(position, shape):
+        if not isinstance(value, kind) or isinstance(value, bool):
+            return None
+        # SQLite cannot bind integers wider than 64 bits
+        if kind is int and not SQLITE_MIN_INT <= value <= SQLITE_MAX_INT:
+            return None
+    return tuple(position)
+
+def _search_books_uncached(search_term: str, search_type: str,
+                           after: Optional[tuple] = None,
+                           limit: Optional[int] = None) -> List[Dict]:
+    """Run a validated catalog search against the indexes, bypassing the result cache."""
+    # The shared index holds committed rows only; a unit of work with its
+    # own uncommitted writes searches the database
+    shared = get_shared_search_index() if not in_write_transaction() else None
+    
+    if search_type == 'isbn':
+        # ISBN: Exact matching, straight to the unique index
+        book = shared.find_isbn(search_term) if shared else get_book_by_isbn(search_term)
+        if not book or (after is not None and (book['title'], book['id']) <= after):
+            return []
+        return [book][:limit]
+    
+    if search_type == 'fuzzy':
+        return _fuzzy_search(search_term, after, limit)
+    
+    if search_type == 'all':
+        return _all_fields_search(search_term, after, limit)
+    
+    # Title/Author: Partial matching, case-insensitive
+    index = get_trigram_index()
+    if index is None and shared is not None:
+        # Memory-mapped index shared by all workers
+        return shared.search(search_term, search_type, after, limit)
+    if index is None:
+        # Full-text index in the database
+        return search_books(search_term, search_type, after, limit)
+    
+    # In-memory trigram index finds the IDs; one bulk query loads current rows
+    book_ids = index.search(search_term, search_type, after, limit)
+    books = get_books_by_ids(book_ids)
+    return [books[book_id] for book_id in book_ids if book_id in books]
+
+def _fuzzy_search(search_term: str, after: Optional[tuple] = None,
+                  limit: Optional[int] = None) -> List[Dict]:
+    """Title/author words within a few typos of the term's words, closest first."""
+    index = get_fuzzy_index()
+    if index is None:
+        # Built once on first use when the app has not built it already
+        index = enable_fuzzy_search()
+    
+    ranked = index.search(search_term)   # (distance, title, id)
+    if after is not None:
+        ranked = [position for position in ranked if position > after]
+    if limit is None:
+        ranked.sort()
+    else:
+        ranked = heapq.nsmallest(limit, ranked)
+    
+    books = get_books_by_ids([book_id for _, _, book_id in ranked])
+    return [dict(books[book_id], distance=distance)
+            for distance, _, book_id in ranked if book_id in books]
+
+def _all_fields_search(search_term: str, after: Optional[tuple] = None,
+                       limit: Optional[int] = None) -> List[Dict]:
+    """Books matching the term in any field, most relevant first, then by title and ID."""
+    # The database scores every match against its normalized columns
+    ranked = []
+    for book in search_books_all_fields(search_term, FIELD_WEIGHTS):
+        position = (-book['score'], book['title'], book['id'])
+        if after is None or position > after:
+            ranked.append((position, book))
+    # Only the top of the ranking is needed for a page, so select it with a heap
+    if limit is None:
+        ranked.sort(key=lambda item: item[0])
+    else:
+        ranked = heapq.nsmallest(limit, ranked, key=lambda item: item[0])
+    return [book for _, book in ranked]
+
+def get_autocomplete_suggestions(prefix: str, search_type: str,
+                                 limit: int = DEFAULT_AUTOCOMPLETE_LIMIT) -> List[str]:
+    """
+    Suggest titles or authors for type-ahead.
+    
+    Args:
+        prefix: Text typed so far; matches the start of any word, case-insensitively
+        search_type: 'title' or 'author'
+        limit: Most suggestions to return, between 1 and MAX_AUTOCOMPLETE_LIMIT
+        
+    Returns:
+        list: Distinct titles or authors (empty for invalid input)
+    """
+    if not prefix or not prefix.strip() or search_type not in ['title', 'author']:
+        return []
+    if not 1 <= limit <= MAX_AUTOCOMPLETE_LIMIT:
+        return []
+    
+    index = get_prefix_index()
+    if index is None:
+        # Built once on first use when the app has not built it already
+        index = enable_autocomplete()
+    return index.complete(prefix, search_type, limit)
 
 def get_patron_status_report(patron_id: str) -> Dict:
     """
@@ -291,8 +500,8 @@ def get_patron_status_report(patron_id: str) -> Dict:
             'error': 'Invalid patron ID'
         }
     
-    # Get all borrow records for this patron
-    borrow_records = get_all_patron_borrow_records(patron_id)
+    # Stream this patron's borrow records with their book details from one query
+    borrow_records = iter_patron_borrow_history(patron_id)
     
     currently_borrowed = []
     borrowing_history = []
@@ -301,53 +510,37 @@ def get_patron_status_report(patron_id: str) -> Dict:
     current_date = datetime.now()
     
     for record in borrow_records:
-        book = get_book_by_id(record['book_id'])
-        
-        if not book:
-            continue
-        
-        due_date = record['due_date']
-        if isinstance(due_date, str):
-            due_date = datetime.fromisoformat(due_date)
+        due_date = to_datetime(record['due_date'])
         
         # Check if currently borrowed (no return date)
         if not record.get('return_date'):
             # Calculate late fee if overdue
             late_fee = 0.0
             if current_date > due_date:
-                days_overdue = (current_date - due_date).days
-                if days_overdue <= 7:
-                    late_fee = days_overdue * 0.50
-                else:
-                    late_fee = 7 * 0.50 + (days_overdue - 7) * 1.00
-                late_fee = min(late_fee, 15.00)
+                late_fee = _late_fee_for_days((current_date - due_date).days)
                 total_late_fees += late_fee
             
             currently_borrowed.append({
-                'book_id': book['id'],
-                'title': book['title'],
-                'author': book['author'],
+                'book_id': record['book_id'],
+                'title': record['title'],
+                'author': record['author'],
                 'due_date': due_date.strftime("%Y-%m-%d"),
                 'late_fee': round(late_fee, 2)
             })
         
         # Add to history
-        borrow_date = record['borrow_date']
-        if isinstance(borrow_date, str):
-            borrow_date = datetime.fromisoformat(borrow_date)
+        borrow_date = to_datetime(record['borrow_date'])
         
         history_entry = {
-            'book_id': book['id'],
-            'title': book['title'],
-            'author': book['author'],
+            'book_id': record['book_id'],
+            'title': record['title'],
+            'author': record['author'],
             'borrow_date': borrow_date.strftime("%Y-%m-%d"),
             'due_date': due_date.strftime("%Y-%m-%d")
         }
         
         if record.get('return_date'):
-            return_date = record['return_date']
-            if isinstance(return_date, str):
-                return_date = datetime.fromisoformat(return_date)
+            return_date = to_datetime(record['return_date'])
             history_entry['return_date'] = return_date.strftime("%Y-%m-%d")
         
         borrowing_history.append(history_entry)
@@ -0,0 +1,142 @@
+"""
+Search Cache Module - LRU/TTL cache for catalog search results
+
+Entries are tagged with the catalog version they were computed at
+(database.get_catalog_version()). Any committed book insert or
+availability change, including one made by another process, bumps that
+version once database.sync_changes() sees it, which empties the cache, so
+cached results never show stale availability.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, List, Optional
+
+import database
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 300.0  # seconds
+
+
+class SearchCache:
+    """Bounded LRU cache of search results with a per-entry time to live."""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (stored_at, results)
+        self._version = None
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0, 'invalidations': 0}
+
+    def _check_version(self, version: int) -> bool:
+        """
+        Drop everything if the catalog moved to a newer version.
+        Caller must hold the lock.
+
+        Returns:
+            bool: False if `version` is older than the cached entries
+        """
+        if self._version is not None and version < self._version:
+            return False
+        if version != self._version:
+            if self._entries:
+                self._stats['invalidations'] += 1
+                self._entries.clear()
+            self._version = version
+        return True
+
+    def get(self, key: Hashable, version: int) -> Optional[List[Dict]]:
+        """Get cached results for `key` if they were computed at `version`."""
+        with self._lock:
+            entry = self._entries.get(key) if self._check_version(version) else None
+            if entry is None:
+                self._stats['misses'] += 1
+                return None
+            stored_at, results = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return [dict(book) for book in results]
+
+    def put(self, key: Hashable, results: List[Dict], version: int):
+        """Store results computed at catalog `version`, evicting the least recently used entries."""
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            if not self._check_version(version):
+                # A write committed while these results were computed
+                return
+            self._entries[key] = (time.monotonic(), [dict(book) for book in results])
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._version = None
+
+    def stats(self) -> Dict:
+        """Hit, miss, eviction, expiration and invalidation counters plus current size."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats['entries'] = len(self._entries)
+            stats['max_entries'] = self.max_entries
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+_cache = SearchCache()
+
+
+def cache_key(search_term: str, search_type: str, page: Optional[tuple] = None) -> tuple:
+    """Normalize a query (and optional page position) so equivalent searches share an entry."""
+    search_term = search_term.strip()
+    if search_type != 'isbn':
+        # Title/author matching compares normalized text; ISBNs match exactly
+        search_term = database.normalize_text(search_term)
+    return search_term, search_type, page
+
+
+def configure_search_cache(max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL):
+    """Replace the shared cache; max_entries=0 turns caching off."""
+    global _cache
+    _cache = SearchCache(max_entries, ttl)
+
+
+def get_search_cache() -> SearchCache:
+    return _cache
+
+
+def cached_search(search_term: str, search_type: str, search, page: Optional[tuple] = None):
+    """
+    Return cached results for the query, or call `search()` and cache its result.
+    `page` identifies one page of a paginated search, e.g. (cursor, limit).
+
+    Caching is skipped while the current unit of work has uncommitted writes,
+    since those results might never be committed.
+    """
+    cache = _cache
+    if cache.max_entries <= 0 or database.in_write_transaction():
+        return search()
+    key = cache_key(search_term, search_type, page)
+    # Read the version before searching: if a write commits meanwhile, the
+    # entry is stored under the old version and is never served
+    version = database.get_catalog_version()
+    results = cache.get(key, version)
+    if results is None:
+        results = search()
+        cache.put(key, results, version)
+    return results
+
+
+def get_search_cache_stats() -> Dict:
+    return _cache.stats()
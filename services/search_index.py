@@ -0,0 +1,212 @@
+"""
+Search Index Module - In-memory trigram index for catalog search
+
+Matches title/author substrings like the database search does, comparing
+normalized text (database.normalize_text), but only checks the books that
+contain the term's rarest trigram instead of every book.
+"""
+
+import heapq
+import sys
+import threading
+from array import array
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import database
+
+INDEXED_FIELDS = ('title', 'author')
+
+
+def trigrams(text: str) -> set:
+    """All 3-character substrings of `text`."""
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TrigramIndex:
+    """
+    Trigram posting lists over normalized title and author.
+
+    Posting lists are compact integer arrays of book IDs. A query takes the
+    posting list of the term's rarest trigram as candidates and verifies each
+    one with a plain substring check, so results are exact.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._text = {field: {} for field in INDEXED_FIELDS}       # field -> id -> normalized text
+        self._postings = {field: {} for field in INDEXED_FIELDS}   # field -> trigram -> array of ids
+        self._sort_keys = {}                                        # id -> (title, id), catalog order
+
+    def __len__(self):
+        return len(self._sort_keys)
+
+    def add(self, book: Dict):
+        """Index (or re-index) one book."""
+        with self._lock:
+            book_id = book['id']
+            if book_id in self._sort_keys:
+                self._remove(book_id)
+            self._sort_keys[book_id] = (book['title'], book_id)
+            for field in INDEXED_FIELDS:
+                text = database.normalize_text(book[field])
+                self._text[field][book_id] = text
+                postings = self._postings[field]
+                for gram in trigrams(text):
+                    ids = postings.get(gram)
+                    if ids is None:
+                        ids = postings[gram] = array('i')
+                    ids.append(book_id)
+
+    def remove(self, book_id: int):
+        """Drop one book from the index; unknown IDs are ignored."""
+        with self._lock:
+            if book_id in self._sort_keys:
+                self._remove(book_id)
+
+    def _remove(self, book_id: int):
+        for field in INDEXED_FIELDS:
+            text = self._text[field].pop(book_id)
+            for gram in trigrams(text):
+                ids = self._postings[field][gram]
+                ids.remove(book_id)
+                if not ids:
+                    del self._postings[field][gram]
+        del self._sort_keys[book_id]
+
+    def build(self, books: Iterable[Dict]):
+        """Index every book in `books`."""
+        for book in books:
+            self.add(book)
+
+    def search(self, term: str, field: str, after: Optional[Tuple[str, int]] = None,
+               limit: Optional[int] = None) -> List[int]:
+        """
+        Find books whose `field` contains `term`, ignoring case, accents and
+        repeated whitespace.
+
+        Args:
+            term: Text to look for anywhere in the field
+            field: 'title' or 'author'
+            after: Optional (title, id) keyset position; only books after it are returned
+            limit: Optional maximum number of IDs to return
+
+        Returns:
+            list: Matching book IDs in catalog order (title, then ID)
+        """
+        if field not in INDEXED_FIELDS:
+            raise ValueError(f"Cannot search books by {field!r}")
+        term = database.normalize_text(term)
+        with self._lock:
+            texts = self._text[field]
+            grams = trigrams(term)
+            if not grams:
+                # Too short for a trigram; scan the in-memory text instead
+                candidates = texts.keys()
+            else:
+                # Every match contains every trigram, so the rarest trigram's
+                # posting list is a complete candidate set. Verifying those
+                # candidates with a substring check costs about the same as
+                # intersecting more lists, and it keeps the result exact.
+                postings = self._postings[field]
+                candidates = min((postings.get(gram, ()) for gram in grams), key=len)
+            sort_keys = self._sort_keys
+            if after is None:
+                matches = [book_id for book_id in candidates if term in texts[book_id]]
+            else:
+                matches = [book_id for book_id in candidates
+                           if sort_keys[book_id] > after and term in texts[book_id]]
+            if limit is not None and limit < len(matches):
+                return heapq.nsmallest(limit, matches, key=sort_keys.__getitem__)
+            matches.sort(key=sort_keys.__getitem__)
+        return matches
+
+    def memory_usage(self) -> Dict:
+        """Approximate memory held by the index, in bytes, plus entry counts."""
+        with self._lock:
+            postings_bytes = 0
+            entries = 0
+            grams = 0
+            for postings in self._postings.values():
+                postings_bytes += sys.getsizeof(postings)
+                grams += len(postings)
+                for gram, ids in postings.items():
+                    postings_bytes += sys.getsizeof(gram) + sys.getsizeof(ids)
+                    entries += len(ids)
+            text_bytes = sum(
+                sys.getsizeof(texts) + sum(sys.getsizeof(text) for text in texts.values())
+                for texts in self._text.values()
+            )
+            key_bytes = sys.getsizeof(self._sort_keys) + sum(
+                sys.getsizeof(key) for key in self._sort_keys.values()
+            )
+        return {
+            'books': len(self._sort_keys),
+            'trigrams': grams,
+            'posting_entries': entries,
+            'postings_bytes': postings_bytes,
+            'text_bytes': text_bytes,
+            'total_bytes': postings_bytes + text_bytes + key_bytes,
+        }
+
+
+_active_index = None       # index used by searches, once fully built
+_maintained_index = None   # index kept up to date by the change listener
+
+
+def _on_book_change(event: str, book_id: int):
+    global _active_index, _maintained_index
+    index = _maintained_index
+    if index is not None and event == database.RESYNC_EVENT:
+        # Changes were missed, so rebuild rather than patch
+        index = TrigramIndex()
+        index.build(database.iter_all_books())
+        _active_index = _maintained_index = index
+        return
+    if index is None:
+        return
+    if event == 'book_deleted':
+        index.remove(book_id)
+    elif event in ('book_inserted', 'book_updated'):
+        book = database.get_book_by_id(book_id)
+        if book:
+            # add() replaces whatever was indexed for the book before
+            index.add(book)
+        else:
+            index.remove(book_id)
+
+
+def enable_trigram_search() -> TrigramIndex:
+    """
+    Build a trigram index from the books table and use it for searches.
+
+    The index follows books added, edited or deleted later, by this
+    process or another (see database.sync_changes()).
+    """
+    global _active_index, _maintained_index
+    index = TrigramIndex()
+    # Listen before loading so a book inserted mid-build is not missed;
+    # add() tolerates seeing the same book twice
+    _maintained_index = index
+    database.add_change_listener(_on_book_change)
+    index.build(database.iter_all_books())
+    _active_index = index
+    return index
+
+
+def disable_trigram_search():
+    """Stop using the trigram index; searches go back to the database."""
+    global _active_index, _maintained_index
+    _active_index = None
+    _maintained_index = None
+    database.remove_change_listener(_on_book_change)
+
+
+def get_trigram_index() -> Optional[TrigramIndex]:
+    """Get the active trigram index, or None if trigram search is off."""
+    return _active_index
+
+
+def get_trigram_index_stats() -> Optional[Dict]:
+    """Memory usage of the active trigram index, or None if trigram search is off."""
+    index = _active_index
+    return index.memory_usage() if index is not None else None
@@ -0,0 +1,500 @@
+"""
+Shared Catalog Module - One memory-mapped catalog index for all workers
+
+With pre-forked workers, every process holding its own CatalogSnapshot
+and search index multiplies that memory by the worker count. Instead,
+SharedCatalogIndex writes the catalog once into a file with a compact
+binary layout and maps it. Every worker reads the same pages of the OS
+page cache, without copying them.
+
+File layout (native byte order), after a fixed header:
+
+    ids         uint32 per book, in catalog order (title, then ID)
+    copies      int32 total and int32 available per book, updated in place
+    by_id       uint32 book IDs ascending
+    by_id_pos   uint32 catalog position of each of those IDs
+    heaps       title, author, isbn, title_norm and author_norm
+
+Each heap holds "\\n" + value for every book plus a closing "\\n". A uint32
+array beside it gives the absolute start offset of each book's entry and
+the end. Normalized text never contains "\\n", so a substring search is one
+mmap.find() per match, and bisecting the offsets gives the matching book.
+
+Copy counts change in place. Inserts, deletes and edits to title, author
+or ISBN are kept in a small in-memory overlay of pending books, which
+lookups and searches merge with the file; every process builds the same
+overlay from the change log. Once more than PENDING_REBUILD_THRESHOLD
+books are pending, the file is rebuilt next to the old one and
+os.replace()d. The old file's header is then marked superseded, so
+processes still mapping it move to the new file and drop the pending
+books it now holds. Writers in every process hold an flock on
+"<path>.lock", so in-place updates and rebuilds never interleave.
+"""
+
+import bisect
+import heapq
+import itertools
+import mmap
+import os
+import struct
+import threading
+from array import array
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: writers are only serialized within one process
+    fcntl = None
+
+import database
+from database import BookRecord
+
+MAGIC = b'LIBCATv1'
+# magic, generation, superseded flag, book count, byte length of each heap
+HEADER = struct.Struct('=8sQII5Q')
+SUPERSEDED = struct.Struct('=I')
+SUPERSEDED_OFFSET = 16
+HEAPS = ('title', 'author', 'isbn', 'title_norm', 'author_norm')
+
+# Books added, edited or deleted since the file was written that are kept
+# in memory before the file is rebuilt. A rebuild costs about as much as
+# writing the whole catalog, while every search scans the pending books.
+PENDING_REBUILD_THRESHOLD = 256
+
+
+def _layout(count: int, heap_lengths) -> Tuple[Dict[str, Tuple[int, int]], int]:
+    """Offset and length of every section, each 8-byte aligned, and the file size."""
+    sections = {}
+    offset = HEADER.size
+
+    def add(name, length):
+        nonlocal offset
+        sections[name] = (offset, length)
+        offset += length + (-length % 8)
+
+    add('ids', 4 * count)
+    add('copies', 8 * count)
+    add('by_id', 4 * count)
+    add('by_id_pos', 4 * count)
+    for heap, length in zip(HEAPS, heap_lengths):
+        add(heap + '_starts', 4 * (count + 1))
+        add(heap, length)
+    return sections, offset
+
+
+def write_catalog_index(path: str, generation: int):
+    """
+    Write every book in the books table to a new index file at `path`,
+    replacing any file already there in one step.
+    """
+    with database.db_connection() as conn:
+        rows = conn.execute(f'''
+            SELECT {database.BOOK_COLUMNS}, title_norm, author_norm FROM books ORDER BY title, id
+        ''').fetchall()
+    count = len(rows)
+    ids = array('I', (row['id'] for row in rows))
+    copies = array('i')
+    for row in rows:
+        copies.extend((row['total_copies'], row['available_copies']))
+    order = sorted(range(count), key=ids.__getitem__)
+
+    heaps, heap_starts = [], []
+    for field in HEAPS:
+        parts, starts, offset = [], array('I'), 0
+        for row in rows:
+            value = row[field]
+            if not value:
+                # Rows written without the search columns, e.g. by raw SQL,
+                # hold the column default ''; every book has a title and author
+                value = database.normalize_text(row[field[:-len('_norm')]])
+            entry = b'\n' + value.encode()
+            starts.append(offset)
+            offset += len(entry)
+            parts.append(entry)
+        starts.append(offset)
+        parts.append(b'\n')
+        heaps.append(b''.join(parts))
+        heap_starts.append(starts)
+
+    sections, size = _layout(count, [len(heap) for heap in heaps])
+    if size >= 2**32:
+        raise ValueError("Catalog too large for 32-bit index offsets")
+    buffer = bytearray(size)
+    HEADER.pack_into(buffer, 0, MAGIC, generation, 0, count, *(len(heap) for heap in heaps))
+
+    def put(name, data):
+        offset = sections[name][0]
+        buffer[offset:offset + len(data)] = data
+
+    put('ids', ids.tobytes())
+    put('copies', copies.tobytes())
+    put('by_id', array('I', (ids[position] for position in order)).tobytes())
+    put('by_id_pos', array('I', order).tobytes())
+    for field, heap, starts in zip(HEAPS, heaps, heap_starts):
+        base = sections[field][0]
+        put(field + '_starts', array('I', (base + start for start in starts)).tobytes())
+        put(field, heap)
+
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(buffer)
+    os.replace(temporary, path)
+
+
+class _Mapping:
+    """One generation of the index file, mapped into this process."""
+
+    def __init__(self, path: str):
+        with open(path, 'r+b') as f:
+            self._mm = mmap.mmap(f.fileno(), 0)
+        if self._mm.size() < HEADER.size:
+            raise ValueError(f"{path} is not a catalog index")
+        magic, self.generation, _, self.count, *lengths = HEADER.unpack_from(self._mm, 0)
+        sections, size = _layout(self.count, lengths)
+        if magic != MAGIC or self._mm.size() != size:
+            raise ValueError(f"{path} is not a catalog index")
+        view = memoryview(self._mm)
+
+        def section(name, fmt):
+            offset, length = sections[name]
+            return view[offset:offset + length].cast(fmt)
+
+        self.ids = section('ids', 'I')
+        self.copies = section('copies', 'i')
+        self.by_id = section('by_id', 'I')
+        self.by_id_pos = section('by_id_pos', 'I')
+        self.starts = {field: section(field + '_starts', 'I') for field in HEAPS}
+
+    @property
+    def size(self) -> int:
+        return self._mm.size()
+
+    @property
+    def superseded(self) -> bool:
+        return SUPERSEDED.unpack_from(self._mm, SUPERSEDED_OFFSET)[0] != 0
+
+    def mark_superseded(self):
+        SUPERSEDED.pack_into(self._mm, SUPERSEDED_OFFSET, 1)
+
+    def text(self, field: str, position: int) -> str:
+        starts = self.starts[field]
+        return self._mm[starts[position] + 1:starts[position + 1]].decode()
+
+    def record(self, position: int) -> BookRecord:
+        copies = self.copies
+        return BookRecord(self.ids[position], self.text('title', position), self.text('author', position),
+                          self.text('isbn', position), copies[2 * position], copies[2 * position + 1])
+
+    def position(self, book_id: int) -> Optional[int]:
+        """Catalog position of a book, or None if it is not in the index."""
+        i = bisect.bisect_left(self.by_id, book_id)
+        if i < self.count and self.by_id[i] == book_id:
+            return self.by_id_pos[i]
+        return None
+
+    def set_copies(self, position: int, total: int, available: int):
+        self.copies[2 * position] = total
+        self.copies[2 * position + 1] = available
+
+    def first_after(self, after: Tuple[str, int]) -> int:
+        """Position of the first book after the (title, id) keyset position."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if (self.text('title', middle), self.ids[middle]) <= after:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def find(self, field: str, needle: bytes, start: int = 0) -> Iterator[int]:
+        """Positions from `start` on whose `field` entry contains the non-empty `needle`."""
+        starts = self.starts[field]
+        offset, end = starts[start], starts[self.count] + 1
+        while True:
+            found = self._mm.find(needle, offset, end)
+            if found < 0:
+                return
+            position = bisect.bisect_right(starts, found) - 1
+            yield position
+            offset = starts[position + 1]
+
+
+class _PendingBook(NamedTuple):
+    """A book added or edited since the file was written, with its search text."""
+    record: BookRecord
+    title_norm: str
+    author_norm: str
+
+
+def _pending_book(record: BookRecord) -> _PendingBook:
+    return _PendingBook(record, database.normalize_text(record.title), database.normalize_text(record.author))
+
+
+def _catalog_order(record: BookRecord) -> Tuple[str, int]:
+    return record.title, record.id
+
+
+def _read_books(book_ids) -> Dict[int, BookRecord]:
+    """Current rows for `book_ids`, read from SQLite rather than from any snapshot."""
+    ids = list(book_ids)
+    books = {}
+    with database.db_connection() as conn:
+        for start in range(0, len(ids), database.BULK_LOOKUP_CHUNK_SIZE):
+            chunk = ids[start:start + database.BULK_LOOKUP_CHUNK_SIZE]
+            placeholders = ', '.join('?' * len(chunk))
+            for row in conn.execute(f'SELECT {database.BOOK_COLUMNS} FROM books WHERE id IN ({placeholders})',
+                                    chunk):
+                books[row['id']] = BookRecord(**row)
+    return books
+
+
+class SharedCatalogIndex:
+    """
+    The catalog as a file mapped by every worker. It can stand in for
+    database.CatalogSnapshot, and it also answers title, author and ISBN
+    searches.
+
+    Readers take no lock: each call works on the mapping and pending books
+    current when it started, and writers swap in new ones with one
+    assignment each.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mapping = None
+        self._pending = {}  # book ID -> _PendingBook, or None if deleted
+        # flock does not exclude threads of the same process from each other
+        self._lock = threading.Lock()
+        self._stats = {'rebuilds': 0, 'remaps': 0, 'copy_updates': 0}
+
+    def __len__(self):
+        mapping, pending = self._mapping, self._pending
+        if mapping is None:
+            return 0
+        count = mapping.count
+        for book_id, entry in pending.items():
+            count += (entry is not None) - (mapping.position(book_id) is not None)
+        return count
+
+    @contextmanager
+    def _writing(self):
+        """Hold the write lock of this process and of every other one."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.path + '.lock', 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _follow(self):
+        """Map the file on disk if this process has none or another one replaced it."""
+        mapping = self._mapping
+        if mapping is not None and not mapping.superseded:
+            return
+        try:
+            self._mapping = _Mapping(self.path)
+        except (FileNotFoundError, ValueError):
+            self._mapping = None
+            return
+        self._pending = self._still_pending(self._pending)
+        self._stats['remaps'] += 1
+
+    def _still_pending(self, pending: Dict[int, Optional[_PendingBook]]) -> Dict[int, Optional[_PendingBook]]:
+        """The pending books the current mapping does not hold yet."""
+        mapping = self._mapping
+        kept = {}
+        for book_id, entry in pending.items():
+            position = mapping.position(book_id)
+            if entry is None:
+                if position is not None:
+                    kept[book_id] = None
+            elif position is None or mapping.record(position)[:4] != entry.record[:4]:
+                kept[book_id] = entry
+        return kept
+
+    def _rebuild(self):
+        """Write a new generation from the books table and swap it in. Caller holds the write lock."""
+        old = self._mapping
+        write_catalog_index(self.path, old.generation + 1 if old else 1)
+        if old is not None:
+            old.mark_superseded()
+        self._mapping = _Mapping(self.path)
+        self._pending = {}
+        self._stats['rebuilds'] += 1
+
+    def _update(self, book_ids, rows: Dict[int, BookRecord]):
+        """
+        Bring `book_ids` in line with `rows`: in place if only copy counts
+        differ, else as pending books, rebuilding once there are too many.
+        """
+        mapping = self._mapping
+        if mapping is None:
+            self._rebuild()
+            return
+        pending = dict(self._pending)
+        updates = []
+        for book_id in book_ids:
+            row = rows.get(book_id)
+            position = mapping.position(book_id)
+            if row is not None and position is not None and mapping.record(position)[:4] == row[:4]:
+                updates.append((position, row.total_copies, row.available_copies))
+                pending.pop(book_id, None)
+            elif row is None and position is None:
+                pending.pop(book_id, None)
+            else:
+                pending[book_id] = _pending_book(row) if row is not None else None
+        if len(pending) > PENDING_REBUILD_THRESHOLD:
+            self._rebuild()
+            return
+        for position, total, available in updates:
+            mapping.set_copies(position, total, available)
+        self._pending = pending
+        self._stats['copy_updates'] += len(updates)
+
+    def load(self):
+        """Map the index file, building it first if it is missing and repairing it if stale."""
+        with self._writing():
+            self._follow()
+            if self._mapping is None:
+                self._rebuild()
+            else:
+                self._verify(repair=True)
+
+    def refresh(self, book_id: int):
+        self.refresh_many([book_id])
+
+    def refresh_many(self, book_ids):
+        """Apply the committed rows of `book_ids`, with one rebuild at most."""
+        book_ids = list(book_ids)
+        if not book_ids:
+            return
+        with self._writing():
+            # Read inside the lock, so the newest read is the last one written
+            self._follow()
+            self._update(book_ids, _read_books(book_ids))
+
+    def verify(self, repair: bool = True) -> List[int]:
+        """Compare the index with the books table; see CatalogSnapshot.verify()."""
+        with self._writing():
+            self._follow()
+            return self._verify(repair)
+
+    def _verify(self, repair: bool) -> List[int]:
+        rows = {book['id']: BookRecord(**book) for book in database.iter_all_books()}
+        mapping = self._mapping
+        indexed = mapping.ids if mapping else ()
+        mismatched = [book_id for book_id, row in rows.items() if self.get(book_id) != row]
+        mismatched.extend({book_id for book_id in itertools.chain(indexed, self._pending)
+                           if book_id not in rows and self.get(book_id) is not None})
+        if repair and mismatched:
+            self._update(mismatched, rows)
+        return sorted(mismatched)
+
+    def get(self, book_id: int) -> Optional[BookRecord]:
+        mapping, pending = self._mapping, self._pending
+        if mapping is None or not isinstance(book_id, int):
+            return None
+        if book_id in pending:
+            entry = pending[book_id]
+            return entry.record if entry else None
+        position = mapping.position(book_id)
+        return None if position is None else mapping.record(position)
+
+    def search(self, term: str, field: str, after: Optional[Tuple[str, int]] = None,
+               limit: Optional[int] = None) -> List[Dict]:
+        """
+        Find books whose `field` contains `term`, ignoring case, accents and
+        repeated whitespace, like database.search_books().
+
+        Returns:
+            list: Matching books ordered by title, then ID
+        """
+        if field not in database.SEARCH_FIELDS:
+            raise ValueError(f"Cannot search books by {field!r}")
+        mapping, pending = self._mapping, self._pending
+        if mapping is None:
+            return []
+        text = database.normalize_text(term)
+        needle = text.encode()
+        start = mapping.first_after(after) if after else 0
+        positions = mapping.find(field + '_norm', needle, start) if needle else range(start, mapping.count)
+        records = (mapping.record(position) for position in positions
+                   if not pending or mapping.ids[position] not in pending)
+        if pending:
+            matches = sorted((entry.record for entry in pending.values()
+                              if entry is not None and text in getattr(entry, field + '_norm')
+                              and (after is None or _catalog_order(entry.record) > after)),
+                             key=_catalog_order)
+            records = heapq.merge(records, matches, key=_catalog_order)
+        if limit is not None:
+            records = itertools.islice(records, limit)
+        return [record._asdict() for record in records]
+
+    def find_isbn(self, isbn: str) -> Optional[Dict]:
+        """The book with exactly this ISBN, or None."""
+        mapping, pending = self._mapping, self._pending
+        if mapping is None or not isbn or '\n' in isbn:
+            return None
+        for entry in pending.values():
+            if entry is not None and entry.record.isbn == isbn:
+                return entry.record._asdict()
+        for position in mapping.find('isbn', b'\n' + isbn.encode() + b'\n'):
+            if mapping.ids[position] not in pending:
+                return mapping.record(position)._asdict()
+        return None
+
+    def stats(self) -> Dict:
+        """Generation and size of the mapped file, pending books, and rebuild, remap and update counters."""
+        mapping = self._mapping
+        stats = dict(self._stats)
+        stats['pending'] = len(self._pending)
+        stats['generation'] = mapping.generation if mapping else 0
+        stats['books'] = mapping.count if mapping else 0
+        stats['bytes'] = mapping.size if mapping else 0
+        return stats
+
+
+_search_enabled = False
+
+
+def default_index_path() -> str:
+    """Where the index file lives unless configured: next to the database file."""
+    return database.DATABASE + '.catalog'
+
+
+def enable_shared_catalog(path: Optional[str] = None) -> SharedCatalogIndex:
+    """Map the index file at `path`, building it if needed, and serve book lookups from it."""
+    index = SharedCatalogIndex(path or default_index_path())
+    database.load_catalog_snapshot(index)
+    return index
+
+
+def get_shared_catalog() -> Optional[SharedCatalogIndex]:
+    """Get the shared index if it is the active catalog snapshot."""
+    snapshot = database.get_catalog_snapshot()
+    return snapshot if isinstance(snapshot, SharedCatalogIndex) else None
+
+
+def enable_shared_search(path: Optional[str] = None) -> SharedCatalogIndex:
+    """Also answer title, author and ISBN searches from the shared index."""
+    global _search_enabled
+    index = get_shared_catalog() or enable_shared_catalog(path)
+    _search_enabled = True
+    return index
+
+
+def disable_shared_search():
+    """Send searches back to the other backends; book lookups are unaffected."""
+    global _search_enabled
+    _search_enabled = False
+
+
+def get_shared_search_index() -> Optional[SharedCatalogIndex]:
+    """Get the shared index if searches should use it, else None."""
+    return get_shared_catalog() if _search_enabled else None
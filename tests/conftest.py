@@ -0,0 +1,23 @@
+import pytest
+
+import database
+from services import autocomplete, fragment_cache, fuzzy_index, search_cache, shared_catalog
+
+
+@pytest.fixture(autouse=True)
+def temp_db(tmp_path, monkeypatch):
+    """
+    Point the database module at a fresh, initialized SQLite file so tests
+    never touch the checked-in library.db.
+    """
+    monkeypatch.setattr(database, 'DATABASE', str(tmp_path / 'library.db'))
+    database.close_pool()
+    search_cache.configure_search_cache()
+    fragment_cache.configure_fragment_cache()
+    database.init_database()
+    database.add_sample_data()
+    yield database.DATABASE
+    autocomplete.disable_autocomplete()
+    fuzzy_index.disable_fuzzy_search()
+    shared_catalog.disable_shared_search()
+    database.close_pool()
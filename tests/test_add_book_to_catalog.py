@@ -37,21 +37,15 @@ def test_add_book_invalid_copies(monkeypatch):
 def test_borrow_book_success(monkeypatch):
     """Test successful book borrowing with valid inputs"""
     # Setup mocks
-    mock_get_book = MagicMock(return_value={
+    mock_borrow = MagicMock(return_value=(ls.BORROW_OK, {
         'id': 1,
         'title': 'Python Programming',
         'author': 'John Doe',
         'isbn': '9780123456789',
-        'available_copies': 3
-    })
-    mock_get_count = MagicMock(return_value=2)
-    mock_insert_borrow = MagicMock(return_value=True)
-    mock_update_avail = MagicMock(return_value=True)
+        'available_copies': 2
+    }))
     
-    monkeypatch.setattr('services.library_service.get_book_by_id', mock_get_book)
-    monkeypatch.setattr('services.library_service.get_patron_borrow_count', mock_get_count)
-    monkeypatch.setattr('services.library_service.insert_borrow_record', mock_insert_borrow)
-    monkeypatch.setattr('services.library_service.update_book_availability', mock_update_avail)
+    monkeypatch.setattr('services.library_service.borrow_book_transaction', mock_borrow)
     
     # Execute
     success, message = ls.borrow_book_by_patron('123456', 1)
@@ -59,7 +53,8 @@ def test_borrow_book_success(monkeypatch):
     # Assert
     assert success is True
     assert 'Successfully borrowed' in message
-    mock_update_avail.assert_called_once_with(1, -1)
+    mock_borrow.assert_called_once()
+    assert mock_borrow.call_args.args[:2] == ('123456', 1)
 
 
 def test_borrow_book_invalid_patron_id(monkeypatch):
@@ -87,8 +82,8 @@ def test_borrow_book_invalid_patron_id(monkeypatch):
 
 def test_borrow_book_not_found(monkeypatch):
     """Test borrowing when book doesn't exist"""
-    mock_get_book = MagicMock(return_value=None)
-    monkeypatch.setattr('services.library_service.get_book_by_id', mock_get_book)
+    mock_borrow = MagicMock(return_value=(ls.BORROW_BOOK_NOT_FOUND, None))
+    monkeypatch.setattr('services.library_service.borrow_book_transaction', mock_borrow)
     
     success, message = ls.borrow_book_by_patron('123456', 999)
     
@@ -98,12 +93,12 @@ def test_borrow_book_not_found(monkeypatch):
 
 def test_borrow_book_not_available(monkeypatch):
     """Test borrowing when book has no available copies"""
-    mock_get_book = MagicMock(return_value={
+    mock_borrow = MagicMock(return_value=(ls.BORROW_UNAVAILABLE, {
         'id': 1,
         'title': 'Python Programming',
         'available_copies': 0
-    })
-    monkeypatch.setattr('services.library_service.get_book_by_id', mock_get_book)
+    }))
+    monkeypatch.setattr('services.library_service.borrow_book_transaction', mock_borrow)
     
     success, message = ls.borrow_book_by_patron('123456', 1)
     
@@ -113,14 +108,12 @@ def test_borrow_book_not_available(monkeypatch):
 
 def test_borrow_book_borrowing_limit_reached(monkeypatch):
     """Test borrowing when patron has reached maximum borrowing limit"""
-    mock_get_book = MagicMock(return_value={
+    mock_borrow = MagicMock(return_value=(ls.BORROW_LIMIT_REACHED, {
         'id': 6,
         'available_copies': 2
-    })
-    mock_get_count = MagicMock(return_value=5)
+    }))
     
-    monkeypatch.setattr('services.library_service.get_book_by_id', mock_get_book)
-    monkeypatch.setattr('services.library_service.get_patron_borrow_count', mock_get_count)
+    monkeypatch.setattr('services.library_service.borrow_book_transaction', mock_borrow)
     
     success, message = ls.borrow_book_by_patron('123456', 6)
     
@@ -0,0 +1,71 @@
+import pytest
+
+import database
+import services.library_service as ls
+from app import create_app
+from services import search_index
+
+
+@pytest.fixture(params=['fts', 'trigram'])
+def backend(request):
+    if request.param == 'trigram':
+        search_index.enable_trigram_search()
+    yield request.param
+    search_index.disable_trigram_search()
+
+
+def _titles(books):
+    return [book['title'] for book in books]
+
+
+def test_one_search_covers_title_author_and_isbn(backend):
+    assert _titles(ls.search_books_in_catalog('gatsby', 'all')) == ['The Great Gatsby']
+    assert _titles(ls.search_books_in_catalog('orwell', 'all')) == ['1984']
+    assert _titles(ls.search_books_in_catalog('9780061120084', 'all')) == ['To Kill a Mockingbird']
+
+
+def test_title_matches_outrank_author_matches(backend):
+    database.insert_book('Orwell: A Life', 'Bernard Crick', '9790000000001', 1, 1)
+    database.insert_book('Homage to Catalonia', 'George Orwell', '9790000000002', 1, 1)
+    database.insert_book('Why Orwell Matters', 'Christopher Hitchens', '9790000000003', 1, 1)
+
+    results = ls.search_books_in_catalog('orwell', 'all')
+
+    # Title prefix (20), title substring (10), then author substrings (5) by title
+    assert _titles(results) == ['Orwell: A Life', 'Why Orwell Matters', '1984', 'Homage to Catalonia']
+    assert [book['score'] for book in results] == [20, 10, 5, 5]
+
+
+def test_isbn_match_ranks_first(backend):
+    database.insert_book('Numbers 9780451524935', 'Someone', '9790000000004', 1, 1)
+    results = ls.search_books_in_catalog('9780451524935', 'all')
+    assert _titles(results) == ['1984', 'Numbers 9780451524935']
+
+
+def test_short_terms_use_like_fallback(backend):
+    results = ls.search_books_in_catalog('ge', 'all')
+    assert {book['id'] for book in results} == {1, 3}   # fitzGErald, GEorge orwell
+
+
+def test_all_search_pages_by_relevance(backend):
+    for i in range(12):
+        database.insert_book(f'Saga {i:02d}', 'Saga Writer' if i % 2 else 'Other', f'97900000001{i:02d}', 1, 1)
+    expected = ls.search_books_in_catalog('saga', 'all')
+
+    books, cursor = [], None
+    while True:
+        page = ls.search_books_page('saga', 'all', limit=5, cursor=cursor)
+        books.extend(page['books'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert books == expected
+    assert [book['score'] for book in books] == sorted((book['score'] for book in books), reverse=True)
+
+
+def test_api_search_accepts_all_type():
+    client = create_app({'TESTING': True}).test_client()
+    data = client.get('/api/search?q=lee&type=all').get_json()
+    assert [book['title'] for book in data['results']] == ['To Kill a Mockingbird']
+    assert data['results'][0]['score'] == 5
@@ -0,0 +1,86 @@
+import random
+
+import database
+import services.library_service as ls
+from app import create_app
+from services.autocomplete import PrefixIndex, normalize
+
+
+def _brute_force(books, prefix, field):
+    prefix = normalize(prefix)
+    matches = set()
+    for book in books:
+        words = normalize(book[field]).split(' ')
+        if any(' '.join(words[i:]).startswith(prefix) for i in range(len(words))):
+            matches.add(book[field])
+    return matches
+
+
+def test_completes_start_of_any_word():
+    assert ls.get_autocomplete_suggestions('mock', 'title') == ['To Kill a Mockingbird']
+    assert ls.get_autocomplete_suggestions('THE gr', 'title') == ['The Great Gatsby']
+    assert ls.get_autocomplete_suggestions('orw', 'author') == ['George Orwell']
+    assert ls.get_autocomplete_suggestions('ockin', 'title') == []
+
+
+def test_titles_starting_with_prefix_come_first():
+    index = PrefixIndex()
+    index.build([
+        {'id': 1, 'title': 'A Winter Tale', 'author': 'X'},
+        {'id': 2, 'title': 'Winterland', 'author': 'Y'},
+    ])
+    assert index.complete('winter', 'title') == ['Winterland', 'A Winter Tale']
+
+
+def test_matches_brute_force_and_respects_limit():
+    rng = random.Random(14)
+    words = 'red blue green river rivet stone stoke sky'.split()
+    books = [
+        {'id': i, 'title': ' '.join(rng.choice(words) for _ in range(rng.randint(1, 4))),
+         'author': rng.choice(words).title()}
+        for i in range(1, 300)
+    ]
+    index = PrefixIndex()
+    index.build(books[:150])
+    for book in books[150:]:
+        index.add(book)
+
+    for prefix in ['riv', 'river b', 'sto', 'g', 'sky sky', 'x']:
+        expected = _brute_force(books, prefix, 'title')
+        result = index.complete(prefix, 'title', limit=1000)
+        assert set(result) == expected
+        assert len(result) == len(expected)
+        assert len(index.complete(prefix, 'title', limit=3)) == min(3, len(expected))
+
+
+def test_follows_insert_book():
+    assert ls.get_autocomplete_suggestions('invis', 'title') == []
+
+    database.insert_book('Invisible Cities', 'Italo Calvino', '9780156453806', 1, 1)
+
+    assert ls.get_autocomplete_suggestions('invis', 'title') == ['Invisible Cities']
+    assert ls.get_autocomplete_suggestions('calv', 'author') == ['Italo Calvino']
+
+
+def test_shared_title_is_suggested_once():
+    database.insert_book('The Great Gatsby', 'F. Scott Fitzgerald', '9780000000001', 1, 1)
+    assert ls.get_autocomplete_suggestions('great', 'title') == ['The Great Gatsby']
+
+
+def test_invalid_input_returns_nothing():
+    assert ls.get_autocomplete_suggestions('', 'title') == []
+    assert ls.get_autocomplete_suggestions('   ', 'title') == []
+    assert ls.get_autocomplete_suggestions('9780', 'isbn') == []
+    assert ls.get_autocomplete_suggestions('the', 'title', limit=0) == []
+
+
+def test_autocomplete_endpoint():
+    client = create_app({'TESTING': True}).test_client()
+
+    response = client.get('/api/autocomplete?q=to&type=title&limit=5')
+    assert response.status_code == 200
+    assert response.get_json() == {'query': 'to', 'type': 'title', 'suggestions': ['To Kill a Mockingbird']}
+
+    assert client.get('/api/autocomplete?q=to&type=isbn').status_code == 400
+    assert client.get('/api/autocomplete?q=to&limit=many').status_code == 400
+    assert client.get('/api/autocomplete?q=to&limit=²').status_code == 400
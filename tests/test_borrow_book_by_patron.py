@@ -3,15 +3,13 @@ import unittest
 from unittest.mock import patch, MagicMock
 from datetime import datetime, timedelta
 import services.library_service as ls
-from datetime import datetime, timedelta
+import database
 
 def test_borrow_book_valid(monkeypatch):
     """Test successful borrowing of a book."""
-    mock_book = {"id": 1, "title": "Sample", "available_copies": 2}
-    monkeypatch.setattr("services.library_service.get_book_by_id", lambda book_id: mock_book)
-    monkeypatch.setattr("services.library_service.get_patron_borrow_count", lambda pid: 2)
-    monkeypatch.setattr("services.library_service.insert_borrow_record", lambda *args: True)
-    monkeypatch.setattr("services.library_service.update_book_availability", lambda *args: True)
+    mock_book = {"id": 1, "title": "Sample", "available_copies": 1}
+    monkeypatch.setattr("services.library_service.borrow_book_transaction",
+                        lambda *args: (ls.BORROW_OK, mock_book))
 
     success, message = ls.borrow_book_by_patron("123456", 1)
     assert success is True
@@ -27,7 +25,8 @@ def test_borrow_book_invalid_patron_id():
 
 def test_borrow_book_not_found(monkeypatch):
     """Test borrow with nonexistent book ID."""
-    monkeypatch.setattr("services.library_service.get_book_by_id", lambda book_id: None)
+    monkeypatch.setattr("services.library_service.borrow_book_transaction",
+                        lambda *args: (ls.BORROW_BOOK_NOT_FOUND, None))
     success, message = ls.borrow_book_by_patron("123456", 1)
     assert success is False
     assert "not found" in message.lower()
@@ -36,7 +35,8 @@ def test_borrow_book_not_found(monkeypatch):
 def test_borrow_book_unavailable(monkeypatch):
     """Test borrowing a book with 0 available copies."""
     mock_book = {"id": 1, "title": "Unavailable", "available_copies": 0}
-    monkeypatch.setattr("services.library_service.get_book_by_id", lambda book_id: mock_book)
+    monkeypatch.setattr("services.library_service.borrow_book_transaction",
+                        lambda *args: (ls.BORROW_UNAVAILABLE, mock_book))
 
     success, message = ls.borrow_book_by_patron("123456", 1)
     assert success is False
@@ -46,36 +46,77 @@ def test_borrow_book_unavailable(monkeypatch):
 def test_borrow_book_limit_reached(monkeypatch):
     """Test borrowing when patron has max limit of 5 books."""
     mock_book = {"id": 1, "title": "Limit Book", "available_copies": 1}
-    monkeypatch.setattr("services.library_service.get_book_by_id", lambda book_id: mock_book)
-    monkeypatch.setattr("services.library_service.get_patron_borrow_count", lambda pid: 6)
+    monkeypatch.setattr("services.library_service.borrow_book_transaction",
+                        lambda *args: (ls.BORROW_LIMIT_REACHED, mock_book))
 
     success, message = ls.borrow_book_by_patron("123456", 1)
     assert success is False
     assert "maximum borrowing limit" in message.lower()
 
+
+def test_borrow_book_database_error(monkeypatch):
+    """A failed transaction is reported as a database error."""
+    monkeypatch.setattr("services.library_service.borrow_book_transaction",
+                        lambda *args: (database.BORROW_ERROR, None))
+
+    success, message = ls.borrow_book_by_patron("123456", 1)
+    assert success is False
+    assert "database error" in message.lower()
+
+
+def test_borrow_book_updates_database():
+    """A real borrow decrements availability and records the loan together."""
+    success, message = ls.borrow_book_by_patron("111111", 1)
+
+    assert success is True
+    assert database.get_book_by_id(1)['available_copies'] == 2
+    assert database.get_patron_borrow_count("111111") == 1
+
+
+def test_borrow_book_limit_enforced_in_database():
+    """The sixth concurrent loan is refused and nothing is written."""
+    for i in range(5):
+        database.insert_book(f'Limit {i}', 'Author', f'{9780000000100 + i}', 1, 1)
+        assert ls.borrow_book_by_patron("111111", 4 + i)[0] is True
+
+    success, message = ls.borrow_book_by_patron("111111", 1)
+
+    assert success is False
+    assert "maximum borrowing limit" in message.lower()
+    assert database.get_book_by_id(1)['available_copies'] == 3
+
+
+def test_borrow_book_rolls_back_when_record_insert_fails():
+    """If the borrow record cannot be written, the decrement is undone."""
+    with database.db_transaction() as conn:
+        conn.execute('''
+            CREATE TRIGGER reject_borrow BEFORE INSERT ON borrow_records
+            BEGIN SELECT RAISE(ABORT, 'rejected'); END
+        ''')
+
+    success, message = ls.borrow_book_by_patron("111111", 1)
+
+    assert success is False
+    assert "database error" in message.lower()
+    assert database.get_book_by_id(1)['available_copies'] == 3
+
 def test_return_book_on_time(monkeypatch):
     """Test returning a book before due date (no late fee)"""
     # Setup
     future_due_date = (datetime.now() + timedelta(days=5)).isoformat()
     
-    mock_get_book = MagicMock(return_value={
+    mock_return = MagicMock(return_value=(ls.RETURN_OK, {
         'id': 1,
         'title': 'Python Programming',
-        'available_copies': 2
-    })
-    mock_get_borrow = MagicMock(return_value={
+        'available_copies': 3
+    }, {
         'id': 1,
         'patron_id': '123456',
         'book_id': 1,
         'due_date': future_due_date
-    })
-    mock_update_return = MagicMock(return_value=True)
-    mock_update_avail = MagicMock(return_value=True)
+    }))
     
-    monkeypatch.setattr('services.library_service.get_book_by_id', mock_get_book)
-    monkeypatch.setattr('services.library_service.get_borrow_record_by_patron_and_book', mock_get_borrow)
-    monkeypatch.setattr('services.library_service.update_borrow_record_return_date', mock_update_return)
-    monkeypatch.setattr('services.library_service.update_book_availability', mock_update_avail)
+    monkeypatch.setattr('services.library_service.return_book_transaction', mock_return)
     
     # Execute
     success, message = ls.return_book_by_patron('123456', 1)
@@ -83,7 +124,8 @@ def test_return_book_on_time(monkeypatch):
     # Assert
     assert success is True
     assert 'No late fees' in message
-    mock_update_avail.assert_called_once_with(1, 1)
+    mock_return.assert_called_once()
+    assert mock_return.call_args.args[:2] == ('123456', 1)
 
 
 def test_return_book_late(monkeypatch):
@@ -91,24 +133,18 @@ def test_return_book_late(monkeypatch):
     # Setup - 5 days late
     past_due_date = (datetime.now() - timedelta(days=5)).isoformat()
     
-    mock_get_book = MagicMock(return_value={
+    mock_return = MagicMock(return_value=(ls.RETURN_OK, {
         'id': 1,
         'title': 'Python Programming',
-        'available_copies': 2
-    })
-    mock_get_borrow = MagicMock(return_value={
+        'available_copies': 3
+    }, {
         'id': 1,
         'patron_id': '123456',
         'book_id': 1,
         'due_date': past_due_date
-    })
-    mock_update_return = MagicMock(return_value=True)
-    mock_update_avail = MagicMock(return_value=True)
+    }))
     
-    monkeypatch.setattr('services.library_service.get_book_by_id', mock_get_book)
-    monkeypatch.setattr('services.library_service.get_borrow_record_by_patron_and_book', mock_get_borrow)
-    monkeypatch.setattr('services.library_service.update_borrow_record_return_date', mock_update_return)
-    monkeypatch.setattr('services.library_service.update_book_availability', mock_update_avail)
+    monkeypatch.setattr('services.library_service.return_book_transaction', mock_return)
     
     # Execute
     success, message = ls.return_book_by_patron('123456', 1)
@@ -121,14 +157,12 @@ def test_return_book_late(monkeypatch):
 
 def test_return_book_no_active_borrow(monkeypatch):
     """Test returning a book with no active borrow record"""
-    mock_get_book = MagicMock(return_value={
+    mock_return = MagicMock(return_value=(ls.RETURN_NO_ACTIVE_LOAN, {
         'id': 1,
         'title': 'Python Programming'
-    })
-    mock_get_borrow = MagicMock(return_value=None)
+    }, None))
     
-    monkeypatch.setattr('services.library_service.get_book_by_id', mock_get_book)
-    monkeypatch.setattr('services.library_service.get_borrow_record_by_patron_and_book', mock_get_borrow)
+    monkeypatch.setattr('services.library_service.return_book_transaction', mock_return)
     
     success, message = ls.return_book_by_patron('123456', 1)
     
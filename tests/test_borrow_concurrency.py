@@ -0,0 +1,36 @@
+import threading
+
+import database
+import services.library_service as ls
+
+THREADS = 16
+COPIES = 5
+
+
+def test_concurrent_borrows_never_oversell():
+    """Many patrons racing for the same title: exactly COPIES borrows succeed."""
+    database.insert_book('Hot Title', 'Popular Author', '9781111111111', COPIES, COPIES)
+    book_id = database.get_book_by_isbn('9781111111111')['id']
+    start = threading.Barrier(THREADS)
+    results = []
+
+    def patron(n):
+        start.wait()
+        results.append(ls.borrow_book_by_patron(f'{700000 + n}', book_id))
+
+    threads = [threading.Thread(target=patron, args=(n,)) for n in range(THREADS)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+
+    successes = [message for success, message in results if success]
+    failures = [message for success, message in results if not success]
+    assert len(results) == THREADS
+    assert len(successes) == COPIES
+    assert all('not available' in message for message in failures)
+
+    assert database.get_book_by_id(book_id)['available_copies'] == 0
+    with database.db_connection() as conn:
+        loans = conn.execute('SELECT COUNT(*) FROM borrow_records WHERE book_id = ?', (book_id,)).fetchone()[0]
+    assert loans == COPIES
@@ -0,0 +1,118 @@
+import pytest
+
+import database
+import services.library_service as ls
+from app import create_app
+
+
+def _add_books(count):
+    for i in range(count):
+        database.insert_book(f'Volume {i % 9}', f'Author {i}', f'{9790000000000 + i}', 1, 1)
+
+
+def test_pages_walk_whole_catalog_in_order():
+    _add_books(40)
+    expected = [(b['title'], b['id']) for b in database.get_all_books()]
+    expected.sort()
+
+    seen, cursor = [], None
+    while True:
+        page = ls.get_catalog_page(limit=7, cursor=cursor)
+        seen.extend((b['title'], b['id']) for b in page['books'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+
+    assert seen == expected
+
+
+def test_last_page_has_no_cursor():
+    page = ls.get_catalog_page(limit=3)
+    assert len(page['books']) == 3
+    assert page['next_cursor'] is None
+
+
+@pytest.mark.parametrize('limit, cursor', [(0, None), (ls.MAX_PAGE_SIZE + 1, None), (10, 'garbage')])
+def test_invalid_paging_is_rejected(limit, cursor):
+    assert 'error' in ls.get_catalog_page(limit=limit, cursor=cursor)
+
+
+def test_deep_page_seeks_title_index():
+    with database.db_connection() as conn:
+        plan = ' '.join(row['detail'] for row in conn.execute('''
+            EXPLAIN QUERY PLAN SELECT id FROM books WHERE (title, id) > ('M', 5)
+            ORDER BY title, id LIMIT 51
+        '''))
+    assert 'idx_books_title' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_catalog_page_and_api_paginate():
+    _add_books(5)
+    client = create_app({'TESTING': True}).test_client()
+
+    first = client.get('/api/catalog?limit=6').get_json()
+    assert first['count'] == 6
+    rest = client.get(f"/api/catalog?limit=6&cursor={first['next_cursor']}").get_json()
+    assert rest['count'] == 2
+    assert rest['next_cursor'] is None
+    assert client.get('/api/catalog?limit=x').status_code == 400
+    assert client.get('/api/catalog?limit=²').status_code == 400
+    oversized = ls.encode_search_cursor(('a', 2**70))
+    assert client.get(f'/api/catalog?cursor={oversized}').get_json() == {'error': 'Invalid cursor.'}
+    assert client.get('/api/catalog?cursor=nope').status_code == 400
+
+    html = client.get('/catalog?limit=6').get_data(as_text=True)
+    assert 'Next page' in html
+    html = client.get(f"/catalog?limit=6&cursor={first['next_cursor']}").get_data(as_text=True)
+    assert 'First page' in html and 'Next page' not in html
+    assert client.get('/catalog?cursor=nope').status_code == 200
+    # A bad limit is reported and the first page shown, as for a bad cursor
+    assert client.get('/catalog?limit=²').status_code == 200
+    assert client.get(f'/catalog?cursor={oversized}').status_code == 200
+    assert 'error' in ls.get_catalog_page(cursor=oversized)
+
+
+@pytest.mark.parametrize('title, on_first_page', [('Aardvark Tales', True), ('Zebra Crossing', False)])
+def test_added_book_opens_the_page_that_shows_it(title, on_first_page):
+    _add_books(60)
+    client = create_app({'TESTING': True}).test_client()
+
+    response = client.post('/add_book', data={'title': title, 'author': 'New Author',
+                                              'isbn': '9781111111111', 'total_copies': '1'})
+    assert response.status_code == 302
+    assert ('cursor=' not in response.location) == on_first_page
+    html = client.get(response.location).get_data(as_text=True)
+    assert f'<td>{title}</td>' in html
+
+
+def test_iter_all_books_reads_in_batches():
+    _add_books(25)
+    batches = list(database.iter_all_books(batch_size=4))
+    assert [(b['title'], b['id']) for b in batches] == sorted((b['title'], b['id']) for b in database.get_all_books())
+
+
+def test_full_catalog_is_streamed():
+    _add_books(30)
+    client = create_app({'TESTING': True}).test_client()
+
+    response = client.get('/catalog?all=1', buffered=False)
+    assert response.is_streamed
+    chunks = list(response.response)
+    response.close()
+
+    html = b''.join(chunk if isinstance(chunk, bytes) else chunk.encode() for chunk in chunks).decode()
+    assert len(chunks) > 1
+    assert html.count('<tr>') == 33 + 1   # every book plus the header row
+    assert 'Next page' not in html and 'Show Entire Catalog' not in html
+
+
+def test_streamed_empty_catalog_shows_empty_message():
+    client = create_app({'TESTING': True}).test_client()
+    with database.db_connection() as conn:
+        conn.execute('DELETE FROM borrow_records')
+        conn.execute('DELETE FROM books')
+        conn.commit()
+
+    html = client.get('/catalog?all=1').get_data(as_text=True)
+    assert 'No books in catalog' in html
@@ -0,0 +1,87 @@
+import pytest
+
+import database
+import services.library_service as ls
+from services import fuzzy_index
+
+
+@pytest.fixture
+def snapshot():
+    return database.load_catalog_snapshot()
+
+
+def test_lookups_do_not_touch_the_database(snapshot, mocker):
+    checkout = mocker.spy(database.ConnectionPool, 'acquire')
+
+    book = database.get_book_by_id(1)
+    books = database.get_books_by_ids([2, 1, 2, 999])
+
+    assert book['title'] == 'The Great Gatsby'
+    assert sorted(books) == [1, 2]
+    assert database.get_book_by_id(999) is None
+    assert checkout.call_count == 0
+
+
+def test_lookup_returns_a_copy(snapshot):
+    database.get_book_by_id(1)['available_copies'] = -1
+    assert database.get_book_by_id(1)['available_copies'] == 3
+
+
+def test_borrow_and_return_write_through(snapshot):
+    assert ls.borrow_book_by_patron('654321', 1)[0]
+    assert database.get_book_by_id(1)['available_copies'] == 2
+
+    assert ls.return_book_by_patron('654321', 1)[0]
+    assert database.get_book_by_id(1)['available_copies'] == 3
+    assert snapshot.verify() == []
+
+
+def test_inserted_book_is_visible_to_listeners(snapshot):
+    fuzzy_index.enable_fuzzy_search()
+    assert database.insert_book('Dune', 'Frank Herbert', '9780441013593', 2, 2)
+
+    assert database.get_book_by_isbn('9780441013593')['id'] in {
+        book_id for _, _, book_id in fuzzy_index.get_fuzzy_index().search('dune')}
+    assert snapshot.get(database.get_book_by_isbn('9780441013593')['id']).title == 'Dune'
+
+
+def test_uncommitted_write_is_read_from_the_database(snapshot):
+    with pytest.raises(RuntimeError):
+        with database.unit_of_work():
+            database.update_book_availability(1, -1)
+            assert database.get_book_by_id(1)['available_copies'] == 2
+            raise RuntimeError('abort')
+
+    assert database.get_book_by_id(1)['available_copies'] == 3
+    assert snapshot.get(1).available_copies == 3
+
+
+def test_verify_finds_and_repairs_out_of_band_changes(snapshot):
+    with database.db_transaction() as conn:
+        conn.execute('UPDATE books SET available_copies = 1 WHERE id = 1')
+        conn.execute('DELETE FROM borrow_records WHERE book_id = 2')
+        conn.execute('DELETE FROM books WHERE id = 2')
+        conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+                     "VALUES ('Emma', 'Jane Austen', '9780141439587', 1, 1)")
+
+    assert snapshot.verify(repair=False) == [1, 2, 4]
+    assert database.get_book_by_id(1)['available_copies'] == 3
+
+    assert snapshot.verify() == [1, 2, 4]
+    assert database.get_book_by_id(1)['available_copies'] == 1
+    assert database.get_book_by_id(2) is None
+    assert database.get_book_by_id(4)['title'] == 'Emma'
+    assert snapshot.verify() == []
+
+
+def test_failed_refresh_falls_back_to_the_database(snapshot, mocker):
+    mocker.patch.object(database.CatalogSnapshot, 'refresh', side_effect=RuntimeError('boom'))
+    assert database.update_book_availability(1, -1)
+
+    assert database.get_catalog_snapshot() is None
+    assert database.get_book_by_id(1)['available_copies'] == 2
+
+
+def test_close_pool_drops_the_snapshot(snapshot):
+    database.close_pool()
+    assert database.get_catalog_snapshot() is None
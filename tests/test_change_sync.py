@@ -0,0 +1,300 @@
+import sqlite3
+import subprocess
+import sys
+
+import pytest
+
+import database
+import services.library_service as ls
+from app import create_app
+from services import fragment_cache, fuzzy_index, search_index
+
+
+@pytest.fixture
+def other_process(temp_db):
+    """A separate connection standing in for another worker writing to the same file."""
+    database.sync_changes()
+    conn = sqlite3.connect(temp_db, isolation_level=None)
+    yield conn
+    conn.close()
+
+
+@pytest.fixture
+def events():
+    seen = []
+
+    def listener(event, book_id):
+        seen.append((event, book_id))
+    database.add_change_listener(listener)
+    yield seen
+    database.remove_change_listener(listener)
+
+
+def test_no_change_costs_no_log_query(other_process, mocker):
+    execute = mocker.spy(database, '_has_table')
+    assert database.sync_changes() == 0
+    assert execute.call_count == 0
+
+
+def test_external_insert_reaches_snapshot_and_indexes(other_process, events):
+    database.load_catalog_snapshot()
+    fuzzy_index.enable_fuzzy_search()
+    loans = database.get_loan_version()
+
+    other_process.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies, "
+                          "title_norm, author_norm) VALUES ('Dune', 'Frank Herbert', '9780441013593', 2, 2, "
+                          "'dune', 'frank herbert')")
+    assert database.sync_changes() == 1
+
+    assert events == [('book_inserted', 4)]
+    assert database.get_book_by_id(4)['title'] == 'Dune'
+    assert [book_id for _, _, book_id in fuzzy_index.get_fuzzy_index().search('dume')] == [4]
+    assert database.get_catalog_version() == other_process.execute('SELECT MAX(seq) FROM change_log').fetchone()[0]
+    assert database.get_loan_version() == loans
+
+
+def test_external_borrow_invalidates_catalog_and_loans(other_process, events):
+    database.load_catalog_snapshot()
+    assert ls.search_books_in_catalog('gatsby', 'title')[0]['available_copies'] == 3
+
+    with other_process:
+        other_process.execute('BEGIN')
+        other_process.execute('UPDATE books SET available_copies = 2 WHERE id = 1')
+        other_process.execute("INSERT INTO borrow_records (patron_id, book_id, borrow_date, due_date) "
+                              "VALUES ('222222', 1, 0, 0)")
+    database.sync_changes()
+
+    assert events == [('availability_changed', 1), ('loan_changed', 1)]
+    assert database.get_book_by_id(1)['available_copies'] == 2
+    assert ls.search_books_in_catalog('gatsby', 'title')[0]['available_copies'] == 2
+
+
+def test_external_delete_drops_book_from_snapshot(other_process, events):
+    database.load_catalog_snapshot()
+    other_process.execute('DELETE FROM borrow_records WHERE book_id = 2')
+    other_process.execute('DELETE FROM books WHERE id = 2')
+    database.sync_changes()
+
+    assert database.get_book_by_id(2) is None
+    assert ('book_deleted', 2) in events
+
+
+def test_versions_move_after_listeners_ran(other_process):
+    before = database.get_catalog_version()
+    seen = []
+
+    def listener(event, book_id):
+        seen.append(database.get_catalog_version())
+    database.add_change_listener(listener)
+    try:
+        other_process.execute('UPDATE books SET available_copies = 2 WHERE id = 1')
+        database.sync_changes()
+    finally:
+        database.remove_change_listener(listener)
+
+    assert seen == [before]
+    assert database.get_catalog_version() > before
+
+
+def test_own_writes_are_applied_exactly_once(other_process, events):
+    assert database.insert_book('Dune', 'Frank Herbert', '9780441013593', 2, 2)
+    assert ls.borrow_book_by_patron('654321', 1)[0]
+
+    assert events == [('book_inserted', 4), ('availability_changed', 1), ('loan_changed', 1)]
+    assert database.sync_changes() == 0
+
+
+def test_rolled_back_write_leaves_no_change(other_process, events):
+    with pytest.raises(RuntimeError):
+        with database.unit_of_work():
+            database.update_book_availability(1, -1)
+            raise RuntimeError('abort')
+    assert database.sync_changes() == 0
+    assert events == []
+
+
+def test_pruned_changes_trigger_a_full_resync(other_process, events, monkeypatch):
+    database.load_catalog_snapshot()
+    other_process.execute('UPDATE books SET available_copies = 1 WHERE id = 1')
+    other_process.execute('UPDATE books SET available_copies = 0 WHERE id = 2')
+    # Another worker pruned the first change before this process read it
+    other_process.execute('DELETE FROM change_log WHERE seq = (SELECT MIN(seq) FROM change_log '
+                          'WHERE seq > (SELECT COALESCE(MAX(seq), 0) - 2 FROM change_log))')
+
+    database.sync_changes()
+
+    assert database.get_change_stats()['resyncs'] == 1
+    assert database.get_book_by_id(1)['available_copies'] == 1
+    assert database.get_book_by_id(2)['available_copies'] == 0
+    assert events == [(database.RESYNC_EVENT, 0)]
+
+
+def test_resync_rebuilds_indexes_past_missed_edits_and_deletes(other_process):
+    search_index.enable_trigram_search()
+    try:
+        assert ls.get_autocomplete_suggestions('gats', 'title') == ['The Great Gatsby']
+        assert _titles(ls.search_books_in_catalog('mockingbrd', 'fuzzy')) == ['To Kill a Mockingbird']
+        other_process.execute(RENAME_GATSBY)
+        _delete_mockingbird(other_process)
+        # Another worker pruned everything this process has not read yet
+        other_process.execute('DELETE FROM change_log WHERE seq < (SELECT MAX(seq) FROM change_log)')
+
+        database.sync_changes()
+
+        assert database.get_change_stats()['resyncs'] == 1
+        assert ls.get_autocomplete_suggestions('gats', 'title') == []
+        assert ls.get_autocomplete_suggestions('mock', 'title') == []
+        assert ls.get_autocomplete_suggestions('mob', 'title') == ['Moby Dick']
+        assert ls.search_books_in_catalog('mockingbrd', 'fuzzy') == []
+        assert _titles(ls.search_books_in_catalog('mobby', 'fuzzy')) == ['Moby Dick']
+        assert ls.search_books_in_catalog('gatsby', 'title') == []
+        assert _titles(ls.search_books_in_catalog('moby', 'title')) == ['Moby Dick']
+    finally:
+        search_index.disable_trigram_search()
+
+
+def test_log_is_pruned_to_retention(temp_db, other_process, monkeypatch):
+    monkeypatch.setattr(database, 'CHANGE_LOG_RETENTION', 5)
+    for copies in range(12):
+        assert database.update_book_availability(1, 1)
+
+    remaining = other_process.execute('SELECT COUNT(*) FROM change_log').fetchone()[0]
+    assert 5 <= remaining < 10
+    # The latest change of each kind survives, so later workers agree on versions
+    versions = {'catalog': database.get_catalog_version(), 'loans': database.get_loan_version()}
+    watcher = database.ChangeWatcher(temp_db)
+    try:
+        assert watcher._domain_ends() == versions
+    finally:
+        watcher.close()
+
+
+def test_request_sees_write_from_another_process(temp_db):
+    client = create_app({'TESTING': True}).test_client()
+    tag = client.get('/catalog').headers['ETag']
+
+    subprocess.run([sys.executable, '-c', (
+        'import sqlite3, sys\n'
+        'conn = sqlite3.connect(sys.argv[1])\n'
+        'conn.execute("UPDATE books SET available_copies = 1 WHERE id = 1")\n'
+        'conn.commit()\n'
+    ), temp_db], check=True)
+
+    response = client.get('/catalog', headers={'If-None-Match': tag})
+    assert response.status_code == 200
+    assert '1/3 Available' in response.get_data(as_text=True)
+    assert database.get_book_by_id(1)['available_copies'] == 1
+
+
+RENAME_GATSBY = ("UPDATE books SET title = 'Moby Dick', author = 'Herman Melville', "
+                 "title_norm = 'moby dick', author_norm = 'herman melville' WHERE id = 1")
+
+
+def _delete_mockingbird(conn):
+    conn.execute('DELETE FROM borrow_records WHERE book_id = 2')
+    conn.execute('DELETE FROM books WHERE id = 2')
+
+
+def _titles(results):
+    return [book['title'] for book in results]
+
+
+def test_external_update_reindexes_trigram_index(other_process):
+    search_index.enable_trigram_search()
+    try:
+        other_process.execute(RENAME_GATSBY)
+        database.sync_changes()
+        assert ls.search_books_in_catalog('gatsby', 'title') == []
+        assert _titles(ls.search_books_in_catalog('moby', 'title')) == ['Moby Dick']
+    finally:
+        search_index.disable_trigram_search()
+
+
+def test_external_delete_removes_book_from_trigram_index(other_process):
+    index = search_index.enable_trigram_search()
+    try:
+        _delete_mockingbird(other_process)
+        database.sync_changes()
+        assert ls.search_books_in_catalog('mockingbird', 'title') == []
+        assert index.search('mockingbird', 'title') == []
+    finally:
+        search_index.disable_trigram_search()
+
+
+def test_external_update_reindexes_autocomplete(other_process):
+    assert ls.get_autocomplete_suggestions('gats', 'title') == ['The Great Gatsby']
+    other_process.execute(RENAME_GATSBY)
+    database.sync_changes()
+    assert ls.get_autocomplete_suggestions('gats', 'title') == []
+    assert ls.get_autocomplete_suggestions('fitz', 'author') == []
+    assert ls.get_autocomplete_suggestions('mob', 'title') == ['Moby Dick']
+    assert ls.get_autocomplete_suggestions('melv', 'author') == ['Herman Melville']
+
+
+def test_external_delete_removes_book_from_autocomplete(other_process):
+    assert ls.get_autocomplete_suggestions('mock', 'title') == ['To Kill a Mockingbird']
+    _delete_mockingbird(other_process)
+    database.sync_changes()
+    assert ls.get_autocomplete_suggestions('mock', 'title') == []
+    assert ls.get_autocomplete_suggestions('harp', 'author') == []
+
+
+def test_shared_value_stays_suggested_until_its_last_book_goes(other_process):
+    database.insert_book('The Great Gatsby', 'F. Scott Fitzgerald', '9780000000001', 1, 1)
+    assert ls.get_autocomplete_suggestions('gats', 'title') == ['The Great Gatsby']
+    other_process.execute('DELETE FROM books WHERE id = 4')
+    database.sync_changes()
+    assert ls.get_autocomplete_suggestions('gats', 'title') == ['The Great Gatsby']
+
+
+def test_external_update_reindexes_fuzzy_index(other_process):
+    assert _titles(ls.search_books_in_catalog('gatsbby', 'fuzzy')) == ['The Great Gatsby']
+    other_process.execute(RENAME_GATSBY)
+    database.sync_changes()
+    assert ls.search_books_in_catalog('gatsbby', 'fuzzy') == []
+    assert _titles(ls.search_books_in_catalog('mobby dik', 'fuzzy')) == ['Moby Dick']
+
+
+def test_external_delete_removes_book_from_fuzzy_index(other_process):
+    assert _titles(ls.search_books_in_catalog('mockingbrd', 'fuzzy')) == ['To Kill a Mockingbird']
+    _delete_mockingbird(other_process)
+    database.sync_changes()
+    assert ls.search_books_in_catalog('mockingbrd', 'fuzzy') == []
+    assert 2 not in [book_id for _, _, book_id in fuzzy_index.get_fuzzy_index().search('mockingbrd')]
+
+
+def test_external_update_rerenders_catalog_row(temp_db):
+    client = create_app({'TESTING': True}).test_client()
+    assert 'The Great Gatsby' in client.get('/catalog').get_data(as_text=True)
+    with sqlite3.connect(temp_db) as conn:
+        conn.execute(RENAME_GATSBY)
+
+    html = client.get('/catalog').get_data(as_text=True)
+    assert 'Moby Dick' in html and 'The Great Gatsby' not in html
+
+
+def test_row_rendered_from_a_pre_edit_read_is_not_served(temp_db):
+    app = create_app({'TESTING': True})
+    client = app.test_client()
+    stale = dict(database.get_book_by_id(1))
+    with sqlite3.connect(temp_db) as conn:
+        conn.execute(RENAME_GATSBY)
+    database.sync_changes()
+
+    # A render that read the book before the edit finishes after the discard
+    with app.test_request_context('/catalog'):
+        assert 'The Great Gatsby' in app.jinja_env.globals['catalog_row'](stale)
+
+    html = client.get('/catalog').get_data(as_text=True)
+    assert 'Moby Dick' in html and 'The Great Gatsby' not in html
+
+
+def test_external_delete_drops_catalog_row(temp_db):
+    client = create_app({'TESTING': True}).test_client()
+    client.get('/catalog')
+    assert fragment_cache.get_fragment_cache_stats()['entries'] == 3
+    with sqlite3.connect(temp_db) as conn:
+        _delete_mockingbird(conn)
+
+    assert 'To Kill a Mockingbird' not in client.get('/catalog').get_data(as_text=True)
+    assert fragment_cache.get_fragment_cache_stats()['entries'] == 2
@@ -0,0 +1,142 @@
+import sqlite3
+import threading
+
+import pytest
+
+import database
+from database import ConnectionPool
+
+
+def test_pool_reuses_connection_across_helper_calls(temp_db):
+    """Repeated helper calls on one thread should not open new connections."""
+    database.get_book_by_id(1)
+    created = database.get_pool_stats()['connections_created']
+
+    for _ in range(20):
+        database.get_book_by_id(1)
+        database.get_patron_borrow_count("123456")
+
+    stats = database.get_pool_stats()
+    assert stats['connections_created'] == created
+    assert stats['checkouts'] >= 40
+
+
+def test_pool_nested_checkout_shares_connection(tmp_path):
+    """A thread that already holds a connection gets the same one back."""
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=1)
+    outer = pool.acquire()
+    inner = pool.acquire()
+    assert inner is outer
+    pool.release(inner)
+    pool.release(outer)
+    assert pool.stats()['idle'] == 1
+    pool.close()
+
+
+def test_pool_waits_when_exhausted(tmp_path):
+    """With every connection busy, a checkout waits and is counted."""
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=1, timeout=5)
+    conn = pool.acquire()
+    acquired = threading.Event()
+
+    def worker():
+        c = pool.acquire()
+        acquired.set()
+        pool.release(c)
+
+    t = threading.Thread(target=worker)
+    t.start()
+    assert not acquired.wait(0.2)
+    pool.release(conn)
+    t.join(5)
+
+    assert acquired.is_set()
+    stats = pool.stats()
+    assert stats['waits'] == 1
+    assert stats['connections_created'] == 1
+    pool.close()
+
+
+def test_pool_times_out_when_exhausted(tmp_path):
+    """A checkout that cannot be served before the timeout raises."""
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=1, timeout=0.1)
+    conn = pool.acquire()
+    errors = []
+
+    def worker():
+        try:
+            pool.acquire()
+        except sqlite3.OperationalError as e:
+            errors.append(e)
+
+    t = threading.Thread(target=worker)
+    t.start()
+    t.join(5)
+    assert len(errors) == 1
+    pool.release(conn)
+    pool.close()
+
+
+def test_pool_replaces_unhealthy_connection(tmp_path):
+    """A connection that fails its health check is discarded and replaced."""
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=1, health_check_interval=0)
+    conn = pool.acquire()
+    pool.release(conn)
+    conn.close()  # simulate a broken connection sitting in the pool
+
+    fresh = pool.acquire()
+    assert fresh is not conn
+    assert fresh.execute('SELECT 1').fetchone()[0] == 1
+    pool.release(fresh)
+
+    stats = pool.stats()
+    assert stats['health_check_failures'] == 1
+    assert stats['connections_created'] == 2
+    pool.close()
+
+
+def test_closed_pool_rejects_checkouts(tmp_path):
+    """After close(), the pool holds no connections and refuses new checkouts."""
+    pool = ConnectionPool(str(tmp_path / 'pool.db'), size=2)
+    pool.release(pool.acquire())
+    pool.close()
+    assert pool.stats()['open'] == 0
+    with pytest.raises(sqlite3.ProgrammingError):
+        pool.acquire()
+
+
+def test_performance_profile_pragmas_in_effect(temp_db):
+    """The performance profile turns on WAL and the tuned pragmas."""
+    database.configure_pool(profile='performance')
+    report = database.get_pragma_report()
+
+    assert report['profile'] == 'performance'
+    assert report['journal_mode'] == 'wal'
+    assert report['synchronous'] == 1  # NORMAL
+    assert report['temp_store'] == 2   # MEMORY
+    assert report['busy_timeout'] == 5000
+    assert report['cache_size'] == -16000
+
+
+def test_default_profile_keeps_sqlite_defaults(tmp_path, monkeypatch):
+    """The default profile leaves SQLite's rollback journal alone."""
+    monkeypatch.setattr(database, 'DATABASE', str(tmp_path / 'plain.db'))
+    database.configure_pool(profile='default')
+    try:
+        assert database.get_pragma_report()['journal_mode'] == 'delete'
+    finally:
+        database.configure_pool()
+        database.close_pool()
+
+
+def test_unknown_profile_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        ConnectionPool(str(tmp_path / 'pool.db'), profile='turbo')
+
+
+def test_creating_apps_adds_no_exit_handlers(mocker):
+    import app
+    register = mocker.spy(app.atexit, 'register')
+    app.create_app({'TESTING': True})
+    app.create_app({'TESTING': True})
+    assert register.call_count == 0
@@ -1,3 +1,4 @@
+import re
 import subprocess
 import time
 import uuid
@@ -66,8 +67,8 @@ def test_user_flow_librarian_adds_new_book_to_catalog(page: Page):
     # Step 4: Submit the form
     page.get_by_role("button", name="Add Book to Catalog").click()
     
-    # Step 5: Verify success by checking redirect to catalog
-    expect(page).to_have_url("http://127.0.0.1:5000/catalog")
+    # Step 5: Verify success by checking redirect to the catalog page showing the book
+    expect(page).to_have_url(re.compile(r"http://127\.0\.0\.1:5000/catalog(\?cursor=[\w-]+)?$"))
     
     # Step 6 & 7: Verify the book appears with correct details
     expect(page.get_by_role("cell", name=book_title)).to_be_visible()
@@ -84,7 +85,7 @@ def test_user_flow_librarian_adds_new_book_to_catalog(page: Page):
 Realistic User Flow 2: Patron browses catalog and borrows a book 
     Steps:
     1. Navigate to catalog page
-    2. Browse available books
+    2. Search for the book, which may sort past the first catalog page
     3. Enter patron ID
     4. Click "Borrow" button for a specific book
     5. Verify success by checking redirect to catalog
@@ -113,7 +114,10 @@ def test_user_flow_patron_browses_and_borrows_book(page: Page):
     page.get_by_role("link", name="📖 Catalog").click()
     expect(page).to_have_url("http://127.0.0.1:5000/catalog")
     
-    # Step 2: Browse and verify the book is available
+    # Step 2: Search for the book and verify it is available
+    page.get_by_role("link", name="🔍 Search").click()
+    page.get_by_role("textbox", name="Search Term").fill(book_title)
+    page.get_by_role("button", name="🔍 Search").click()
     expect(page.get_by_role("cell", name=book_title)).to_be_visible()
     expect(page.get_by_role("cell", name=author_name)).to_be_visible()
     
@@ -0,0 +1,91 @@
+import tracemalloc
+
+import pytest
+
+import services.library_service as ls
+from app import create_app
+from services import fragment_cache
+from services.fragment_cache import FragmentCache, entry_size
+
+
+def test_cached_rows_render_the_same_page():
+    uncached = create_app({'TESTING': True, 'FRAGMENT_CACHE_BYTES': 0}).test_client()
+    expected = uncached.get('/catalog').get_data(as_text=True)
+    assert fragment_cache.get_fragment_cache_stats()['entries'] == 0
+
+    client = create_app({'TESTING': True}).test_client()
+    first = client.get('/catalog').get_data(as_text=True)
+    second = client.get('/catalog').get_data(as_text=True)
+
+    assert first == second == expected
+    stats = fragment_cache.get_fragment_cache_stats()
+    assert stats['misses'] == 3
+    assert stats['hits'] == 3
+
+
+def test_availability_change_renders_a_new_row():
+    client = create_app({'TESTING': True}).test_client()
+    assert '3/3 Available' in client.get('/catalog').get_data(as_text=True)
+
+    success, _ = ls.borrow_book_by_patron('654321', 1)
+    assert success
+
+    html = client.get('/catalog').get_data(as_text=True)
+    assert '2/3 Available' in html and '3/3 Available' not in html
+
+
+def test_streamed_catalog_uses_cached_rows():
+    client = create_app({'TESTING': True}).test_client()
+    client.get('/catalog')
+    client.get('/catalog?all=1').get_data()
+    assert fragment_cache.get_fragment_cache_stats()['hits'] == 3
+
+
+def test_memory_budget_evicts_least_recently_used():
+    fragment = 'x' * 100
+    size = entry_size((0, 1, 1), fragment)
+    cache = FragmentCache(max_bytes=size * 3)
+    for key in range(3):
+        cache.put((key, 1, 1), fragment)
+    cache.get((0, 1, 1))
+    cache.put((3, 1, 1), fragment)
+
+    assert cache.get((1, 1, 1)) is None
+    assert cache.get((0, 1, 1)) == fragment
+    stats = cache.stats()
+    assert stats['entries'] == 3
+    assert stats['bytes'] == size * 3
+    assert stats['evictions'] == 1
+
+
+def test_replacing_an_entry_keeps_the_byte_count():
+    cache = FragmentCache()
+    cache.put('row', 'short')
+    cache.put('row', 'a much longer fragment')
+    assert cache.stats()['bytes'] == entry_size('row', 'a much longer fragment')
+
+
+def test_budget_counts_what_the_entries_really_use():
+    cache = FragmentCache()
+    tracemalloc.start()
+    try:
+        for book_id in range(1000, 3000):
+            cache.put((book_id, 1, 2), f'<tr><td>{book_id}</td></tr>')
+        used = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    assert cache.stats()['bytes'] == pytest.approx(used, rel=0.15)
+
+
+def test_fragment_larger_than_budget_is_not_stored():
+    cache = FragmentCache(max_bytes=10)
+    cache.put('row', 'x' * 100)
+    assert cache.stats()['entries'] == 0
+
+
+def test_stats_endpoint_reports_fragment_cache():
+    client = create_app({'TESTING': True}).test_client()
+    client.get('/catalog')
+    stats = client.get('/api/stats').get_json()['fragment_cache']
+    assert stats['entries'] == 3
+    assert stats['bytes'] > 0
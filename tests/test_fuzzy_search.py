@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+import database
+import services.library_service as ls
+from services.fuzzy_index import FuzzyIndex, Vocabulary, edit_distance
+
+
+@pytest.mark.parametrize('a, b, distance', [
+    ('orwell', 'orwel', 1),
+    ('gatsby', 'gatsbby', 1),
+    ('kitten', 'sitting', 3),
+    ('', 'abc', 3),
+    ('same', 'same', 0),
+])
+def test_edit_distance(a, b, distance):
+    assert edit_distance(a, b) == distance
+    assert edit_distance(b, a) == distance
+
+
+def test_edit_distance_with_limit_stops_early():
+    assert edit_distance('abcdefgh', 'zyxwvuts', limit=2) == 3
+    assert edit_distance('abc', 'abcdef', limit=1) == 2
+    assert edit_distance('orwel', 'orwell', limit=1) == 1
+
+
+def test_bigram_candidates_match_brute_force():
+    rng = random.Random(15)
+    vocabulary = {''.join(rng.choice('abcde') for _ in range(rng.randint(1, 7))) for _ in range(400)}
+    index = Vocabulary()
+    for word in vocabulary:
+        index.add(word)
+    assert len(index) == len(vocabulary)
+
+    for _ in range(50):
+        query = ''.join(rng.choice('abcdef') for _ in range(rng.randint(1, 7)))
+        for tolerance in (0, 1, 2):
+            expected = sorted((edit_distance(query, word), word) for word in vocabulary
+                              if edit_distance(query, word) <= tolerance)
+            assert sorted(index.search(query, tolerance)) == expected
+
+
+def test_typos_find_the_book():
+    assert [b['title'] for b in ls.search_books_in_catalog('Gatsbby', 'fuzzy')] == ['The Great Gatsby']
+    assert [b['title'] for b in ls.search_books_in_catalog('Orwel', 'fuzzy')] == ['1984']
+    assert [b['id'] for b in ls.search_books_in_catalog('harpr lee mockingbrd', 'fuzzy')] == [2]
+
+
+def test_results_ranked_by_distance():
+    index = FuzzyIndex()
+    index.build([
+        {'id': 1, 'title': 'Stone Garden', 'author': 'A'},
+        {'id': 2, 'title': 'Stove Garden', 'author': 'B'},
+        {'id': 3, 'title': 'Store Gardens', 'author': 'C'},
+    ])
+    assert sorted(index.search('stone garden')) == [
+        (0, 'Stone Garden', 1), (1, 'Stove Garden', 2), (2, 'Store Gardens', 3)
+    ]
+
+
+def test_distance_is_reported_and_short_words_must_match_exactly():
+    result = ls.search_books_in_catalog('gatsbby', 'fuzzy')
+    assert result[0]['distance'] == 1
+    # Two-letter words tolerate no typos
+    assert ls.search_books_in_catalog('ti kill', 'fuzzy') == []
+
+
+def test_fuzzy_index_follows_insert_book():
+    assert ls.search_books_in_catalog('calvno', 'fuzzy') == []
+    database.insert_book('Invisible Cities', 'Italo Calvino', '9780156453806', 1, 1)
+    assert [b['title'] for b in ls.search_books_in_catalog('calvno', 'fuzzy')] == ['Invisible Cities']
+
+
+def test_fuzzy_pages_follow_ranking():
+    for i, title in enumerate(['Winter Song', 'Wintre Song', 'Winter Sang', 'Wintr Son']):
+        database.insert_book(title, 'Author', f'97900000000{i:02d}', 1, 1)
+    expected = ls.search_books_in_catalog('winter song', 'fuzzy')
+    assert [b['distance'] for b in expected] == sorted(b['distance'] for b in expected)
+
+    books, cursor = [], None
+    while True:
+        page = ls.search_books_page('winter song', 'fuzzy', limit=1, cursor=cursor)
+        books.extend(page['books'])
+        cursor = page['next_cursor']
+        if cursor is None:
+            break
+    assert books == expected
+    assert ls.search_books_page('winter song', 'fuzzy', cursor=ls.encode_search_cursor(('x', 1))) == {
+        'error': 'Invalid cursor.'
+    }
@@ -0,0 +1,33 @@
+import database
+
+
+def test_get_books_by_ids_returns_mapping():
+    """Books come back keyed by ID; unknown IDs are simply missing."""
+    books = database.get_books_by_ids([1, 3, 999])
+    assert set(books) == {1, 3}
+    assert books[1]['title'] == 'The Great Gatsby'
+    assert books[3]['title'] == '1984'
+
+
+def test_get_books_by_ids_empty_input():
+    assert database.get_books_by_ids([]) == {}
+
+
+def test_get_books_by_ids_chunks_large_requests(monkeypatch):
+    """Requests larger than one chunk are split and merged."""
+    for i in range(10):
+        database.insert_book(f'Bulk {i}', 'Author', f'{9990000000000 + i}', 1, 1)
+    monkeypatch.setattr(database, 'BULK_LOOKUP_CHUNK_SIZE', 3)
+
+    ids = list(range(1, 14))
+    books = database.get_books_by_ids(ids + ids)  # duplicates are harmless
+
+    assert sorted(books) == ids
+
+
+def test_get_books_by_ids_beyond_variable_limit():
+    """Even more IDs than SQLite allows bound variables work, in one checkout."""
+    before = database.get_pool_stats()['checkouts']
+    books = database.get_books_by_ids(range(1, 40000))
+    assert set(books) == {1, 2, 3}
+    assert database.get_pool_stats()['checkouts'] - before == 1
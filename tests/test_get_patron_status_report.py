@@ -43,6 +43,8 @@ def test_get_patron_status_with_active_borrows(monkeypatch):
         {
             'id': 1,
             'book_id': 1,
+            'title': 'Book 1',
+            'author': 'Author 1',
             'borrow_date': '2025-10-01',
             'due_date': (datetime.now() + timedelta(days=5)).isoformat(),
             'return_date': None
@@ -50,19 +52,15 @@ def test_get_patron_status_with_active_borrows(monkeypatch):
         {
             'id': 2,
             'book_id': 2,
+            'title': 'Book 2',
+            'author': 'Author 2',
             'borrow_date': '2025-10-05',
             'due_date': (datetime.now() + timedelta(days=9)).isoformat(),
             'return_date': None
         }
     ])
     
-    mock_get_book = MagicMock(side_effect=[
-        {'id': 1, 'title': 'Book 1', 'author': 'Author 1'},
-        {'id': 2, 'title': 'Book 2', 'author': 'Author 2'}
-    ])
-    
-    monkeypatch.setattr('services.library_service.get_all_patron_borrow_records', mock_get_all_records)
-    monkeypatch.setattr('services.library_service.get_book_by_id', mock_get_book)
+    monkeypatch.setattr('services.library_service.iter_patron_borrow_history', mock_get_all_records)
     
     result = ls.get_patron_status_report('123456')
     
@@ -76,7 +74,7 @@ def test_get_patron_status_no_active_borrows(monkeypatch):
     """Test patron status with no currently borrowed books"""
     mock_get_all_records = MagicMock(return_value=[])
     
-    monkeypatch.setattr('services.library_service.get_all_patron_borrow_records', mock_get_all_records)
+    monkeypatch.setattr('services.library_service.iter_patron_borrow_history', mock_get_all_records)
     
     result = ls.get_patron_status_report('123456')
     
@@ -101,20 +99,15 @@ def test_get_patron_status_with_overdue_books(monkeypatch):
         {
             'id': 1,
             'book_id': 1,
+            'title': 'Overdue Book',
+            'author': 'Some Author',
             'borrow_date': '2025-10-01',
             'due_date': past_due_date,
             'return_date': None
         }
     ])
     
-    mock_get_book = MagicMock(return_value={
-        'id': 1,
-        'title': 'Overdue Book',
-        'author': 'Some Author'
-    })
-    
-    monkeypatch.setattr('services.library_service.get_all_patron_borrow_records', mock_get_all_records)
-    monkeypatch.setattr('services.library_service.get_book_by_id', mock_get_book)
+    monkeypatch.setattr('services.library_service.iter_patron_borrow_history', mock_get_all_records)
     
     result = ls.get_patron_status_report('123456')
     
@@ -129,6 +122,8 @@ def test_get_patron_status_with_history(monkeypatch):
         {
             'id': 1,
             'book_id': 1,
+            'title': 'Book 1',
+            'author': 'Author 1',
             'borrow_date': '2025-09-01',
             'due_date': '2025-09-15',
             'return_date': '2025-09-14'
@@ -136,19 +131,15 @@ def test_get_patron_status_with_history(monkeypatch):
         {
             'id': 2,
             'book_id': 2,
+            'title': 'Book 2',
+            'author': 'Author 2',
             'borrow_date': '2025-10-01',
             'due_date': (datetime.now() + timedelta(days=5)).isoformat(),
             'return_date': None
         }
     ])
     
-    mock_get_book = MagicMock(side_effect=[
-        {'id': 1, 'title': 'Book 1', 'author': 'Author 1'},
-        {'id': 2, 'title': 'Book 2', 'author': 'Author 2'}
-    ])
-    
-    monkeypatch.setattr('services.library_service.get_all_patron_borrow_records', mock_get_all_records)
-    monkeypatch.setattr('services.library_service.get_book_by_id', mock_get_book)
+    monkeypatch.setattr('services.library_service.iter_patron_borrow_history', mock_get_all_records)
     
     result = ls.get_patron_status_report('123456')
     
@@ -156,3 +147,20 @@ def test_get_patron_status_with_history(monkeypatch):
     assert result['borrowing_history'][0]['return_date'] == '2025-09-14'
     assert 'return_date' not in result['borrowing_history'][1]
 
+
+
+def test_get_patron_status_uses_one_query(monkeypatch):
+    """The report costs one connection checkout however long the history is."""
+    import database
+    for i in range(50):
+        database.insert_borrow_record('654321', 1, datetime.now() - timedelta(days=30 + i),
+                                      datetime.now() - timedelta(days=16 + i))
+    monkeypatch.setattr('services.library_service.get_book_by_id',
+                        MagicMock(side_effect=AssertionError("per-record book lookup")))
+
+    before = database.get_pool_stats()['checkouts']
+    result = ls.get_patron_status_report('654321')
+
+    assert database.get_pool_stats()['checkouts'] - before == 1
+    assert len(result['borrowing_history']) == 50
+    assert result['borrowing_history'][0]['title'] == 'The Great Gatsby'
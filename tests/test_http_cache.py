@@ -0,0 +1,107 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+import database
+import services.library_service as ls
+from app import create_app
+from routes import http_cache
+
+
+@pytest.fixture
+def client():
+    return create_app({'TESTING': True}).test_client()
+
+
+@pytest.mark.parametrize('url', [
+    '/catalog',
+    '/search?q=gatsby&type=title',
+    '/api/search?q=gatsby&type=title',
+    '/api/late_fee/123456/3',
+])
+def test_unchanged_resource_answers_304_without_running_the_view(client, mocker, url):
+    first = client.get(url)
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    assert first.headers['Cache-Control'] == 'no-cache'
+
+    # Nothing below the ETag check may touch the database
+    checkout = mocker.spy(database.ConnectionPool, 'acquire')
+    second = client.get(url, headers={'If-None-Match': etag})
+
+    assert second.status_code == 304
+    assert second.headers['ETag'] == etag
+    assert second.get_data() == b''
+    assert checkout.call_count == 0
+
+
+def test_borrow_changes_catalog_and_late_fee_etags(client):
+    catalog_tag = client.get('/catalog').headers['ETag']
+    fee_tag = client.get('/api/late_fee/654321/1').headers['ETag']
+
+    success, _ = ls.borrow_book_by_patron('654321', 1)
+    assert success
+
+    catalog = client.get('/catalog', headers={'If-None-Match': catalog_tag})
+    fee = client.get('/api/late_fee/654321/1', headers={'If-None-Match': fee_tag})
+    assert catalog.status_code == 200 and catalog.headers['ETag'] != catalog_tag
+    assert fee.status_code == 200 and fee.headers['ETag'] != fee_tag
+
+
+def test_loan_write_does_not_invalidate_catalog(client):
+    tag = client.get('/catalog').headers['ETag']
+    now = datetime.now()
+    database.insert_borrow_record('222222', 2, now, now + timedelta(days=14))
+    assert client.get('/catalog', headers={'If-None-Match': tag}).status_code == 304
+
+
+def test_new_book_invalidates_search(client):
+    tag = client.get('/api/search?q=dune&type=title').headers['ETag']
+    database.insert_book('Dune', 'Frank Herbert', '9780441013593', 1, 1)
+
+    response = client.get('/api/search?q=dune&type=title', headers={'If-None-Match': tag})
+    assert response.status_code == 200
+    assert response.get_json()['count'] == 1
+
+
+def test_late_fee_etag_rolls_over_with_the_clock(client, monkeypatch):
+    now = [960_000.0]   # a multiple of the 60s period
+    monkeypatch.setattr(http_cache.time, 'time', lambda: now[0])
+    tag = client.get('/api/late_fee/123456/3').headers['ETag']
+
+    now[0] += 30
+    assert client.get('/api/late_fee/123456/3', headers={'If-None-Match': tag}).status_code == 304
+    now[0] += 60
+    assert client.get('/api/late_fee/123456/3', headers={'If-None-Match': tag}).status_code == 200
+
+
+def test_uncommitted_write_does_not_change_version():
+    before = database.get_catalog_version()
+    with pytest.raises(RuntimeError):
+        with database.unit_of_work():
+            database.update_book_availability(1, -1)
+            raise RuntimeError('abort')
+    assert database.get_catalog_version() == before
+
+
+def test_etag_is_the_same_in_every_worker(client, monkeypatch):
+    tag = client.get('/catalog').headers['ETag']
+    success, _ = ls.borrow_book_by_patron('654321', 1)
+    assert success
+    tag = client.get('/catalog', headers={'If-None-Match': tag}).headers['ETag']
+
+    # A freshly started worker rebuilds its versions from the shared change log
+    monkeypatch.setattr(database, '_versions', {'catalog': 0, 'loans': 0})
+    database.close_pool()
+    other_worker = create_app({'TESTING': True}).test_client()
+    assert other_worker.get('/catalog', headers={'If-None-Match': tag}).status_code == 304
+
+
+def test_pending_flash_bypasses_conditional_response(client):
+    tag = client.get('/catalog').headers['ETag']
+    with client.session_transaction() as session:
+        session['_flashes'] = [('success', 'Book added')]
+
+    response = client.get('/catalog', headers={'If-None-Match': tag})
+    assert response.status_code == 200
+    assert 'Book added' in response.get_data(as_text=True)
@@ -0,0 +1,42 @@
+import types
+from datetime import datetime, timedelta
+
+import database
+
+
+def _add_books(count):
+    for i in range(count):
+        database.insert_book(f'Book {i:03d}', 'Author', f'{9790000000000 + i}', 1, 1)
+
+
+def test_iter_all_books_matches_list_reader():
+    _add_books(30)
+    iterator = database.iter_all_books(batch_size=7)
+    assert isinstance(iterator, types.GeneratorType)
+    assert list(iterator) == database.get_all_books()
+
+
+def test_iterator_holds_connection_until_closed():
+    _add_books(10)
+    iterator = database.iter_all_books(batch_size=3)
+    next(iterator)
+    stats = database.get_pool_stats()
+    assert stats['open'] - stats['idle'] == 1
+
+    iterator.close()
+    stats = database.get_pool_stats()
+    assert stats['open'] == stats['idle']
+
+
+def test_history_iterators_match_list_readers():
+    now = datetime.now()
+    for days in range(5):
+        database.insert_borrow_record('222222', 1, now - timedelta(days=days), now + timedelta(days=14))
+
+    records = list(database.iter_patron_borrow_records('222222', batch_size=2))
+    assert records == database.get_all_patron_borrow_records('222222')
+    assert [r['borrow_date'] for r in records] == sorted((r['borrow_date'] for r in records), reverse=True)
+
+    history = list(database.iter_patron_borrow_history('222222', batch_size=2))
+    assert history == database.get_patron_borrow_history('222222')
+    assert {r['title'] for r in history} == {'The Great Gatsby'}
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta
+
+import database
+
+
+def _query_plan(sql, params=()):
+    with database.db_connection() as conn:
+        rows = conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+    return ' '.join(row['detail'] for row in rows)
+
+
+def test_init_database_applies_all_migrations(temp_db):
+    """A fresh database ends up at the latest schema version."""
+    latest = max(version for version, _, _ in database.MIGRATIONS)
+    assert database.get_schema_version() == latest
+
+
+def test_migrations_are_idempotent(temp_db):
+    """Running init_database again applies nothing and keeps the data."""
+    assert database.run_migrations() == []
+    database.init_database()
+    assert database.get_book_by_id(1)['title'] == 'The Great Gatsby'
+
+
+def test_migrations_upgrade_existing_database(temp_db):
+    """A database created before migrations existed is brought up to date."""
+    with database.db_connection() as conn:
+        conn.execute('DROP TABLE schema_version')
+        conn.execute('DROP INDEX idx_borrow_records_active_patron')
+        conn.commit()
+
+    applied = database.run_migrations()
+
+    assert applied == [version for version, _, _ in database.MIGRATIONS]
+    assert database.get_patron_borrow_count("123456") == 1
+
+
+def test_hot_queries_use_indexes(temp_db):
+    """The borrow_records hot paths search an index instead of scanning the table."""
+    plan = _query_plan('SELECT COUNT(*) FROM borrow_records WHERE patron_id = ? AND return_date IS NULL',
+                       ('123456',))
+    assert plan.startswith('SEARCH borrow_records USING')
+
+    plan = _query_plan('SELECT * FROM borrow_records WHERE patron_id = ? AND book_id = ? AND return_date IS NULL',
+                       ('123456', 3))
+    assert 'idx_borrow_records_patron_book' in plan
+
+    plan = _query_plan('SELECT * FROM books ORDER BY title')
+    assert 'idx_books_title' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_borrow_dates_stored_as_epoch_integers(temp_db):
+    """New loans are written as integer epoch seconds."""
+    database.insert_borrow_record('222222', 1, datetime(2025, 1, 2, 3, 4, 5), datetime(2025, 1, 16, 3, 4, 5))
+    with database.db_connection() as conn:
+        row = conn.execute("SELECT typeof(borrow_date) AS kind, borrow_date FROM borrow_records "
+                           "WHERE patron_id = '222222'").fetchone()
+    assert row['kind'] == 'integer'
+    assert database.to_datetime(row['borrow_date']) == datetime(2025, 1, 2, 3, 4, 5)
+
+
+def test_epoch_migration_converts_iso_text(tmp_path, monkeypatch):
+    """A database with ISO-8601 TEXT dates is rebuilt with the same instants as integers."""
+    monkeypatch.setattr(database, 'DATABASE', str(tmp_path / 'legacy.db'))
+    database.close_pool()
+    borrowed = datetime(2025, 9, 1, 10, 30)
+    with database.db_connection() as conn:
+        conn.execute('''CREATE TABLE books (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL,
+                        author TEXT NOT NULL, isbn TEXT UNIQUE NOT NULL, total_copies INTEGER NOT NULL,
+                        available_copies INTEGER NOT NULL)''')
+        conn.execute('''CREATE TABLE borrow_records (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        patron_id TEXT NOT NULL, book_id INTEGER NOT NULL, borrow_date TEXT NOT NULL,
+                        due_date TEXT NOT NULL, return_date TEXT)''')
+        conn.execute("INSERT INTO books VALUES (1, 'Old', 'Author', '9780000000001', 1, 1)")
+        conn.execute("INSERT INTO borrow_records VALUES (7, '123456', 1, ?, ?, ?)",
+                     (borrowed.isoformat(), (borrowed + timedelta(days=14)).isoformat(),
+                      (borrowed + timedelta(days=3)).isoformat()))
+        conn.commit()
+
+    database.init_database()
+
+    records = database.get_all_patron_borrow_records('123456')
+    assert records[0]['id'] == 7
+    assert isinstance(records[0]['due_date'], int)
+    assert database.to_datetime(records[0]['borrow_date']) == borrowed
+    assert database.to_datetime(records[0]['return_date']) == borrowed + timedelta(days=3)
+    with database.db_connection() as conn:
+        indexes = {row['name'] for row in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'borrow_records'")}
+    assert {'idx_borrow_records_active_patron', 'idx_borrow_records_patron_book',
+            'idx_borrow_records_patron_borrow_date', 'idx_borrow_records_active_due_date'} <= indexes
+    database.close_pool()
+
+
+def test_compatibility_reader_accepts_both_formats():
+    moment = datetime(2025, 10, 1, 12, 0, 0)
+    assert database.to_datetime(moment.isoformat()) == moment
+    assert database.to_datetime(database.to_epoch(moment)) == moment
+    assert database.to_datetime(str(database.to_epoch(moment))) == moment
+    assert database.to_datetime(None) is None
+
+
+def test_overdue_loans_use_due_date_index(temp_db):
+    """Overdue lookups are a range scan on the due-date index."""
+    database.insert_borrow_record('333333', 1, datetime.now() - timedelta(days=20),
+                                  datetime.now() - timedelta(days=6))
+
+    overdue = database.get_overdue_loans()
+
+    assert [loan['patron_id'] for loan in overdue] == ['333333']
+    plan = _query_plan('SELECT * FROM borrow_records WHERE return_date IS NULL AND due_date < ? ORDER BY due_date',
+                       (0,))
+    assert 'idx_borrow_records_active_due_date' in plan
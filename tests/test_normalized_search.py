@@ -0,0 +1,92 @@
+import pytest
+
+import database
+import services.library_service as ls
+from app import create_app
+from services import search_index
+
+
+@pytest.fixture(params=['fts', 'trigram'])
+def backend(request):
+    if request.param == 'trigram':
+        search_index.enable_trigram_search()
+    yield request.param
+    search_index.disable_trigram_search()
+
+
+@pytest.mark.parametrize('text, normalized', [
+    ('The Great Gatsby', 'the great gatsby'),
+    ('  Gabriel   García\tMárquez ', 'gabriel garcia marquez'),
+    ('Straße', 'strasse'),
+    ('ÉMILE ZOLA', 'emile zola'),
+    ('Ｆｕｌｌ width', 'full width'),
+])
+def test_normalize_text(text, normalized):
+    assert database.normalize_text(text) == normalized
+
+
+def test_insert_book_stores_normalized_columns():
+    database.insert_book('Cien Años  de Soledad', 'Gabriel García Márquez', '9780060883287', 1, 1)
+    with database.db_connection() as conn:
+        row = conn.execute("SELECT title_norm, author_norm FROM books WHERE isbn = '9780060883287'").fetchone()
+    assert tuple(row) == ('cien anos de soledad', 'gabriel garcia marquez')
+
+
+def test_normalized_columns_stay_internal():
+    assert set(database.get_book_by_id(1)) == {
+        'id', 'title', 'author', 'isbn', 'total_copies', 'available_copies'
+    }
+
+
+@pytest.mark.parametrize('term, field', [
+    ('garcia marquez', 'author'),
+    ('GARCÍA', 'author'),
+    ('anos de', 'title'),
+    ('ÑO', 'title'),     # too short for the trigram index, uses LIKE on title_norm
+])
+def test_search_ignores_case_accents_and_spacing(backend, term, field):
+    database.insert_book('Cien Años  de Soledad', 'Gabriel García Márquez', '9780060883287', 1, 1)
+    assert [b['isbn'] for b in ls.search_books_in_catalog(term, field)] == ['9780060883287']
+
+
+def test_all_search_scores_normalized_match():
+    database.insert_book('Émile', 'Jean-Jacques Rousseau', '9780465019311', 1, 1)
+    results = ls.search_books_in_catalog('EMILE', 'all')
+    assert [b['title'] for b in results] == ['Émile']
+    assert results[0]['score'] == 3 * ls.FIELD_WEIGHTS['title']
+
+
+def test_exact_normalized_lookup_uses_index():
+    with database.db_connection() as conn:
+        plan = ' '.join(row['detail'] for row in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT id FROM books WHERE author_norm = 'george orwell'"))
+    assert 'idx_books_author_norm' in plan
+
+
+def test_migration_backfills_existing_books(tmp_path, monkeypatch):
+    """A database from before the normalized columns gains filled, searchable columns."""
+    monkeypatch.setattr(database, 'DATABASE', str(tmp_path / 'legacy.db'))
+    database.close_pool()
+    with database.db_connection() as conn:
+        conn.execute('''CREATE TABLE books (id INTEGER PRIMARY KEY AUTOINCREMENT, title TEXT NOT NULL,
+                        author TEXT NOT NULL, isbn TEXT UNIQUE NOT NULL, total_copies INTEGER NOT NULL,
+                        available_copies INTEGER NOT NULL)''')
+        conn.execute("INSERT INTO books VALUES (1, 'Les Misérables', 'Victor Hugo', '9780451419439', 1, 1)")
+        conn.commit()
+
+    database.init_database()
+
+    assert [b['id'] for b in database.search_books('miserables', 'title')] == [1]
+    assert [b['id'] for b in database.search_books('hugo', 'author')] == [1]
+    database.close_pool()
+
+
+@pytest.mark.parametrize('search_type, term', [
+    ('title', 'gat\0s\x7fby'), ('author', 'fitz\0gerald'), ('all', 'gat\0sby'),
+])
+def test_control_characters_are_dropped_from_terms(backend, search_type, term):
+    client = create_app({'TESTING': True}).test_client()
+    response = client.get(f'/api/search?q=%00abc&type={search_type}')
+    assert response.status_code == 200
+    assert response.get_json()['results'] == []
+    assert ls.search_books_in_catalog(term, search_type)[0]['title'] == 'The Great Gatsby'
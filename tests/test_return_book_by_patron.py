@@ -1,6 +1,9 @@
 import pytest
+
+import database
+from database import RETURN_BOOK_NOT_FOUND, RETURN_NO_ACTIVE_LOAN
 from services.library_service import (
-    return_book_by_patron
+    return_book_by_patron, borrow_book_by_patron
 )
 
 def test_return_book_invalid_patron_id():
@@ -19,8 +22,9 @@ def test_return_book_edge_case_empty_patron():
 
 def test_return_book_nonexistent_book(monkeypatch):
     """If the book ID does not exist, function should return appropriate error."""
-    # Mock get_book_by_id to return None (book not found)
-    monkeypatch.setattr("services.library_service.get_book_by_id", lambda book_id: None)
+    # Mock the return transaction to report the book as missing
+    monkeypatch.setattr("services.library_service.return_book_transaction",
+                        lambda *args: (RETURN_BOOK_NOT_FOUND, None, None))
 
     success, message = return_book_by_patron("123456", 999)
     assert success is False
@@ -29,12 +33,67 @@ def test_return_book_nonexistent_book(monkeypatch):
 
 def test_return_book_no_active_record(monkeypatch):
     """If patron never borrowed this book, should return error."""
-    mock_get_book = lambda book_id: {"id": 1, "title": "Test Book"}
-    mock_get_record = lambda patron_id, book_id: None
+    mock_return = lambda *args: (RETURN_NO_ACTIVE_LOAN, {"id": 1, "title": "Test Book"}, None)
 
-    monkeypatch.setattr("services.library_service.get_book_by_id", mock_get_book)
-    monkeypatch.setattr("services.library_service.get_borrow_record_by_patron_and_book", mock_get_record)
+    monkeypatch.setattr("services.library_service.return_book_transaction", mock_return)
 
     success, message = return_book_by_patron("123456", 1)
     assert success is False
     assert message == "No active borrow record found for this book and patron."
+
+
+def test_return_book_closes_loan_and_restores_copy():
+    """A real return closes the loan row and increments availability together."""
+    success, message = return_book_by_patron("123456", 3)
+
+    assert success is True
+    assert "returned successfully" in message
+    assert database.get_book_by_id(3)['available_copies'] == 1
+    assert database.get_patron_borrow_count("123456") == 0
+    assert database.get_borrow_record_by_patron_and_book("123456", 3) is None
+
+
+def test_return_book_twice_fails():
+    """Once the loan is closed, a second return finds no active record."""
+    assert return_book_by_patron("123456", 3)[0] is True
+
+    success, message = return_book_by_patron("123456", 3)
+
+    assert success is False
+    assert message == "No active borrow record found for this book and patron."
+    assert database.get_book_by_id(3)['available_copies'] == 1
+
+
+def test_concurrent_returns_of_same_title():
+    """Many patrons returning copies of one title at once all land exactly."""
+    import threading
+
+    copies = 12
+    database.insert_book('Busy Title', 'Author', '9783333333333', copies, copies)
+    book_id = database.get_book_by_isbn('9783333333333')['id']
+    patrons = [f'{800000 + n}' for n in range(copies)]
+    for patron_id in patrons:
+        assert borrow_book_by_patron(patron_id, book_id)[0] is True
+    assert database.get_book_by_id(book_id)['available_copies'] == 0
+
+    start = threading.Barrier(copies * 2)
+    results = []
+
+    def patron(patron_id):
+        start.wait()
+        results.append(return_book_by_patron(patron_id, book_id))
+
+    # every patron tries to return twice at once; only one attempt each may succeed
+    threads = [threading.Thread(target=patron, args=(p,)) for p in patrons + patrons]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(30)
+
+    assert sum(1 for success, _ in results if success) == copies
+    assert database.get_book_by_id(book_id)['available_copies'] == copies
+    with database.db_connection() as conn:
+        open_loans = conn.execute(
+            'SELECT COUNT(*) FROM borrow_records WHERE book_id = ? AND return_date IS NULL', (book_id,)
+        ).fetchone()[0]
+    assert open_loans == 0
@@ -3,6 +3,13 @@ import unittest
 from unittest.mock import patch, MagicMock
 from datetime import datetime, timedelta
 import services.library_service as ls
+import database
+
+
+def _add_books(books):
+    """Put the given books in the (temporary) catalog."""
+    for book in books:
+        assert database.insert_book(book['title'], book['author'], book['isbn'], 1, 1)
 
 
 def test_search_books_returns_list():
@@ -27,14 +34,12 @@ def test_search_books_invalid_type_placeholder():
     
 def test_search_books_by_title(monkeypatch):
     """Test searching books by title"""
-    mock_get_all_books = MagicMock(return_value=[
+    _add_books([
         {'id': 1, 'title': 'Python Programming', 'author': 'John Doe', 'isbn': '1111111111111'},
         {'id': 2, 'title': 'Java Basics', 'author': 'Jane Smith', 'isbn': '2222222222222'},
         {'id': 3, 'title': 'Advanced Python', 'author': 'Bob Wilson', 'isbn': '3333333333333'}
     ])
     
-    monkeypatch.setattr('services.library_service.get_all_books', mock_get_all_books)
-    
     result = ls.search_books_in_catalog('python', 'title')
     
     assert len(result) == 2
@@ -43,13 +48,11 @@ def test_search_books_by_title(monkeypatch):
 
 def test_search_books_by_author(monkeypatch):
     """Test searching books by author name"""
-    mock_get_all_books = MagicMock(return_value=[
+    _add_books([
         {'id': 1, 'title': 'Python Programming', 'author': 'John Doe', 'isbn': '1111111111111'},
         {'id': 2, 'title': 'Java Basics', 'author': 'John Smith', 'isbn': '2222222222222'}
     ])
     
-    monkeypatch.setattr('services.library_service.get_all_books', mock_get_all_books)
-    
     result = ls.search_books_in_catalog('john', 'author')
     
     assert len(result) == 2
@@ -57,13 +60,11 @@ def test_search_books_by_author(monkeypatch):
 
 def test_search_books_by_isbn(monkeypatch):
     """Test searching books by ISBN (exact match)"""
-    mock_get_all_books = MagicMock(return_value=[
+    _add_books([
         {'id': 1, 'title': 'Database Systems', 'author': 'Alice Johnson', 'isbn': '9781234567890'},
         {'id': 2, 'title': 'Web Development', 'author': 'Bob Smith', 'isbn': '9785678901234'}
     ])
     
-    monkeypatch.setattr('services.library_service.get_all_books', mock_get_all_books)
-    
     result = ls.search_books_in_catalog('9781234567890', 'isbn')
     
     assert len(result) == 1
@@ -86,12 +87,48 @@ def test_search_books_invalid_type(monkeypatch):
 
 def test_search_books_no_results(monkeypatch):
     """Test search with no matching results"""
-    mock_get_all_books = MagicMock(return_value=[
+    _add_books([
         {'id': 1, 'title': 'Python Programming', 'author': 'John Doe', 'isbn': '1111111111111'}
     ])
     
-    monkeypatch.setattr('services.library_service.get_all_books', mock_get_all_books)
-    
     result = ls.search_books_in_catalog('nonexistent', 'title')
     
-    assert len(result) == 0
\ No newline at end of file
+    assert len(result) == 0
+
+def test_search_books_partial_match_inside_word():
+    """Substrings match anywhere in the title, as before."""
+    result = ls.search_books_in_catalog('ockin', 'title')
+    assert [book['title'] for book in result] == ['To Kill a Mockingbird']
+
+
+def test_search_books_short_term_falls_back_to_like():
+    """Terms shorter than a trigram still do partial, case-insensitive matching."""
+    result = ls.search_books_in_catalog('OR', 'author')
+    assert [book['author'] for book in result] == ['George Orwell']
+
+
+def test_search_books_special_characters_are_literal():
+    """LIKE wildcards and FTS syntax in the term are matched literally."""
+    _add_books([
+        {'title': '100% Pure', 'author': 'A "Quoted" Writer', 'isbn': '4444444444444'},
+    ])
+    assert [b['title'] for b in ls.search_books_in_catalog('0%', 'title')] == ['100% Pure']
+    assert ls.search_books_in_catalog('_', 'title') == []
+    assert [b['title'] for b in ls.search_books_in_catalog('"quoted"', 'author')] == ['100% Pure']
+
+
+def test_search_index_follows_inserted_books():
+    """Books added after startup are searchable right away."""
+    _add_books([{'title': 'Brand New Arrival', 'author': 'Someone', 'isbn': '5555555555555'}])
+    assert len(ls.search_books_in_catalog('new arr', 'title')) == 1
+
+
+def test_search_books_isbn_uses_unique_index(monkeypatch):
+    """ISBN searches go straight to get_book_by_isbn."""
+    mock_get_by_isbn = MagicMock(return_value={'id': 1, 'isbn': '9780743273565'})
+    monkeypatch.setattr('services.library_service.get_book_by_isbn', mock_get_by_isbn)
+
+    result = ls.search_books_in_catalog(' 9780743273565 ', 'isbn')
+
+    assert result == [{'id': 1, 'isbn': '9780743273565'}]
+    mock_get_by_isbn.assert_called_once_with('9780743273565')
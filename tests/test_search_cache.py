@@ -0,0 +1,111 @@
+import database
+import services.library_service as ls
+from app import create_app
+from services import search_cache
+from services.search_cache import SearchCache
+
+
+def test_repeated_search_is_served_from_cache(mocker):
+    """The second identical query (ignoring case and padding) skips the database."""
+    spy = mocker.spy(ls, 'search_books')
+    first = ls.search_books_in_catalog('gatsby', 'title')
+    second = ls.search_books_in_catalog('  GATSBY ', 'title')
+
+    assert first == second
+    assert spy.call_count == 1
+    stats = search_cache.get_search_cache_stats()
+    assert stats['hits'] == 1
+    assert stats['misses'] == 1
+
+
+def test_cached_results_cannot_be_mutated_by_callers():
+    results = ls.search_books_in_catalog('gatsby', 'title')
+    results[0]['available_copies'] = -1
+    results.clear()
+
+    again = ls.search_books_in_catalog('gatsby', 'title')
+    assert again[0]['available_copies'] == 3
+
+
+def test_borrow_invalidates_cached_availability():
+    before = ls.search_books_in_catalog('gatsby', 'title')
+    assert before[0]['available_copies'] == 3
+
+    success, _ = ls.borrow_book_by_patron('654321', 1)
+    assert success
+
+    after = ls.search_books_in_catalog('gatsby', 'title')
+    assert after[0]['available_copies'] == 2
+    assert search_cache.get_search_cache_stats()['invalidations'] == 1
+
+
+def test_new_book_appears_in_cached_search():
+    assert ls.search_books_in_catalog('Dune', 'title') == []
+
+    success, _ = ls.add_book_to_catalog('Dune', 'Frank Herbert', '9780441013593', 4)
+    assert success
+
+    assert [b['title'] for b in ls.search_books_in_catalog('Dune', 'title')] == ['Dune']
+
+
+def test_uncommitted_writes_bypass_the_cache():
+    """Results read inside a write transaction are neither cached nor served from cache."""
+    ls.search_books_in_catalog('gatsby', 'title')
+
+    with database.unit_of_work() as uow:
+        database.update_book_availability(1, -1)
+        inside = ls.search_books_in_catalog('gatsby', 'title')
+        assert inside[0]['available_copies'] == 2
+        uow.mark_rollback()
+
+    after = ls.search_books_in_catalog('gatsby', 'title')
+    assert after[0]['available_copies'] == 3
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    cache = SearchCache(max_entries=2, ttl=10)
+    now = [1000.0]
+    monkeypatch.setattr(search_cache.time, 'monotonic', lambda: now[0])
+
+    cache.put('a', [{'id': 1}], 0)
+    cache.put('b', [{'id': 2}], 0)
+    assert cache.get('a', 0) == [{'id': 1}]   # 'a' is now most recently used
+    cache.put('c', [{'id': 3}], 0)
+
+    assert cache.get('b', 0) is None
+    assert cache.get('a', 0) is not None
+    assert cache.stats()['evictions'] == 1
+
+    now[0] += 11
+    assert cache.get('a', 0) is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_results_from_an_older_version_are_not_stored():
+    """A search that raced a committed write must not repopulate the cache."""
+    cache = SearchCache()
+    cache.put('a', [{'id': 1}], 5)
+    cache.put('b', [{'id': 2}], 4)
+
+    assert cache.get('b', 5) is None
+    assert cache.get('a', 5) == [{'id': 1}]
+
+
+def test_cache_can_be_disabled(mocker):
+    search_cache.configure_search_cache(max_entries=0)
+    spy = mocker.spy(ls, 'search_books')
+    ls.search_books_in_catalog('gatsby', 'title')
+    ls.search_books_in_catalog('gatsby', 'title')
+    assert spy.call_count == 2
+
+
+def test_stats_endpoint_reports_search_cache(temp_db):
+    app = create_app({'TESTING': True})
+    client = app.test_client()
+    client.get('/api/search?q=1984&type=title')
+    client.get('/api/search?q=1984&type=title')
+
+    stats = client.get('/api/stats').get_json()
+    assert stats['search_cache']['hits'] == 1
+    assert set(stats) == {'db_pool', 'transactions', 'changes', 'search_cache', 'fragment_cache',
+                          'trigram_index'}
@@ -0,0 +1,100 @@
+import random
+import string
+
+import pytest
+
+import database
+import services.library_service as ls
+from app import create_app
+from services import search_index
+from services.search_index import TrigramIndex
+
+
+@pytest.fixture
+def trigram_search():
+    index = search_index.enable_trigram_search()
+    yield index
+    search_index.disable_trigram_search()
+
+
+def _linear_scan(books, term, field):
+    """The search_books_in_catalog matching rule: a substring of the normalized text."""
+    term = database.normalize_text(term)
+    return sorted((b['title'], b['id']) for b in books if term in database.normalize_text(b[field]))
+
+
+def test_trigram_index_matches_linear_scan():
+    """Random titles and terms give exactly the linear-scan results."""
+    rng = random.Random(327)
+    alphabet = string.ascii_letters[:8] + ' '
+    books = [
+        {'id': i, 'title': ''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 20))),
+         'author': ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 12)))}
+        for i in range(1, 500)
+    ]
+    index = TrigramIndex()
+    index.build(books)
+
+    for _ in range(300):
+        field = rng.choice(['title', 'author'])
+        term = ''.join(rng.choice(alphabet) for _ in range(rng.randint(1, 5)))
+        expected = [book_id for _, book_id in _linear_scan(books, term, field)]
+        assert index.search(term, field) == expected
+
+
+def test_trigram_index_finds_substring_inside_word():
+    index = TrigramIndex()
+    index.build(database.get_all_books())
+    assert index.search('ockin', 'title') == [2]
+    assert index.search('OR', 'author') == [3]
+
+
+def test_search_uses_trigram_index_and_fresh_rows(trigram_search):
+    """With the index on, results still carry current availability."""
+    database.update_book_availability(2, -1)
+
+    result = ls.search_books_in_catalog('mockingbird', 'title')
+
+    assert [book['id'] for book in result] == [2]
+    assert result[0]['available_copies'] == 1
+
+
+def test_trigram_index_follows_insert_book(trigram_search):
+    assert ls.search_books_in_catalog('invisible', 'title') == []
+
+    database.insert_book('Invisible Cities', 'Italo Calvino', '9780156453806', 1, 1)
+
+    assert [book['title'] for book in ls.search_books_in_catalog('invisible', 'title')] == ['Invisible Cities']
+    assert len(trigram_search) == 4
+
+
+def test_trigram_index_ignores_rolled_back_insert(trigram_search):
+    """Only committed inserts reach the index."""
+    with pytest.raises(RuntimeError):
+        with database.unit_of_work():
+            database.insert_book('Never Saved', 'Nobody', '9789999999999', 1, 1)
+            raise RuntimeError("abort")
+
+    assert trigram_search.search('never saved', 'title') == []
+
+
+def test_trigram_index_memory_usage():
+    index = TrigramIndex()
+    index.build(database.get_all_books())
+    usage = index.memory_usage()
+    assert usage['books'] == 3
+    assert usage['trigrams'] > 0
+    assert usage['total_bytes'] >= usage['postings_bytes'] + usage['text_bytes']
+
+
+def test_stats_endpoint_reports_trigram_memory_usage():
+    client = create_app({'TESTING': True}).test_client()
+    assert client.get('/api/stats').get_json()['trigram_index'] is None
+
+    client = create_app({'TESTING': True, 'SEARCH_BACKEND': 'trigram'}).test_client()
+    try:
+        usage = client.get('/api/stats').get_json()['trigram_index']
+    finally:
+        search_index.disable_trigram_search()
+    assert usage['books'] == 3
+    assert usage['total_bytes'] > 0
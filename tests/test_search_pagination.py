@@ -0,0 +1,113 @@
+import pytest
+
+import database
+import services.library_service as ls
+from app import create_app
+from services import search_index
+
+
+@pytest.fixture(params=['fts', 'trigram'])
+def backend(request):
+    if request.param == 'trigram':
+        search_index.enable_trigram_search()
+    yield request.param
+    search_index.disable_trigram_search()
+
+
+def _add_books(count):
+    # Duplicate titles make sure ties are broken by ID across page boundaries
+    for i in range(count):
+        ls.add_book_to_catalog(f'Saga Volume {i % 7}', f'Author {i}', f'{9790000000000 + i}', 1)
+
+
+def _walk(term, field, limit):
+    books, cursor, pages = [], None, 0
+    while True:
+        page = ls.search_books_page(term, field, limit=limit, cursor=cursor)
+        books.extend(page['books'])
+        pages += 1
+        cursor = page['next_cursor']
+        if cursor is None:
+            return books, pages
+
+
+@pytest.mark.parametrize('term', ['saga', 'Vo', 'me 3'])
+def test_pages_concatenate_to_full_result(backend, term):
+    _add_books(45)
+    expected = ls.search_books_in_catalog(term, 'title')
+
+    books, pages = _walk(term, 'title', limit=10)
+
+    assert [b['id'] for b in books] == [b['id'] for b in expected]
+    assert pages == max(1, -(-len(expected) // 10))
+
+
+def test_exact_multiple_of_limit_has_no_empty_trailing_page(backend):
+    _add_books(20)
+    first = ls.search_books_page('Saga', 'title', limit=10)
+    second = ls.search_books_page('Saga', 'title', limit=10, cursor=first['next_cursor'])
+    assert len(second['books']) == 10
+    assert second['next_cursor'] is None
+
+
+def test_isbn_search_pages():
+    page = ls.search_books_page('9780743273565', 'isbn', limit=1)
+    assert [b['id'] for b in page['books']] == [1]
+    assert page['next_cursor'] is None
+
+
+def test_cursor_round_trip():
+    cursor = ls.encode_search_cursor(('Ünïcode "title"', 42))
+    assert ls.decode_search_cursor(cursor, 'title') == ('Ünïcode "title"', 42)
+    assert ls.decode_search_cursor(cursor, 'fuzzy') is None
+
+
+@pytest.mark.parametrize('cursor', ['not-a-cursor', 'W10', 'WyJhIiwiYiJd', '!!!',
+                                    ls.encode_search_cursor(('a', 2**70)),
+                                    ls.encode_search_cursor(('a', -2**63 - 1))])
+def test_invalid_cursor_is_rejected(cursor):
+    assert ls.search_books_page('gatsby', 'title', cursor=cursor) == {'error': 'Invalid cursor.'}
+
+
+@pytest.mark.parametrize('limit', [0, -1, ls.MAX_PAGE_SIZE + 1])
+def test_limit_out_of_range_is_rejected(limit):
+    assert 'error' in ls.search_books_page('gatsby', 'title', limit=limit)
+
+
+def test_short_term_keyset_query_walks_title_index():
+    """The LIKE fallback resumes from the cursor position instead of sorting every book."""
+    with database.db_connection() as conn:
+        plan = ' '.join(row['detail'] for row in conn.execute('''
+            EXPLAIN QUERY PLAN
+            SELECT * FROM books b WHERE title LIKE '%a%' ESCAPE '\\'
+            AND (b.title, b.id) > ('M', 2) ORDER BY title, id LIMIT 21
+        '''))
+    assert 'idx_books_title' in plan
+    assert 'TEMP B-TREE' not in plan
+
+
+def test_api_search_paginates():
+    _add_books(5)
+    client = create_app({'TESTING': True}).test_client()
+
+    first = client.get('/api/search?q=saga&type=title&limit=3').get_json()
+    assert first['count'] == 3
+    second = client.get(f"/api/search?q=saga&type=title&limit=3&cursor={first['next_cursor']}").get_json()
+    assert second['count'] == 2
+    assert second['next_cursor'] is None
+
+    assert client.get('/api/search?q=saga&limit=abc').status_code == 400
+    assert client.get('/api/search?q=saga&limit=²').status_code == 400
+    assert client.get('/api/search?q=saga&cursor=bogus').status_code == 400
+    oversized = ls.encode_search_cursor(('a', 2**70))
+    assert client.get(f'/api/search?q=gatsby&type=title&cursor={oversized}').status_code == 400
+    assert client.get(f'/search?q=gatsby&type=title&cursor={oversized}').status_code == 200
+
+
+def test_search_page_links_to_next_page():
+    _add_books(25)
+    client = create_app({'TESTING': True}).test_client()
+
+    html = client.get('/search?q=saga&type=title').get_data(as_text=True)
+    assert 'Next page' in html
+    assert 'cursor=' in html
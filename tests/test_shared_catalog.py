@@ -0,0 +1,184 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+import database
+import services.library_service as ls
+from app import create_app
+from services import shared_catalog
+from services.shared_catalog import SharedCatalogIndex
+
+
+@pytest.fixture
+def index_path(tmp_path):
+    return str(tmp_path / 'library.db.catalog')
+
+
+def _add_books(count, start=0):
+    for i in range(start, start + count):
+        ls.add_book_to_catalog(f'Saga Volume {i % 7} Ñandú', f'Author {i}', f'{9790000000000 + i}', 2)
+
+
+def _sql_books():
+    return {book['id']: book for book in database.iter_all_books()}
+
+
+def test_lookups_match_the_database(index_path):
+    _add_books(20)
+    shared_catalog.enable_shared_catalog(index_path)
+
+    expected = _sql_books()
+    assert {book_id: database.get_book_by_id(book_id) for book_id in expected} == expected
+    assert database.get_book_by_id(999) is None
+    assert database.get_books_by_ids([1, 999]) == {1: expected[1]}
+
+
+@pytest.mark.parametrize('term, field', [
+    ('saga', 'title'), ('VO', 'title'), ('me 3 nan', 'title'), ('', 'title'),
+    ('george', 'author'), ('or 1', 'author'), ('nothing like it', 'title'),
+])
+def test_search_matches_database_search(index_path, term, field):
+    _add_books(30)
+    index = shared_catalog.enable_shared_catalog(index_path)
+
+    assert index.search(term, field) == database.search_books(term, field)
+    after = ('Saga Volume 3 Ñandú', 10)
+    assert index.search(term, field, after, 5) == database.search_books(term, field, after, 5)
+
+
+def test_isbn_lookup(index_path):
+    index = shared_catalog.enable_shared_catalog(index_path)
+    assert index.find_isbn('9780451524935')['title'] == '1984'
+    assert index.find_isbn('978045152493') is None
+    assert index.find_isbn('') is None
+
+
+def test_rows_inserted_without_search_columns_are_searchable(index_path):
+    with database.db_transaction() as conn:
+        conn.execute("INSERT INTO books (title, author, isbn, total_copies, available_copies) "
+                     "VALUES ('Dune', 'Frank Herbert', '9780441013593', 2, 2)")
+    index = shared_catalog.enable_shared_catalog(index_path)
+
+    assert [book['title'] for book in index.search('dune', 'title')] == ['Dune']
+    assert [book['title'] for book in index.search('herbert', 'author')] == ['Dune']
+
+
+def test_copy_counts_change_in_place_for_every_worker(index_path):
+    index = shared_catalog.enable_shared_catalog(index_path)
+    other_worker = SharedCatalogIndex(index_path)
+    other_worker.load()
+
+    assert ls.borrow_book_by_patron('654321', 1)[0]
+
+    assert database.get_book_by_id(1)['available_copies'] == 2
+    # The other mapping sees the write without refreshing anything
+    assert other_worker.get(1).available_copies == 2
+    assert index.stats()['generation'] == 1
+    assert index.stats()['copy_updates'] >= 1
+
+
+def test_another_process_reads_the_same_mapping(index_path):
+    shared_catalog.enable_shared_catalog(index_path)
+    assert ls.borrow_book_by_patron('654321', 1)[0]
+
+    # Map the file read-only in a child, without touching any database
+    script = ('import sys\n'
+              'from services.shared_catalog import _Mapping\n'
+              'mapping = _Mapping(sys.argv[1])\n'
+              'print(mapping.record(mapping.position(1)).available_copies)\n')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, '-c', script, index_path], cwd=root,
+                            capture_output=True, text=True, check=True).stdout
+    assert output.strip() == '2'
+
+
+def test_new_book_is_pending_until_enough_accumulate(index_path, monkeypatch):
+    monkeypatch.setattr(shared_catalog, 'PENDING_REBUILD_THRESHOLD', 2)
+    index = shared_catalog.enable_shared_search(index_path)
+    other_worker = SharedCatalogIndex(index_path)
+    other_worker.load()
+
+    assert database.insert_book('Dune', 'Frank Herbert', '9780441013593', 2, 2)
+    book_id = database.get_book_by_isbn('9780441013593')['id']
+
+    assert index.stats()['generation'] == 1 and index.stats()['pending'] == 1
+    assert database.get_book_by_id(book_id)['title'] == 'Dune'
+    assert index.find_isbn('9780441013593')['id'] == book_id
+    assert [book['title'] for book in index.search('dune', 'title')] == ['Dune']
+    assert len(index) == 4
+    assert other_worker.get(book_id) is None
+
+    # When the other worker syncs the same change it keeps it pending too
+    other_worker.refresh_many([book_id])
+    assert other_worker.get(book_id).title == 'Dune'
+
+    _add_books(2)
+    assert index.stats()['generation'] == 2 and index.stats()['pending'] == 0
+    assert database.get_book_by_id(book_id)['title'] == 'Dune'
+
+    # ...and maps the new file instead of rebuilding it again
+    other_worker.refresh_many([book_id + 1, book_id + 2])
+    assert other_worker.stats()['rebuilds'] == 0
+    assert other_worker.stats()['pending'] == 0
+    assert other_worker.get(book_id + 2).title.startswith('Saga')
+
+
+@pytest.mark.parametrize('term, field', [('saga', 'title'), ('', 'title'), ('or 1', 'author')])
+def test_pending_books_merge_into_search(index_path, term, field):
+    _add_books(30)
+    index = shared_catalog.enable_shared_catalog(index_path)
+    _add_books(5, start=30)
+    with database.db_transaction() as conn:
+        conn.execute("UPDATE books SET title = 'Saga Volume 0 Zeta', title_norm = 'saga volume 0 zeta' "
+                     "WHERE id = 10")
+        conn.execute('DELETE FROM books WHERE id = 11')
+    database.sync_changes()
+
+    assert index.stats()['pending'] == 7
+    assert len(index) == len(_sql_books())
+    assert index.search(term, field) == database.search_books(term, field)
+    after = ('Saga Volume 3 Ñandú', 10)
+    assert index.search(term, field, after, 5) == database.search_books(term, field, after, 5)
+    assert index.verify(repair=False) == []
+
+
+def test_load_repairs_a_stale_file(index_path):
+    shared_catalog.enable_shared_catalog(index_path)
+    database.drop_catalog_snapshot()
+    with database.db_transaction() as conn:
+        conn.execute('UPDATE books SET available_copies = 1 WHERE id = 1')
+
+    index = SharedCatalogIndex(index_path)
+    index.load()
+    assert index.get(1).available_copies == 1
+    assert index.verify() == []
+
+
+def test_unreadable_file_is_rebuilt(index_path):
+    with open(index_path, 'wb') as f:
+        f.write(b'not an index')
+    index = SharedCatalogIndex(index_path)
+    index.load()
+    assert len(index) == 3
+
+
+def test_uncommitted_writes_search_the_database(index_path):
+    shared_catalog.enable_shared_search(index_path)
+    with pytest.raises(RuntimeError):
+        with database.unit_of_work():
+            database.update_book_availability(1, -1)
+            assert ls.search_books_in_catalog('9780743273565', 'isbn')[0]['available_copies'] == 2
+            raise RuntimeError('abort')
+    assert ls.search_books_in_catalog('9780743273565', 'isbn')[0]['available_copies'] == 3
+
+
+def test_app_serves_search_from_shared_index(index_path, mocker):
+    client = create_app({'TESTING': True, 'SEARCH_BACKEND': 'shared', 'CATALOG_INDEX_PATH': index_path}).test_client()
+    sql_search = mocker.spy(ls, 'search_books')
+
+    response = client.get('/api/search?q=mockingbird&type=title').get_json()
+    assert [book['title'] for book in response['results']] == ['To Kill a Mockingbird']
+    assert sql_search.call_count == 0
+    assert shared_catalog.get_shared_catalog().path == index_path
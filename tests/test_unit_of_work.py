@@ -0,0 +1,74 @@
+import pytest
+
+import database
+import services.library_service as ls
+from app import create_app
+
+
+def test_unit_of_work_commits_once_for_a_borrow(temp_db):
+    """All writes of a borrow share one transaction and one commit."""
+    before = database.get_transaction_stats()['commits']
+
+    with database.unit_of_work():
+        success, message = ls.borrow_book_by_patron("111111", 1)
+
+    assert success is True
+    assert database.get_transaction_stats()['commits'] - before == 1
+    assert database.get_book_by_id(1)['available_copies'] == 2
+    assert database.get_patron_borrow_count("111111") == 1
+
+
+def test_unit_of_work_rolls_back_after_failed_helper(temp_db):
+    """A helper that fails part-way through a unit of work undoes the earlier writes."""
+    with database.unit_of_work() as uow:
+        assert database.update_book_availability(1, -1) is True
+        # Duplicate ISBN: the helper reports failure and dooms the unit
+        assert database.insert_book('Copy', 'Author', '9780743273565', 1, 1) is False
+        assert uow.rollback_only is True
+
+    assert database.get_book_by_id(1)['available_copies'] == 3
+
+
+def test_unit_of_work_rolls_back_on_exception(temp_db):
+    """An exception escaping the block discards the writes."""
+    with pytest.raises(RuntimeError):
+        with database.unit_of_work():
+            database.update_book_availability(1, -1)
+            raise RuntimeError("boom")
+
+    assert database.get_book_by_id(1)['available_copies'] == 3
+
+
+def test_nested_unit_of_work_joins_outer(temp_db):
+    """An inner unit of work joins the outer one and does not commit early."""
+    before = database.get_transaction_stats()['commits']
+    with database.unit_of_work() as outer:
+        with database.unit_of_work() as inner:
+            assert inner is outer
+            database.update_book_availability(1, -1)
+        assert database.get_transaction_stats()['commits'] == before
+    assert database.get_transaction_stats()['commits'] - before == 1
+
+
+def test_flask_request_commits_once(temp_db):
+    """A borrow POST is one transaction, committed in teardown_request."""
+    app = create_app()
+    client = app.test_client()
+    before = database.get_transaction_stats()['commits']
+
+    response = client.post('/borrow', data={'patron_id': '222222', 'book_id': '2'})
+
+    assert response.status_code == 302
+    assert database.get_transaction_stats()['commits'] - before == 1
+    assert database.current_unit_of_work() is None
+    assert database.get_patron_borrow_count("222222") == 1
+
+
+def test_flask_read_only_request_does_not_commit(temp_db):
+    """Requests that only read never commit."""
+    app = create_app()
+    client = app.test_client()
+    before = database.get_transaction_stats()['commits']
+
+    assert client.get('/catalog').status_code == 200
+    assert database.get_transaction_stats()['commits'] == before